@@ -1 +1,5 @@
 # Iqraa Exam Grading System - Backend
+import time
+
+# Startup reports how long the imports took from here
+STARTED = time.perf_counter()
@@ -0,0 +1,82 @@
+"""
+Balanced allocation of students to rooms (teams) and question groups.
+
+Each student goes to the room with the fewest students, then to the question
+group used least in that room (ties go to the group used least overall).
+Counts start from the session's existing assignments, so running it again
+for late arrivals keeps the rooms even.
+
+A second-term student never gets the group they had before. They are placed
+first, while every group is still open to them, and the rest fill around them.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class StudentToPlace:
+    id: int
+    is_second_term: bool
+    previous_question_group: Optional[str]  # Group code, e.g. "A"
+
+
+@dataclass(frozen=True)
+class GroupOption:
+    id: int
+    code: str
+
+
+@dataclass(frozen=True)
+class Placement:
+    student_id: int
+    team_id: int
+    question_group_id: int
+
+
+def excluded_group(student: StudentToPlace) -> Optional[str]:
+    if student.is_second_term and student.previous_question_group:
+        return student.previous_question_group.upper()
+    return None
+
+
+def allocate(
+    students: Iterable[StudentToPlace],
+    team_ids: Sequence[int],
+    groups: Sequence[GroupOption],
+    existing: Iterable[Tuple[int, int, int]] = ()
+) -> Tuple[List[Placement], List[int]]:
+    """
+    Place every student in one pass. `existing` holds (team_id, group_id, count)
+    of the session's current assignments. Returns the placements and the ids
+    of students no group was open to.
+    """
+    team_load: Dict[int, int] = Counter()
+    group_load: Dict[int, int] = Counter()
+    pair_load: Dict[Tuple[int, int], int] = Counter()
+    for team_id, group_id, count in existing:
+        team_load[team_id] += count
+        group_load[group_id] += count
+        pair_load[(team_id, group_id)] += count
+
+    # Constrained students first, each list in id order
+    ordered = sorted(students, key=lambda s: (excluded_group(s) is None, s.id))
+
+    placements = []
+    unplaced = []
+    for student in ordered:
+        excluded = excluded_group(student)
+        options = [g for g in groups if g.code.upper() != excluded]
+        if not options or not team_ids:
+            unplaced.append(student.id)
+            continue
+
+        team_id = min(team_ids, key=lambda t: (team_load[t], t))
+        group = min(options, key=lambda g: (pair_load[(team_id, g.id)], group_load[g.id], g.id))
+
+        team_load[team_id] += 1
+        group_load[group.id] += 1
+        pair_load[(team_id, group.id)] += 1
+        placements.append(Placement(student_id=student.id, team_id=team_id, question_group_id=group.id))
+
+    return placements, unplaced
@@ -0,0 +1,192 @@
+"""
+Result backups.
+
+Every write to grades, Q10 marks or assignments only schedules a backup of
+the assignments it touched. A background thread coalesces bursts of edits
+into one write: it waits BACKUP_COALESCE_SECONDS after the first
+edit, then writes either a full snapshot (when the last one is older than
+BACKUP_FULL_INTERVAL_SECONDS) or a gzipped delta holding only the
+assignments that changed since. The full snapshot plus the deltas written
+after it restore the latest state.
+"""
+import atexit
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional, Set
+from sqlalchemy.orm import Session, joinedload
+from .database import SessionLocal
+from .models import StudentAssignment, Grade
+
+# Backup directory
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "backups"))
+LATEST_BACKUP = "backup_latest.json"
+
+BACKUP_COALESCE_SECONDS = float(os.getenv("BACKUP_COALESCE_SECONDS", "5"))
+BACKUP_FULL_INTERVAL_SECONDS = float(os.getenv("BACKUP_FULL_INTERVAL_SECONDS", "900"))
+
+
+def _load_assignments(db: Session, assignment_ids: Optional[Iterable[int]] = None):
+    query = db.query(StudentAssignment).options(
+        joinedload(StudentAssignment.student),
+        joinedload(StudentAssignment.team),
+        joinedload(StudentAssignment.question_group),
+        joinedload(StudentAssignment.grades).joinedload(Grade.teacher)
+    )
+    if assignment_ids is not None:
+        query = query.filter(StudentAssignment.id.in_(list(assignment_ids)))
+    return query.order_by(StudentAssignment.id).all()
+
+
+def _student_data(a: StudentAssignment) -> dict:
+    return {
+        "id": a.id,
+        "student_name": a.student.name,
+        "student_birth_year": a.student.birth_year,
+        "regular_teacher": a.student.regular_teacher,
+        "team": a.team.name if a.team else None,
+        "question_group": a.question_group.code if a.question_group else None,
+        "q10_mark": a.q10_mark,
+        "is_completed": a.is_completed,
+        "exam_incomplete": a.exam_incomplete,
+        "grades": [
+            {
+                "teacher_id": g.teacher_id,
+                "teacher_name": g.teacher.name if g.teacher else None,
+                "teacher_position": g.teacher.position if g.teacher else None,
+                "marks": {f"q{i}": getattr(g, f"q{i}_mark") for i in range(1, 10)},
+                "total": g.total_q1_q9
+            }
+            for g in a.grades
+        ]
+    }
+
+
+def _write_json(path: str, data: dict, compress: bool = False) -> None:
+    # Write to a temp file first so a crash never leaves a truncated backup behind
+    tmp_path = path + ".tmp"
+    opener = gzip.open if compress else open
+    with opener(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def create_backup(db: Session) -> str:
+    """Write a full snapshot of all student results"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+
+    assignments = [a for a in _load_assignments(db) if a.student]
+    backup_data = {
+        "backup_time": datetime.now().isoformat(),
+        "total_students": len(assignments),
+        "students": [_student_data(a) for a in assignments]
+    }
+
+    # Save with timestamp, and copy it as the "latest" version
+    # (microseconds, so two snapshots in one second never share a name the deltas point to)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    backup_file = os.path.join(BACKUP_DIR, f"backup_{timestamp}.json")
+    _write_json(backup_file, backup_data)
+    shutil.copyfile(backup_file, os.path.join(BACKUP_DIR, LATEST_BACKUP))
+
+    return backup_file
+
+
+def create_delta_backup(db: Session, assignment_ids: Iterable[int], base_file: str) -> str:
+    """Write a compressed backup of only the given assignments"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+
+    assignment_ids = sorted(assignment_ids)
+    students = [_student_data(a) for a in _load_assignments(db, assignment_ids) if a.student]
+    found = {s["id"] for s in students}
+    delta_data = {
+        "backup_time": datetime.now().isoformat(),
+        "base": os.path.basename(base_file),
+        "students": students,
+        "deleted": [i for i in assignment_ids if i not in found]
+    }
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    delta_file = os.path.join(BACKUP_DIR, f"delta_{timestamp}.json.gz")
+    _write_json(delta_file, delta_data, compress=True)
+    return delta_file
+
+
+class BackupWorker:
+    """Background thread that turns bursts of scheduled assignment ids into one backup"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # One flush at a time: the worker thread and the atexit flush can overlap
+        self._flush_lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self._full_requested = False
+        self._thread: Optional[threading.Thread] = None
+        self._last_full_file: Optional[str] = None
+        self._last_full_at = 0.0
+
+    def schedule(self, *assignment_ids: int, full: bool = False) -> None:
+        """Queue assignments for the next backup - returns immediately"""
+        with self._lock:
+            self._pending.update(assignment_ids)
+            self._full_requested = self._full_requested or full
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="backup-worker", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def flush(self) -> Optional[str]:
+        """Write whatever is pending right now (used on shutdown)"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, set()
+                full_requested, self._full_requested = self._full_requested, False
+                base_file = self._last_full_file
+                full = (
+                    full_requested or base_file is None
+                    or time.monotonic() - self._last_full_at >= BACKUP_FULL_INTERVAL_SECONDS
+                )
+            if not pending and not full_requested:
+                return None
+
+            db = SessionLocal()
+            try:
+                if full:
+                    # Written outside _lock so schedule() never waits for a snapshot
+                    backup_file = create_backup(db)
+                    with self._lock:
+                        self._last_full_file = backup_file
+                        self._last_full_at = time.monotonic()
+                    return backup_file
+                return create_delta_backup(db, pending, base_file)
+            except Exception as e:
+                # Keep the ids so the next backup retries them
+                with self._lock:
+                    self._pending.update(pending)
+                    self._full_requested = self._full_requested or full_requested
+                print(f"Backup error (non-critical): {e}")
+                return None
+            finally:
+                db.close()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Let a burst of edits accumulate before writing
+            time.sleep(BACKUP_COALESCE_SECONDS)
+            self._wakeup.clear()
+            self.flush()
+
+
+backup_worker = BackupWorker()
+atexit.register(backup_worker.flush)
+
+
+def schedule_backup(*assignment_ids: int, full: bool = False) -> None:
+    """Back up these assignments soon; full=True forces a full snapshot (after bulk deletes)"""
+    backup_worker.schedule(*assignment_ids, full=full)
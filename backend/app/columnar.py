@@ -0,0 +1,145 @@
+"""
+Typed, columnar exports of the session results (Parquet and Arrow IPC).
+
+The CSV exports are for people; these are for analysis. Every mark is a
+float64 column, so pandas / polars / DuckDB load the file without parsing
+text. Column names are plain ASCII (t1_q1, avg_q9, final_total ...) and the
+Kurdish header of each column is kept in the field metadata under "kurdish".
+
+Results are read from the cursor and written one record batch at a time,
+and the bytes go to the client as each batch is written, so memory stays
+bounded by BATCH_ROWS no matter how many students the session has.
+"""
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .database import SessionLocal
+from .results import ComputedResult, QUESTION_NUMBERS, MAX_TEACHERS, iter_results
+
+BATCH_ROWS = 5000  # Rows per record batch (and per Parquet row group)
+
+KURDISH_DIGITS = "٠١٢٣٤٥٦٧٨٩"
+
+
+def _kurdish_number(value: int) -> str:
+    return "".join(KURDISH_DIGITS[int(d)] for d in str(value))
+
+
+def _field(name: str, type_: pa.DataType, kurdish: str) -> pa.Field:
+    return pa.field(name, type_, metadata={"kurdish": kurdish})
+
+
+# (field, value of the column for one result)
+COLUMNS: List[tuple] = [
+    (_field("assignment_id", pa.int64(), "ژمارەی دابەشکردن"), lambda r: r.assignment_id),
+    (_field("student_id", pa.int64(), "ژمارەی قوتابی"), lambda r: r.student_id),
+    (_field("student_name", pa.string(), "ناوی قوتابی"), lambda r: r.student_name),
+    (_field("birth_year", pa.int32(), "ساڵی لەدایکبوون"), lambda r: r.student_birth_year),
+    (_field("regular_teacher", pa.string(), "مامۆستای بابەت"), lambda r: r.regular_teacher),
+    (_field("team", pa.string(), "تیم"), lambda r: r.team_name),
+    (_field("question_group", pa.string(), "گرووپی پرسیار"), lambda r: r.question_group_code),
+    (_field("exam_session_id", pa.int64(), "دانیشتن"), lambda r: r.exam_session_id),
+    (_field("status", pa.string(), "بارودۆخ"), lambda r: r.status),
+]
+for _position in range(1, MAX_TEACHERS + 1):
+    for _q in QUESTION_NUMBERS:
+        COLUMNS.append((
+            _field(f"t{_position}_q{_q}", pa.float64(), f"م{_kurdish_number(_position)} پ{_kurdish_number(_q)}"),
+            lambda r, p=_position - 1, q=_q - 1: r.teacher_marks[p][q],
+        ))
+for _q in QUESTION_NUMBERS:
+    COLUMNS.append((
+        _field(f"avg_q{_q}", pa.float64(), f"ناوەند پ{_kurdish_number(_q)}"),
+        lambda r, q=_q - 1: r.average_marks[q],
+    ))
+COLUMNS += [
+    (_field("total_q1_q9", pa.float64(), "کۆی پ١-پ٩"), lambda r: r.total_average_q1_q9),
+    (_field("q10", pa.float64(), "پ١٠"), lambda r: r.q10_mark),
+    (_field("final_total", pa.float64(), "کۆی گشتی"), lambda r: r.final_total),
+    (_field("passed", pa.bool_(), "دەرچوو/نەدەرچوو"), lambda r: r.passed),
+]
+
+
+def results_schema(exam_session_id: Optional[int] = None) -> pa.Schema:
+    return pa.schema([field for field, _ in COLUMNS], metadata={
+        "title": "ئەنجامی تاقیکردنەوە",
+        "exam_session_id": "" if exam_session_id is None else str(exam_session_id),
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+    })
+
+
+def _record_batch(results: List[ComputedResult], schema: pa.Schema) -> pa.RecordBatch:
+    arrays = [
+        pa.array([value(r) for r in results], type=field.type)
+        for field, value in COLUMNS
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object; the bytes written so far are taken out with drain()"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_writer(sink, schema: pa.Schema):
+    return pq.ParquetWriter(sink, schema, compression="zstd")
+
+
+def _arrow_writer(sink, schema: pa.Schema):
+    return pa.ipc.new_file(sink, schema)
+
+
+WRITERS: Dict[str, Callable] = {
+    "parquet": _parquet_writer,
+    "arrow": _arrow_writer,
+}
+
+
+def iter_export(file_format: str, exam_session_id: Optional[int]) -> Iterator[bytes]:
+    """
+    Yield the file as it is written, one record batch at a time.
+    Uses its own session because the response body outlives the request's dependencies.
+    """
+    schema = results_schema(exam_session_id)
+    sink = _ChunkSink()
+    writer = WRITERS[file_format](pa.PythonFile(sink, mode="w"), schema)
+    db = SessionLocal()
+    try:
+        batch: List[ComputedResult] = []
+        for result in iter_results(db, exam_session_id=exam_session_id, chunk_size=BATCH_ROWS):
+            batch.append(result)
+            if len(batch) == BATCH_ROWS:
+                writer.write_batch(_record_batch(batch, schema))
+                batch.clear()
+                yield sink.drain()
+        if batch:
+            writer.write_batch(_record_batch(batch, schema))
+        # Parquet and the Arrow file format both end with a footer
+        writer.close()
+        yield sink.drain()
+    finally:
+        db.close()
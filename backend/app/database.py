@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, TypeVar, Union
 import os
 from dotenv import load_dotenv
 
@@ -9,9 +12,108 @@ load_dotenv()
 # Use SQLite for simplicity - no external database server needed
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./iqraa_exam.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+# "sync": every endpoint uses the blocking engine on the threadpool.
+# "async": grading, assignment lookups and reports use an async engine (aiosqlite / psycopg)
+# on the event loop, so slow exports and backups can't use up the threads they need.
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+# SQLite tuning
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # Wait for locks instead of failing
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))  # Page cache per connection
+
+# Postgres connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Reconnect before the server drops idle connections
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+def normalize_database_url(url: str) -> str:
+    """Use the psycopg (v3) driver from requirements.txt for plain postgres URLs"""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        url = "postgresql+psycopg://" + url[len("postgresql://"):]
+    return url
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers and the writer work at the same time, synchronous=NORMAL
+    skips the fsync per commit that WAL doesn't need for durability across
+    app crashes, and busy_timeout makes concurrent writers queue up.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def create_db_engine(database_url: str = DATABASE_URL) -> Engine:
+    """Create the engine with production settings for SQLite or Postgres"""
+    database_url = normalize_database_url(database_url)
+
+    if database_url.startswith("sqlite"):
+        engine = create_engine(
+            database_url,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        )
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    return create_engine(
+        database_url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
+
+
+def async_database_url(url: str) -> str:
+    """The async driver for the same database"""
+    url = normalize_database_url(url)
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url  # psycopg (v3) is sync and async under one dialect
+
+
+def create_async_db_engine(database_url: str = DATABASE_URL):
+    """Async engine with the same SQLite pragmas / pool settings as create_db_engine"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    database_url = async_database_url(database_url)
+
+    if database_url.startswith("sqlite"):
+        engine = create_async_engine(database_url, connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000})
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    return create_async_engine(
+        database_url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    async_engine = create_async_db_engine()
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
 Base = declarative_base()
 
 def get_db():
@@ -20,3 +122,34 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ========== async def endpoints ==========
+# An AsyncSession in async mode, a plain Session in sync mode
+AnySession = Union[Session, "AsyncSession"]
+T = TypeVar("T")
+
+
+async def get_async_db():
+    """Session for `async def` endpoints - only use it through run_db"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def run_db(db: AnySession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run fn(session, *args, **kwargs) - ordinary sync SQLAlchemy code - without
+    blocking the event loop: through AsyncSession.run_sync in async mode, on
+    the threadpool in sync mode. Return plain data or response models: ORM
+    objects may be expired after fn commits, and can't lazy load outside it.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await db.run_sync(fn, *args, **kwargs)
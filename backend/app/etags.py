@@ -0,0 +1,65 @@
+"""
+Conditional GET support for read endpoints.
+
+The ETag of a response is derived from the versions (see versions.py) of the
+resources it is built from, the request path and query string, and a nonce
+picked at startup (the counters restart at zero with the process). A request
+whose If-None-Match matches gets an empty 304 before the endpoint runs - no
+query, no serialization.
+
+Usage:
+
+    @router.get("/", dependencies=[Depends(etag(versions.STUDENTS))])
+
+Browsers revalidate automatically: with `Cache-Control: no-cache` they keep
+the body and send If-None-Match on the next fetch, so the frontend needs no
+changes to benefit.
+"""
+import hashlib
+import os
+import uuid
+from typing import Optional
+from fastapi import HTTPException, Request, Response
+from . import versions
+
+BOOT_ID = uuid.uuid4().hex
+
+# Lists that change during an exam: always revalidate (cheap with the ETag)
+NO_CACHE = "no-cache"
+# Reference tables (teams, teachers, question groups) rarely change
+REFERENCE_MAX_AGE_SECONDS = int(os.getenv("REFERENCE_MAX_AGE_SECONDS", "60"))
+REFERENCE_CACHE = f"private, max-age={REFERENCE_MAX_AGE_SECONDS}, must-revalidate"
+
+
+def make_etag(request: Request, resources) -> str:
+    version = versions.get(*resources)
+    key = "|".join([
+        BOOT_ID,
+        request.url.path,
+        "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items())),
+        ",".join(f"{r}:{v}" for r, v in zip(resources, version))
+    ])
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def _matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Accept weak validators too - proxies may have added W/ when compressing
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return tag in candidates or f"W/{tag}" in candidates
+
+
+def etag(*resources: str, cache_control: str = NO_CACHE):
+    """Dependency that tags the response and answers 304 when the client's copy is current"""
+    # async: no I/O here, so don't send every conditional GET through the threadpool
+    async def check_etag(request: Request, response: Response):
+        # Read the versions before the endpoint queries (see versions.py)
+        tag = make_etag(request, resources)
+        headers = {"ETag": tag, "Cache-Control": cache_control}
+        if _matches(request.headers.get("if-none-match"), tag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return check_etag
@@ -0,0 +1,144 @@
+"""
+In-process publish/subscribe for the live progress feed (GET /events).
+
+Write endpoints run in FastAPI's threadpool; subscribers are SSE streams
+running on the event loop. publish() serializes the event once and hands it
+to every subscriber with loop.call_soon_threadsafe, so a request worker never
+waits on a client. Each subscriber has a bounded queue: a client that falls
+SUBSCRIBER_QUEUE_SIZE events behind has its backlog dropped and gets a single
+"resync" event telling it to reload instead.
+
+Like versions.py, this only reaches clients connected to this process - the
+API runs as a single uvicorn worker.
+"""
+import asyncio
+import json
+import threading
+from typing import Iterable, Set
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .models import StudentAssignment, AssignmentResult
+from .results import PROGRESS_FIELDS, team_progress
+
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+# Event types
+ASSIGNMENTS_CHANGED = "assignments"
+RESYNC = "resync"
+
+
+def format_event(event_type: str, data: dict) -> str:
+    """One Server-Sent Events message"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+    return f"event: {event_type}\ndata: {payload}\n\n"
+
+
+RESYNC_MESSAGE = format_event(RESYNC, {"reason": "overflow"})
+
+
+class Subscriber:
+    """One connected client - its queue is only touched from the event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, message: str) -> None:
+        if self.queue.full():
+            # Slow client: drop what it hasn't read and tell it to reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC_MESSAGE
+        self.queue.put_nowait(message)
+
+
+class EventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        """Call from the event loop that will read the subscriber's queue"""
+        subscriber = Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type: str, data: dict) -> None:
+        """Send an event to every subscriber - safe to call from any thread, never blocks"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        message = format_event(event_type, data)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, message)
+            except RuntimeError:
+                # The subscriber's loop is closed (server shutting down)
+                self.unsubscribe(subscriber)
+
+
+broker = EventBroker()
+
+
+def publish_assignment_changes(
+    db: Session,
+    assignment_ids: Iterable[int] = (),
+    deleted_ids: Iterable[int] = (),
+    team_ids: Iterable[int] = ()
+) -> None:
+    """
+    Publish the new flags of the given (committed) assignments and the updated
+    counters of their teams. team_ids adds teams whose counters changed
+    without one of their assignments being listed (e.g. an assignment that
+    moved away or was deleted).
+    """
+    if not broker.has_subscribers:
+        return
+
+    assignment_ids = list(assignment_ids)
+    assignments = []
+    if assignment_ids:
+        rows = db.execute(
+            select(
+                StudentAssignment.id,
+                StudentAssignment.team_id,
+                StudentAssignment.exam_session_id,
+                StudentAssignment.is_graded_teacher1,
+                StudentAssignment.is_graded_teacher2,
+                StudentAssignment.is_completed,
+                StudentAssignment.exam_incomplete,
+                StudentAssignment.q10_mark,
+                AssignmentResult.final_total,
+                AssignmentResult.passed
+            ).outerjoin(
+                AssignmentResult, AssignmentResult.assignment_id == StudentAssignment.id
+            ).where(StudentAssignment.id.in_(assignment_ids))
+        )
+        assignments = [dict(row._mapping) for row in rows]
+
+    # Counters cover every session, like /reports/summary without a session filter
+    teams = set(team_ids) | {a["team_id"] for a in assignments}
+    counts = team_progress(db, team_ids=teams) if teams else {}
+
+    empty = dict.fromkeys(PROGRESS_FIELDS, 0)
+    broker.publish(ASSIGNMENTS_CHANGED, {
+        "assignments": assignments,
+        "deleted": list(deleted_ids),
+        "teams": [{"team_id": team_id, **counts.get(team_id, empty)} for team_id in sorted(teams)]
+    })
+
+
+def publish_resync(reason: str) -> None:
+    """Tell clients to reload everything (bulk changes)"""
+    broker.publish(RESYNC, {"reason": reason})
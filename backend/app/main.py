@@ -1,80 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from .database import engine, Base, get_db, SessionLocal
-from .routers import teams, question_groups, students, exam_sessions, assignments, grades, reports
-from .models import Grade, StudentAssignment, ExamSession, Team, Teacher, QuestionGroup
-from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from .database import engine, async_engine, get_db
+from . import versions, metrics, startup
+from .events import publish_resync
+from .backups import schedule_backup
+from .routers import teams, teachers, question_groups, students, exam_sessions, assignments, grades, reports, events
+from .routers import metrics as metrics_router
+from .models import Grade, StudentAssignment, ExamSession, AssignmentResult
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
-def seed_database():
-    """Seed database with initial data if empty"""
-    db = SessionLocal()
-    try:
-        # Only seed if no teams exist
-        if db.query(Team).count() == 0:
-            print("🌱 Seeding database...")
-            
-            # Create Teams
-            teams_data = [
-                Team(name="لیژنەی یەکەم"),
-                Team(name="لیژنەی دووەم"),
-                Team(name="لیژنەی سێیەم"),
-                Team(name="لیژنەی چوارەم"),
-            ]
-            db.add_all(teams_data)
-            db.commit()
-            
-            # Create Teachers (2 per team)
-            teachers = [
-                Teacher(name="م. ام ارشد", team_id=1, position=1),
-                Teacher(name="م.تافان", team_id=1, position=2),
-                Teacher(name="م.باسیمە", team_id=2, position=1),
-                Teacher(name="م.نەرمین", team_id=2, position=2),
-                Teacher(name="د.شیلان", team_id=3, position=1),
-                Teacher(name="م.صبيحه", team_id=3, position=2),
-                Teacher(name="م.عظيمة", team_id=4, position=1),
-                Teacher(name="پەیام", team_id=4, position=2),
-            ]
-            db.add_all(teachers)
-            db.commit()
-            
-            # Create Question Groups (A-G)
-            groups = [
-                QuestionGroup(name="گروپی A", code="A", marks_structure={"q1": 4, "q2": 10, "q3": 8, "q4": 12, "q5": 16, "q6": 10, "q7": 8, "q8": 9, "q9": 13}, total_marks=90),
-                QuestionGroup(name="گروپی B", code="B", marks_structure={"q1": 10, "q2": 8, "q3": 10, "q4": 14, "q5": 9, "q6": 12, "q7": 7, "q8": 10, "q9": 10}, total_marks=90),
-                QuestionGroup(name="گروپی C", code="C", marks_structure={"q1": 10, "q2": 10, "q3": 9, "q4": 11, "q5": 10, "q6": 17, "q7": 6, "q8": 8, "q9": 9}, total_marks=90),
-                QuestionGroup(name="گروپی D", code="D", marks_structure={"q1": 8, "q2": 8, "q3": 10, "q4": 24, "q5": 4, "q6": 8, "q7": 8, "q8": 7, "q9": 13}, total_marks=90),
-                QuestionGroup(name="گروپی E", code="E", marks_structure={"q1": 8, "q2": 10, "q3": 10, "q4": 8, "q5": 12, "q6": 5, "q7": 7, "q8": 19, "q9": 11}, total_marks=90),
-                QuestionGroup(name="گروپی F", code="F", marks_structure={"q1": 8, "q2": 7, "q3": 10, "q4": 23, "q5": 8, "q6": 7, "q7": 13, "q8": 7, "q9": 7}, total_marks=90),
-                QuestionGroup(name="گروپی G", code="G", marks_structure={"q1": 8, "q2": 7, "q3": 10, "q4": 10, "q5": 7, "q6": 9, "q7": 13, "q8": 5, "q9": 21}, total_marks=90),
-            ]
-            db.add_all(groups)
-            db.commit()
-            
-            # Create active exam session
-            session = ExamSession(name="دانیشتنی تاقیکردنەوە", date=datetime.now(), is_active=True, num_rooms=4, teachers_per_room=2)
-            db.add(session)
-            db.commit()
-            
-            print("✅ Database seeded with 4 teams, 8 teachers, 7 question groups!")
-        else:
-            print("📦 Database already has data, skipping seed")
-    except Exception as e:
-        print(f"❌ Error seeding database: {e}")
-        db.rollback()
-    finally:
-        db.close()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema, seed data and the reference cache are prepared here rather than
+    # on import, so importing the app (tests, alembic, benchmarks) stays cheap
+    await run_in_threadpool(startup.run)
+    yield
 
-# Seed on startup
-seed_database()
 
 app = FastAPI(
     title="Iqraa Exam Grading System",
     description="API for managing exam grading with multiple teachers and question groups",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware for Svelte frontend
@@ -84,16 +34,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read the pagination headers
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
+# Per-route latency and SQL counts for /metrics and /debug/perf
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.install(engine)
+if async_engine is not None:
+    metrics.install(async_engine.sync_engine)
+
 # Include routers
 app.include_router(teams.router)
+app.include_router(teachers.router)
 app.include_router(question_groups.router)
 app.include_router(students.router)
 app.include_router(exam_sessions.router)
 app.include_router(assignments.router)
 app.include_router(grades.router)
 app.include_router(reports.router)
+app.include_router(events.router)
+app.include_router(metrics_router.router)
 
 
 @app.get("/")
@@ -116,8 +77,9 @@ def reset_all_grades(db: Session = Depends(get_db)):
     Delete all grades and assignments but keep students, teachers, teams, and question groups.
     This resets the system for a new exam session.
     """
-    # Delete all grades first (foreign key constraint)
+    # Delete all grades and stored results first (foreign key constraint)
     db.query(Grade).delete()
+    db.query(AssignmentResult).delete()
     
     # Delete all assignments
     db.query(StudentAssignment).delete()
@@ -126,6 +88,10 @@ def reset_all_grades(db: Session = Depends(get_db)):
     db.query(ExamSession).update({"is_active": False})
     
     db.commit()
+    versions.bump(versions.GRADES, versions.ASSIGNMENTS, versions.EXAM_SESSIONS)
+    publish_resync("reset")
+    # Deltas can't express a wipe - start from a new full snapshot
+    schedule_backup(full=True)
     
     return {
         "message": "هەموو نمرەکان و دابەشکردنەکان سڕانەوە",
@@ -143,11 +109,16 @@ def reset_everything(db: Session = Depends(get_db)):
     
     # Delete in order of dependencies
     db.query(Grade).delete()
+    db.query(AssignmentResult).delete()
     db.query(StudentAssignment).delete()
     db.query(ExamSession).delete()
     db.query(Student).delete()
     
     db.commit()
+    versions.bump(versions.GRADES, versions.ASSIGNMENTS, versions.EXAM_SESSIONS, versions.STUDENTS)
+    publish_resync("reset")
+    # Deltas can't express a wipe - start from a new full snapshot
+    schedule_backup(full=True)
     
     return {
         "message": "هەموو شتەکان سڕانەوە (قوتابیان، نمرەکان، دانیشتنەکان)",
@@ -0,0 +1,398 @@
+"""
+Per-request latency and SQL instrumentation.
+
+MetricsMiddleware times every request until its last body chunk is sent (so
+streamed CSV exports count in full) and labels it with the route template,
+e.g. /assignments/{assignment_id} - never the raw path, which would make one
+series per id. While a request runs, its RequestStats sits in a context
+variable; the engine's cursor events add each statement's count and time to
+it. Context variables follow the request into the threadpool, so sync
+endpoints are counted too. DB time is the time spent in cursor.execute() -
+on SQLite that runs until the first row is ready, so fetching a large result
+is not included. Statements slower than SLOW_QUERY_MS are kept as samples in
+a small ring buffer.
+
+Everything is aggregated in process (like versions.py, the API runs as one
+worker) and served by GET /metrics in the Prometheus text format and by
+GET /debug/perf as compact JSON. The per-statement cost is two
+perf_counter() calls and a context variable lookup, and each request takes
+one short lock at the end - cheap enough to leave on. METRICS_ENABLED=false
+turns it off.
+
+Query budget: every request may run at most DEFAULT_QUERY_BUDGET statements
+unless its route declares its own with the query_budget() dependency:
+
+    @router.get("/student-results", dependencies=[Depends(query_budget(2))])
+
+Statement counts that grow with the data - an N+1 - blow the budget as soon
+as there are a few rows. The over-budget request is logged with the statement
+it repeated most; with QUERY_BUDGET_MODE=raise (benchmarks, tests) the
+statement past the budget raises QueryBudgetExceeded instead, so the request
+fails. QUERY_BUDGET_MODE=off skips the per-statement bookkeeping.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_SAMPLES = int(os.getenv("SLOW_QUERY_SAMPLES", "50"))
+SLOW_QUERY_TEXT_LENGTH = 500
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").lower()  # log, raise or off
+# The most a fixed route runs today is 10 (creating an assignment on a cold reference cache)
+DEFAULT_QUERY_BUDGET = int(os.getenv("DEFAULT_QUERY_BUDGET", "12"))
+BUDGET_ENABLED = QUERY_BUDGET_MODE in ("log", "raise")
+
+# Histogram upper bounds (+Inf is implied)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+UNMATCHED_ROUTE = "unmatched"  # 404s - one label for every unknown path
+BACKGROUND_ROUTE = "background"  # Statements outside a request (backup worker, startup)
+# Long-lived streams: their duration is how long the client stayed, not a latency
+UNTIMED_ROUTES = {"/events"}
+
+
+def route_of(scope) -> str:
+    """Route template the router matched, e.g. /assignments/{assignment_id}"""
+    return getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+
+class RequestStats:
+    """Counters of the request being handled - only touched by that request"""
+    __slots__ = ("statements", "db_seconds", "scope", "budget", "statement_counts")
+
+    def __init__(self, scope):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.scope = scope
+        self.budget = DEFAULT_QUERY_BUDGET if BUDGET_ENABLED else None
+        self.statement_counts = Counter() if BUDGET_ENABLED else None
+
+    @property
+    def route(self) -> str:
+        return route_of(self.scope)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request ran more statements than its route's budget (QUERY_BUDGET_MODE=raise)"""
+
+
+def query_budget(max_statements: Optional[int]):
+    """
+    Dependency that sets the route's statement budget. None: no budget, for
+    bulk routes whose statement count follows the upload size by design.
+    """
+    async def set_query_budget():
+        stats = _current.get()
+        if stats is not None and stats.statement_counts is not None:
+            stats.budget = max_statements
+    return set_query_budget
+
+
+def extend_query_budget(statements: int) -> None:
+    """
+    Allow the current request `statements` more than its route's budget - for
+    bulk routes whose statement count grows with the chunks they write.
+    """
+    stats = _current.get()
+    if stats is not None and stats.budget is not None:
+        stats.budget += statements
+
+
+def _over_budget(stats: RequestStats) -> bool:
+    return stats.budget is not None and stats.statements > stats.budget
+
+
+def budget_message(stats: RequestStats, method: str) -> str:
+    statement, count = stats.statement_counts.most_common(1)[0]
+    return (f"{method} {stats.route} ran {stats.statements} SQL statements (budget {stats.budget}), "
+            f"{count}x: {_short_statement(statement)}")
+
+
+def _short_statement(statement: str) -> str:
+    return " ".join(statement.split())[:SLOW_QUERY_TEXT_LENGTH]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (max for +Inf)"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses: Dict[int, int] = {}
+        self.over_budget = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_SAMPLES)
+        self.background_statements = 0
+        self.background_db_seconds = 0.0
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        with self._lock:
+            metrics = self.routes.get((method, route))
+            if metrics is None:
+                metrics = self.routes[(method, route)] = RouteMetrics()
+            metrics.latency.observe(seconds)
+            metrics.statements.observe(stats.statements)
+            metrics.db_seconds += stats.db_seconds
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            if _over_budget(stats):
+                metrics.over_budget += 1
+
+    def record_statement(self, statement: str, seconds: float, stats: Optional[RequestStats]) -> None:
+        if stats is None:
+            with self._lock:
+                self.background_statements += 1
+                self.background_db_seconds += seconds
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            # deque.append is atomic; the oldest sample drops out
+            self.slow_queries.append({
+                "route": stats.route if stats else BACKGROUND_ROUTE,
+                "ms": round(seconds * 1000, 1),
+                "statement": _short_statement(statement),
+                "at": datetime.now().isoformat(timespec="seconds"),
+            })
+
+    def reset(self) -> None:
+        with self._lock:
+            self.routes.clear()
+            self.slow_queries.clear()
+            self.background_statements = 0
+            self.background_db_seconds = 0.0
+            self.started_at = time.time()
+
+    # ========== Views ==========
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            routes = sorted(self.routes.items())
+            lines = []
+
+            def histogram(name, help_text, pick):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), metrics in routes:
+                    h = pick(metrics)
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    cumulative = 0
+                    for bound, count in zip(h.buckets + ("+Inf",), h.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {h.total:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+            histogram("iqraa_http_request_duration_seconds", "Request latency until the last body chunk",
+                      lambda m: m.latency)
+            histogram("iqraa_db_statements_per_request", "SQL statements executed per request",
+                      lambda m: m.statements)
+
+            lines.append("# HELP iqraa_http_responses_total Responses by status code")
+            lines.append("# TYPE iqraa_http_responses_total counter")
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'iqraa_http_responses_total{{method="{method}",route="{_escape(route)}",'
+                                 f'status="{status}"}} {count}')
+
+            lines.append("# HELP iqraa_query_budget_exceeded_total Requests that ran more statements than their budget")
+            lines.append("# TYPE iqraa_query_budget_exceeded_total counter")
+            for (method, route), metrics in routes:
+                if metrics.over_budget:
+                    lines.append(f'iqraa_query_budget_exceeded_total{{method="{method}",route="{_escape(route)}"}} '
+                                 f'{metrics.over_budget}')
+
+            lines.append("# HELP iqraa_db_seconds_total Time spent in SQL statements")
+            lines.append("# TYPE iqraa_db_seconds_total counter")
+            for (method, route), metrics in routes:
+                lines.append(f'iqraa_db_seconds_total{{method="{method}",route="{_escape(route)}"}} '
+                             f'{metrics.db_seconds:.6f}')
+            lines.append(f'iqraa_db_seconds_total{{method="",route="{BACKGROUND_ROUTE}"}} '
+                         f'{self.background_db_seconds:.6f}')
+
+            lines.append("# HELP iqraa_db_background_statements_total SQL statements run outside a request")
+            lines.append("# TYPE iqraa_db_background_statements_total counter")
+            lines.append(f"iqraa_db_background_statements_total {self.background_statements}")
+
+            lines.append("# HELP iqraa_db_slow_statement_samples Slow statements currently kept as samples")
+            lines.append("# TYPE iqraa_db_slow_statement_samples gauge")
+            lines.append(f"iqraa_db_slow_statement_samples {len(self.slow_queries)}")
+
+            lines.append("# HELP iqraa_process_start_time_seconds When the counters started")
+            lines.append("# TYPE iqraa_process_start_time_seconds gauge")
+            lines.append(f"iqraa_process_start_time_seconds {self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Compact per-route view for /debug/perf, slowest routes first"""
+        with self._lock:
+            routes = []
+            for (method, route), m in self.routes.items():
+                count = m.latency.count
+                routes.append({
+                    "route": f"{method} {route}",
+                    "requests": count,
+                    "avg_ms": round(m.latency.total / count * 1000, 1),
+                    "p95_ms": round(m.latency.quantile(0.95) * 1000, 1),
+                    "max_ms": round(m.latency.max * 1000, 1),
+                    "avg_statements": round(m.statements.total / count, 1),
+                    "max_statements": int(m.statements.max),
+                    "avg_db_ms": round(m.db_seconds / count * 1000, 1),
+                    "errors": sum(n for status, n in m.statuses.items() if status >= 500),
+                    "over_budget": m.over_budget,
+                })
+            routes.sort(key=lambda r: r["avg_ms"] * r["requests"], reverse=True)
+            return {
+                "since": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "slow_query_ms": SLOW_QUERY_MS,
+                "routes": routes,
+                "background": {
+                    "statements": self.background_statements,
+                    "db_ms": round(self.background_db_seconds * 1000, 1),
+                },
+                "slow_queries": list(reversed(self.slow_queries)),
+            }
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+# ========== SQL events ==========
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's execution context, not the pooled connection: a
+    # statement that fails never reaches after_cursor_execute, and its start
+    # time goes away with the context. (Defaults run before a statement have
+    # no context; they overwrite one slot, so nothing accumulates either.)
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+    else:
+        conn.info["metrics_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        started = context._metrics_started
+    else:
+        started = conn.info.pop("metrics_started")
+    seconds = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += seconds
+        if stats.budget is not None:
+            stats.statement_counts[statement] += 1
+            if QUERY_BUDGET_MODE == "raise" and stats.statements == stats.budget + 1:
+                raise QueryBudgetExceeded(budget_message(stats, stats.scope["method"]))
+    registry.record_statement(statement, seconds, stats)
+
+
+def install(engine: Engine) -> None:
+    """Count and time the statements of `engine` (for an AsyncEngine pass engine.sync_engine)"""
+    if not METRICS_ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ========== Middleware ==========
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: no extra task or body buffering per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def finish():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            route = route_of(scope)
+            if _over_budget(stats):
+                print(f"⚠️ Query budget exceeded: {budget_message(stats, scope['method'])}")
+            if route in UNTIMED_ROUTES:
+                return
+            registry.record_request(
+                scope["method"],
+                route,
+                status,
+                time.perf_counter() - started,
+                stats
+            )
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Errors and disconnected clients never send the last chunk
+            finish()
+            _current.reset(token)
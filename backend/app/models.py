@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, JSON, Index
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 from .database import Base
+from .search import normalize_search_text, install_search_index
 
 
 class Team(Base):
@@ -75,14 +76,45 @@ class Student(Base):
     is_second_term = Column(Boolean, default=False)  # قوتابی وەرزی دووەم - retaking the exam
     previous_question_group = Column(String(10), nullable=True)  # گرووپی پرسیاری پێشووی - previous group code (A-G)
     
+    # Name folded to one spelling for search (see search.py); Core inserts get it from the default
+    search_key = Column(
+        String(100),
+        nullable=True,
+        default=lambda context: normalize_search_text(context.get_current_parameters().get("name"))
+    )
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     
     assignments = relationship("StudentAssignment", back_populates="student")
+    
+    __table_args__ = (
+        # Trigram index for substring search on Postgres; SQLite uses the FTS5 table instead
+        Index(
+            "ix_students_search_key", "search_key",
+            postgresql_using="gin", postgresql_ops={"search_key": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+    
+    @validates("name")
+    def _set_search_key(self, key, name):
+        self.search_key = normalize_search_text(name)
+        return name
+
+
+install_search_index(Student.__table__)
 
 
 class StudentAssignment(Base):
     """Assignment of student to team and question group for a specific exam"""
     __tablename__ = "student_assignments"
+    __table_args__ = (
+        # Duplicate check when assigning a student to a session
+        Index("ix_student_assignments_student_session", "student_id", "exam_session_id"),
+        # Session reports and dashboards, filtered by team and completion
+        Index("ix_student_assignments_session_team_completed", "exam_session_id", "team_id", "is_completed"),
+        # Teacher view: a team's (pending) assignments
+        Index("ix_student_assignments_team_completed", "team_id", "is_completed"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
@@ -107,11 +139,17 @@ class StudentAssignment(Base):
     question_group = relationship("QuestionGroup", back_populates="student_assignments")
     exam_session = relationship("ExamSession", back_populates="student_assignments")
     grades = relationship("Grade", back_populates="assignment")
+    result = relationship("AssignmentResult", back_populates="assignment", uselist=False)
 
 
 class Grade(Base):
     """Individual grades from each teacher"""
     __tablename__ = "grades"
+    __table_args__ = (
+        # One grade per teacher per assignment - also serves lookups by assignment
+        Index("uq_grades_assignment_teacher", "assignment_id", "teacher_id", unique=True),
+        Index("ix_grades_teacher_id", "teacher_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("student_assignments.id"), nullable=False)
@@ -139,3 +177,37 @@ class Grade(Base):
     
     assignment = relationship("StudentAssignment", back_populates="grades")
     teacher = relationship("Teacher", back_populates="grades")
+
+
+class AssignmentResult(Base):
+    """Averaged marks and totals per assignment - recomputed whenever its grades or Q10 change"""
+    __tablename__ = "assignment_results"
+    
+    assignment_id = Column(Integer, ForeignKey("student_assignments.id"), primary_key=True)
+    
+    # Average of all teachers' marks for Q1-Q9
+    avg_q1 = Column(Float, nullable=True)
+    avg_q2 = Column(Float, nullable=True)
+    avg_q3 = Column(Float, nullable=True)
+    avg_q4 = Column(Float, nullable=True)
+    avg_q5 = Column(Float, nullable=True)
+    avg_q6 = Column(Float, nullable=True)
+    avg_q7 = Column(Float, nullable=True)
+    avg_q8 = Column(Float, nullable=True)
+    avg_q9 = Column(Float, nullable=True)
+    
+    total_average_q1_q9 = Column(Float, nullable=True)  # Rounded to 2 decimals
+    final_total = Column(Float, nullable=True)  # Q1-Q9 average total + Q10
+    passed = Column(Boolean, nullable=True)  # None while the result is still pending
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    assignment = relationship("StudentAssignment", back_populates="result")
+
+
+class SeedMarker(Base):
+    """One row, written once the default data exists - startup looks it up instead of counting teams"""
+    __tablename__ = "seed_marker"
+    
+    id = Column(Integer, primary_key=True)  # Always 1
+    seeded_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,99 @@
+"""
+Keyset pagination and sparse field selection for list endpoints.
+
+Pages are ordered by id and continue from the last id of the previous page
+(`after_id`), so every page is an index range scan - page 500 costs the same
+as page 1, unlike OFFSET. The next cursor is sent in the X-Next-Cursor header
+(absent on the last page) and the number of matching rows in X-Total-Count.
+
+Totals are cached per filter combination until one of the listed resources
+changes (see versions.py), so paging through a large list counts once.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy import Select
+from sqlalchemy.orm import Query, Session
+from . import versions
+
+MAX_PAGE_SIZE = 1000
+MAX_CACHED_COUNTS = 512
+
+_count_cache: Dict[tuple, Tuple[tuple, int]] = {}
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """`fields=id,name` -> ['id', 'name'] (id is always included); None means every field"""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+
+def cached_count(key: tuple, resources: Iterable[str], count: Callable[[], int]) -> int:
+    """Row count for a filter combination, recomputed only after its resources change"""
+    resources = tuple(resources)
+    # Read the version before counting (see versions.py)
+    version = versions.get(*resources)
+    cached = _count_cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    total = count()
+    if len(_count_cache) >= MAX_CACHED_COUNTS:
+        _count_cache.clear()
+    _count_cache[key] = (version, total)
+    return total
+
+
+def keyset_page(
+    query: Query,
+    id_column,
+    after_id: Optional[int],
+    limit: Optional[int],
+    offset: int = 0
+) -> Tuple[list, Optional[int]]:
+    """Rows after `after_id` in id order, plus the cursor of the next page (None on the last page)"""
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    query = query.order_by(id_column)
+    if offset:
+        query = query.offset(offset)  # Old skip= clients only
+    if limit is None:
+        return query.all(), None
+
+    # One extra row tells whether another page exists
+    return _split_page(query.limit(limit + 1).all(), limit)
+
+
+def keyset_select(
+    db: Session,
+    statement: Select,
+    id_column,
+    after_id: Optional[int],
+    limit: Optional[int]
+) -> Tuple[list, Optional[int]]:
+    """keyset_page for a Core select: returns its result rows"""
+    if after_id is not None:
+        statement = statement.where(id_column > after_id)
+    statement = statement.order_by(id_column)
+    if limit is None:
+        return db.execute(statement).all(), None
+    return _split_page(db.execute(statement.limit(limit + 1)).all(), limit)
+
+
+def _split_page(rows: list, limit: int) -> Tuple[list, Optional[int]]:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+
+def set_page_headers(response: Response, total: int, next_cursor: Optional[int]) -> None:
+    response.headers["X-Total-Count"] = str(total)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
@@ -0,0 +1,189 @@
+"""
+In-process cache of reference data: question groups, teams, teachers and the
+active exam session.
+
+This data changes a few times per exam day, but grade writes and reports read
+it constantly. Each entry is tagged with the data versions it was loaded at
+(see versions.py); the question-group, team/teacher and exam-session write
+endpoints bump those versions, which invalidates the entry, and the next read
+reloads it in one query.
+
+Cached values are plain frozen snapshots, never ORM instances, so they can be
+shared safely across requests and sessions.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from . import versions
+from .models import QuestionGroup, Team, Teacher, ExamSession
+
+
+@dataclass(frozen=True)
+class CachedQuestionGroup:
+    id: int
+    name: str
+    code: str
+    marks_structure: Dict[str, int]
+    total_marks: int
+
+
+@dataclass(frozen=True)
+class CachedTeam:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class CachedTeacher:
+    id: int
+    name: str
+    team_id: int
+    team_name: Optional[str]
+    position: int
+
+
+@dataclass(frozen=True)
+class ActiveSessionContext:
+    id: int
+    num_rooms: int
+    teachers_per_room: int
+    team_ids: Tuple[int, ...]  # The first num_rooms teams
+
+
+class _CachedEntry:
+    """A value loaded from the database and kept until one of its resources changes"""
+
+    def __init__(self, resources: Tuple[str, ...], loader: Callable[[Session], object]):
+        self.resources = resources
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+
+    def get(self, db: Session):
+        # Read the version before loading so a concurrent write invalidates what we load
+        version = versions.get(*self.resources)
+        if self._version == version:
+            return self._value
+        # Never wait for the lock: in DB_MODE=async the loader holding it can be
+        # suspended mid-query on this same thread. Concurrent misses load their own copy.
+        if not self._lock.acquire(blocking=False):
+            return self.loader(db)
+        try:
+            if self._version != version:
+                self._value = self._load_after(db)
+                self._version = version
+            return self._value
+        finally:
+            self._lock.release()
+
+    def _load_after(self, db: Session):
+        """
+        Load in a transaction that starts now. The caller's may already hold an
+        older snapshot (SQLite WAL, once it has written) from before the commit
+        that bumped the version, and that value would be cached as current.
+        """
+        if not db.in_transaction():
+            return self.loader(db)
+        # Same engine as the caller's session (its sync facade in DB_MODE=async)
+        with Session(bind=db.get_bind()) as fresh:
+            return self.loader(fresh)
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._value = None
+
+
+def _load_question_groups(db: Session) -> Dict[int, CachedQuestionGroup]:
+    return {
+        g.id: CachedQuestionGroup(
+            id=g.id,
+            name=g.name,
+            code=g.code,
+            marks_structure=dict(g.marks_structure or {}),
+            total_marks=g.total_marks
+        )
+        for g in db.query(QuestionGroup).order_by(QuestionGroup.code)
+    }
+
+
+def _load_teams(db: Session) -> Dict[int, CachedTeam]:
+    return {t.id: CachedTeam(id=t.id, name=t.name) for t in db.query(Team).order_by(Team.id)}
+
+
+def _load_teachers(db: Session) -> Dict[int, CachedTeacher]:
+    rows = db.query(Teacher, Team.name).outerjoin(Team, Team.id == Teacher.team_id).order_by(Teacher.id)
+    return {
+        t.id: CachedTeacher(id=t.id, name=t.name, team_id=t.team_id, team_name=team_name, position=t.position)
+        for t, team_name in rows
+    }
+
+
+def _load_active_session(db: Session) -> Optional[ActiveSessionContext]:
+    session = db.query(ExamSession).filter(ExamSession.is_active == True).first()
+    if not session:
+        return None
+    num_rooms = session.num_rooms or 4
+    team_ids = tuple(t.id for t in db.query(Team.id).order_by(Team.id).limit(num_rooms))
+    return ActiveSessionContext(
+        id=session.id,
+        num_rooms=num_rooms,
+        teachers_per_room=session.teachers_per_room or 2,
+        team_ids=team_ids
+    )
+
+
+_question_groups = _CachedEntry((versions.QUESTION_GROUPS,), _load_question_groups)
+_teams = _CachedEntry((versions.TEAMS,), _load_teams)
+_teachers = _CachedEntry((versions.TEACHERS, versions.TEAMS), _load_teachers)
+_active_session = _CachedEntry((versions.EXAM_SESSIONS, versions.TEAMS), _load_active_session)
+
+
+# ========== Question Groups ==========
+def question_groups(db: Session) -> List[CachedQuestionGroup]:
+    """All question groups, ordered by code"""
+    return list(_question_groups.get(db).values())
+
+
+def question_group(db: Session, group_id: int) -> Optional[CachedQuestionGroup]:
+    return _question_groups.get(db).get(group_id)
+
+
+def question_group_by_code(db: Session, code: str) -> Optional[CachedQuestionGroup]:
+    for group in _question_groups.get(db).values():
+        if group.code == code:
+            return group
+    return None
+
+
+# ========== Teams & Teachers ==========
+def teams(db: Session) -> List[CachedTeam]:
+    """All teams, ordered by id"""
+    return list(_teams.get(db).values())
+
+
+def team(db: Session, team_id: int) -> Optional[CachedTeam]:
+    return _teams.get(db).get(team_id)
+
+
+def teachers(db: Session) -> List[CachedTeacher]:
+    """All teachers with their team name and position, ordered by id"""
+    return list(_teachers.get(db).values())
+
+
+def teacher(db: Session, teacher_id: int) -> Optional[CachedTeacher]:
+    return _teachers.get(db).get(teacher_id)
+
+
+# ========== Exam Session ==========
+def active_session(db: Session) -> Optional[ActiveSessionContext]:
+    """The active exam session with its room (team) ids, or None"""
+    return _active_session.get(db)
+
+
+def clear() -> None:
+    """Drop everything (e.g. after changing data outside the API)"""
+    for entry in (_question_groups, _teams, _teachers, _active_session):
+        entry.clear()
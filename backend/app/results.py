@@ -0,0 +1,335 @@
+"""
+Results computation shared by the student-results report and the CSV exports.
+
+Averages, totals and pass/fail are stored per assignment in the
+assignment_results table. Every write path that touches grades, Q10 or an
+assignment's team calls refresh_assignment_results() before committing, so
+reports read the stored values instead of recomputing them from raw grades.
+
+Per-teacher marks (needed by the detailed views) are loaded with the same
+single joined query, so a full-session report costs a constant number of
+queries no matter how many grades exist.
+"""
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional
+from sqlalchemy import select, delete, insert, func, case
+from sqlalchemy.orm import Session
+from .models import (
+    Grade, StudentAssignment, Teacher, Student,
+    Team, QuestionGroup, AssignmentResult
+)
+
+QUESTION_NUMBERS = range(1, 10)  # Q1-Q9 are graded by the teachers
+MAX_TEACHERS = 3  # Up to 3 teachers per room
+PASS_MARK = 80
+REFRESH_BATCH_SIZE = 1000  # Rows inserted per statement when rebuilding
+
+# Status labels (Kurdish)
+STATUS_INCOMPLETE = 'تەواونەکرد'
+STATUS_COMPLETED = 'تەواوبوو'
+STATUS_PENDING = 'چاوەڕوان'
+PASSED = 'دەرچوو'
+FAILED = 'نەدەرچوو'
+
+MARK_COLUMNS = [getattr(Grade, f"q{i}_mark") for i in QUESTION_NUMBERS]
+AVERAGE_COLUMNS = [getattr(AssignmentResult, f"avg_q{i}") for i in QUESTION_NUMBERS]
+
+
+@dataclass
+class ComputedResult:
+    """Result for one student assignment"""
+    assignment_id: int
+    student_id: int
+    student_name: str
+    student_birth_year: Optional[int]
+    regular_teacher: Optional[str]
+    team_id: int
+    team_name: str
+    question_group_id: int
+    question_group_code: str
+    exam_session_id: Optional[int]
+    q10_mark: Optional[float]
+    is_completed: bool
+    exam_incomplete: bool
+    # teacher_marks[position - 1][question - 1], only loaded when requested
+    teacher_marks: Optional[List[List[Optional[float]]]]
+    average_marks: List[Optional[float]]
+    total_average_q1_q9: Optional[float]  # Rounded, None until something is graded
+    final_total: Optional[float]  # Rounded, None until Q1-Q9 and Q10 are both in
+
+    @property
+    def status(self) -> str:
+        if self.exam_incomplete:
+            return STATUS_INCOMPLETE
+        if self.final_total is not None:
+            return STATUS_COMPLETED
+        return STATUS_PENDING
+
+    @property
+    def passed(self) -> Optional[bool]:
+        """True/False once a result is final, None while still pending"""
+        return _passed(self.final_total, self.exam_incomplete)
+
+    @property
+    def pass_label(self) -> str:
+        if self.passed is None:
+            return '-'
+        return PASSED if self.passed else FAILED
+
+
+def _passed(final_total: Optional[float], exam_incomplete: bool) -> Optional[bool]:
+    if exam_incomplete:
+        return False
+    if final_total is None:
+        return None
+    return final_total >= PASS_MARK
+
+
+def _average_columns(teacher_marks: List[List[Optional[float]]]) -> List[Optional[float]]:
+    """Per-question average over every teacher who gave a mark"""
+    averages = []
+    for column in zip(*teacher_marks):
+        present = [m for m in column if m is not None]
+        averages.append(sum(present) / len(present) if present else None)
+    return averages
+
+
+def _collect_teacher_marks(rows) -> List[List[Optional[float]]]:
+    teacher_marks = [[None] * len(QUESTION_NUMBERS) for _ in range(MAX_TEACHERS)]
+    for row in rows:
+        # Grades from deleted teachers (or no grade at all) have no position
+        if row.position and 1 <= row.position <= MAX_TEACHERS:
+            teacher_marks[row.position - 1] = [getattr(row, f"q{i}_mark") for i in QUESTION_NUMBERS]
+    return teacher_marks
+
+
+# ========== Maintaining assignment_results ==========
+def _compute_stored_values(assignment_id: int, q10_mark, exam_incomplete, rows) -> dict:
+    average_marks = _average_columns(_collect_teacher_marks(rows))
+    total_avg = sum(a for a in average_marks if a is not None)
+
+    final_total = None
+    if total_avg > 0 and q10_mark is not None:
+        final_total = round(total_avg + q10_mark, 2)
+
+    values = {"assignment_id": assignment_id}
+    for i, avg in zip(QUESTION_NUMBERS, average_marks):
+        values[f"avg_q{i}"] = avg
+    values["total_average_q1_q9"] = round(total_avg, 2) if total_avg > 0 else None
+    values["final_total"] = final_total
+    values["passed"] = _passed(final_total, bool(exam_incomplete))
+    return values
+
+
+def refresh_assignment_results(
+    db: Session,
+    assignment_ids: Optional[Iterable[int]] = None,
+    team_id: Optional[int] = None
+) -> int:
+    """
+    Recompute the stored results of the given assignments (or of a whole team,
+    or of everything when no filter is given) inside the caller's transaction.
+    The caller commits.
+    """
+    db.flush()
+
+    targets = select(StudentAssignment.id)
+    if assignment_ids is not None:
+        assignment_ids = list(assignment_ids)
+        if not assignment_ids:
+            return 0
+        targets = targets.where(StudentAssignment.id.in_(assignment_ids))
+    if team_id is not None:
+        targets = targets.where(StudentAssignment.team_id == team_id)
+
+    db.execute(delete(AssignmentResult).where(AssignmentResult.assignment_id.in_(targets)))
+
+    query = select(
+        StudentAssignment.id.label("assignment_id"),
+        StudentAssignment.q10_mark,
+        StudentAssignment.exam_incomplete,
+        Teacher.position,
+        *MARK_COLUMNS
+    ).outerjoin(
+        Grade, Grade.assignment_id == StudentAssignment.id
+    ).outerjoin(
+        Teacher, Teacher.id == Grade.teacher_id
+    ).where(
+        StudentAssignment.id.in_(targets)
+    ).order_by(StudentAssignment.id, Teacher.position)
+
+    values = []
+    for assignment_id, rows in groupby(db.execute(query), key=lambda r: r.assignment_id):
+        rows = list(rows)
+        values.append(_compute_stored_values(assignment_id, rows[0].q10_mark, rows[0].exam_incomplete, rows))
+
+    for start in range(0, len(values), REFRESH_BATCH_SIZE):
+        # Table-level insert: one executemany per batch (the ORM form splits rows by which values are NULL)
+        db.execute(insert(AssignmentResult.__table__), values[start:start + REFRESH_BATCH_SIZE])
+    return len(values)
+
+
+def missing_result_ids(db: Session) -> List[int]:
+    """Assignments that have no stored result row (never computed, or dropped as stale)"""
+    stored = select(AssignmentResult.assignment_id).where(
+        AssignmentResult.assignment_id == StudentAssignment.id
+    ).exists()
+    return list(db.scalars(select(StudentAssignment.id).where(~stored).order_by(StudentAssignment.id)))
+
+
+def refresh_missing_results(db: Session) -> int:
+    """Compute the stored results that are missing, REFRESH_BATCH_SIZE assignments at a time. The caller commits."""
+    missing = missing_result_ids(db)
+    for start in range(0, len(missing), REFRESH_BATCH_SIZE):
+        refresh_assignment_results(db, missing[start:start + REFRESH_BATCH_SIZE])
+    return len(missing)
+
+
+# ========== Progress counters ==========
+PROGRESS_FIELDS = ("total", "completed", "pending_teacher1_grading", "pending_teacher2_grading", "pending_q10")
+
+
+def _count_where(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def team_progress(
+    db: Session,
+    exam_session_id: Optional[int] = None,
+    team_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Dict[str, int]]:
+    """Assignment counters (PROGRESS_FIELDS) per team, in one pass over the assignments"""
+    query = select(
+        StudentAssignment.team_id,
+        func.count(StudentAssignment.id),
+        _count_where(StudentAssignment.is_completed.is_(True)),
+        _count_where(StudentAssignment.is_graded_teacher1.isnot(True)),
+        _count_where(StudentAssignment.is_graded_teacher2.isnot(True)),
+        _count_where(StudentAssignment.q10_mark.is_(None))
+    ).group_by(StudentAssignment.team_id)
+    if exam_session_id:
+        query = query.where(StudentAssignment.exam_session_id == exam_session_id)
+    if team_ids is not None:
+        query = query.where(StudentAssignment.team_id.in_(list(team_ids)))
+    return {
+        row[0]: dict(zip(PROGRESS_FIELDS, (int(n or 0) for n in row[1:])))
+        for row in db.execute(query)
+    }
+
+
+# ========== Reading results ==========
+def _results_query(
+    team_id: Optional[int] = None,
+    question_group_id: Optional[int] = None,
+    exam_session_id: Optional[int] = None,
+    include_marks: bool = True
+):
+    """
+    One row per assignment with its stored result, or one row per
+    (assignment, grade) when the per-teacher marks are included.
+    """
+    columns = [
+        StudentAssignment.id.label("assignment_id"),
+        StudentAssignment.team_id,
+        StudentAssignment.question_group_id,
+        StudentAssignment.exam_session_id,
+        StudentAssignment.q10_mark,
+        StudentAssignment.is_completed,
+        StudentAssignment.exam_incomplete,
+        Student.id.label("student_id"),
+        Student.name.label("student_name"),
+        Student.birth_year.label("student_birth_year"),
+        Student.regular_teacher,
+        Team.name.label("team_name"),
+        QuestionGroup.code.label("question_group_code"),
+        *AVERAGE_COLUMNS,
+        AssignmentResult.total_average_q1_q9,
+        AssignmentResult.final_total
+    ]
+    if include_marks:
+        columns += [Teacher.position, *MARK_COLUMNS]
+
+    query = select(*columns).join(
+        Student, Student.id == StudentAssignment.student_id
+    ).join(
+        Team, Team.id == StudentAssignment.team_id
+    ).join(
+        QuestionGroup, QuestionGroup.id == StudentAssignment.question_group_id
+    ).outerjoin(
+        AssignmentResult, AssignmentResult.assignment_id == StudentAssignment.id
+    )
+    if include_marks:
+        query = query.outerjoin(
+            Grade, Grade.assignment_id == StudentAssignment.id
+        ).outerjoin(
+            Teacher, Teacher.id == Grade.teacher_id
+        )
+
+    if team_id:
+        query = query.where(StudentAssignment.team_id == team_id)
+    if question_group_id:
+        query = query.where(StudentAssignment.question_group_id == question_group_id)
+    if exam_session_id:
+        query = query.where(StudentAssignment.exam_session_id == exam_session_id)
+
+    if include_marks:
+        return query.order_by(StudentAssignment.id, Teacher.position)
+    return query.order_by(StudentAssignment.id)
+
+
+def _build_result(rows, include_marks: bool) -> ComputedResult:
+    first = rows[0]
+    return ComputedResult(
+        assignment_id=first.assignment_id,
+        student_id=first.student_id,
+        student_name=first.student_name,
+        student_birth_year=first.student_birth_year,
+        regular_teacher=first.regular_teacher,
+        team_id=first.team_id,
+        team_name=first.team_name,
+        question_group_id=first.question_group_id,
+        question_group_code=first.question_group_code,
+        exam_session_id=first.exam_session_id,
+        q10_mark=first.q10_mark,
+        is_completed=bool(first.is_completed),
+        exam_incomplete=bool(first.exam_incomplete),
+        teacher_marks=_collect_teacher_marks(rows) if include_marks else None,
+        average_marks=[getattr(first, f"avg_q{i}") for i in QUESTION_NUMBERS],
+        total_average_q1_q9=first.total_average_q1_q9,
+        final_total=first.final_total
+    )
+
+
+def iter_results(
+    db: Session,
+    team_id: Optional[int] = None,
+    question_group_id: Optional[int] = None,
+    exam_session_id: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    include_marks: bool = True
+) -> Iterator[ComputedResult]:
+    """
+    Yield results in assignment id order.
+    With chunk_size, rows are fetched from the cursor that many at a time
+    (server-side cursor on Postgres) instead of all at once.
+    """
+    query = _results_query(team_id, question_group_id, exam_session_id, include_marks)
+    if chunk_size:
+        query = query.execution_options(yield_per=chunk_size)
+    rows = db.execute(query)
+    for _, assignment_rows in groupby(rows, key=lambda r: r.assignment_id):
+        yield _build_result(list(assignment_rows), include_marks)
+
+
+def compute_results(
+    db: Session,
+    team_id: Optional[int] = None,
+    question_group_id: Optional[int] = None,
+    exam_session_id: Optional[int] = None,
+    include_marks: bool = True
+) -> List[ComputedResult]:
+    """Load results for every matching assignment"""
+    return list(iter_results(
+        db, team_id, question_group_id, exam_session_id, include_marks=include_marks
+    ))
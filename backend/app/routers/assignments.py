@@ -1,113 +1,192 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, select, insert
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only
+from sqlalchemy.orm.attributes import flag_modified
 from typing import List, Optional
+from collections import Counter
 from datetime import datetime
-import json
 import os
-from ..database import get_db
-from ..models import StudentAssignment, Student, Team, QuestionGroup, Grade, Teacher
+from ..database import get_db, AnySession, get_async_db, run_db
+from .. import versions, reference_cache
+from ..etags import etag
+from ..metrics import query_budget, extend_query_budget
+from ..models import StudentAssignment, Student, Team, QuestionGroup, Grade, Teacher, AssignmentResult, ExamSession
 from ..schemas import (
     StudentAssignmentCreate, StudentAssignmentResponse, 
-    StudentAssignmentFull, StudentAssignmentUpdate
+    StudentAssignmentFull, StudentAssignmentUpdate, AssignmentListItem,
+    StudentResponse, TeamResponse, QuestionGroupResponse, ExamSessionResponse,
+    AutoAssignRequest, AutoAssignResult
 )
+from ..pagination import MAX_PAGE_SIZE, parse_fields, cached_count, keyset_page, keyset_select, set_page_headers
+from ..results import REFRESH_BATCH_SIZE, refresh_assignment_results
+from ..allocation import StudentToPlace, GroupOption, allocate
+from ..backups import BACKUP_DIR, create_backup, schedule_backup
+from ..events import publish_assignment_changes, publish_resync
 
 router = APIRouter(prefix="/assignments", tags=["Student Assignments"])
 
-# Backup directory
-BACKUP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "backups")
+# Versions of everything an assignment response embeds
+ASSIGNMENT_VIEW = (
+    versions.ASSIGNMENTS, versions.STUDENTS, versions.TEAMS,
+    versions.TEACHERS, versions.QUESTION_GROUPS, versions.EXAM_SESSIONS
+)
+
+# A full backup loads every assignment with its student and grades in one go
+BACKUP_QUERY_BUDGET = 3
+
+# Nested objects: how to load them and their schema
+ASSIGNMENT_RELATIONS = {
+    "student": (joinedload(StudentAssignment.student), StudentResponse),
+    "team": (joinedload(StudentAssignment.team).selectinload(Team.teachers), TeamResponse),
+    "question_group": (joinedload(StudentAssignment.question_group), QuestionGroupResponse),
+    "exam_session": (joinedload(StudentAssignment.exam_session), ExamSessionResponse),
+}
+ASSIGNMENT_FIELDS = list(StudentAssignmentFull.model_fields)
 
-def create_backup(db: Session, assignment_id: int = None):
-    """Create a backup of all completed student results"""
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    
-    # Get all assignments with grades
-    assignments = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.student),
-        joinedload(StudentAssignment.team),
-        joinedload(StudentAssignment.question_group),
-        joinedload(StudentAssignment.grades)
-    ).all()
-    
-    backup_data = {
-        "backup_time": datetime.now().isoformat(),
-        "total_students": len(assignments),
-        "students": []
-    }
-    
-    for a in assignments:
-        if not a.student:
-            continue
-            
-        student_data = {
-            "id": a.id,
-            "student_name": a.student.name,
-            "student_birth_year": a.student.birth_year,
-            "regular_teacher": a.student.regular_teacher,
-            "team": a.team.name if a.team else None,
-            "question_group": a.question_group.code if a.question_group else None,
-            "q10_mark": a.q10_mark,
-            "is_completed": a.is_completed,
-            "exam_incomplete": a.exam_incomplete,
-            "grades": []
-        }
-        
-        for g in a.grades:
-            teacher = db.query(Teacher).filter(Teacher.id == g.teacher_id).first()
-            grade_data = {
-                "teacher_id": g.teacher_id,
-                "teacher_name": teacher.name if teacher else None,
-                "teacher_position": teacher.position if teacher else None,
-                "marks": {f"q{i}": getattr(g, f"q{i}_mark") for i in range(1, 10)},
-                "total": g.total_q1_q9
-            }
-            student_data["grades"].append(grade_data)
-        
-        backup_data["students"].append(student_data)
-    
-    # Save with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = os.path.join(BACKUP_DIR, f"backup_{timestamp}.json")
-    
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        json.dump(backup_data, f, ensure_ascii=False, indent=2)
-    
-    # Also save a "latest" version
-    latest_file = os.path.join(BACKUP_DIR, "backup_latest.json")
-    with open(latest_file, 'w', encoding='utf-8') as f:
-        json.dump(backup_data, f, ensure_ascii=False, indent=2)
-    
-    return backup_file
 
+def _assignment_fields(assignment: StudentAssignment, fields: List[str]) -> dict:
+    row = {}
+    for field in fields:
+        value = getattr(assignment, field)
+        if field in ASSIGNMENT_RELATIONS and value is not None:
+            value = ASSIGNMENT_RELATIONS[field][1].model_validate(value)
+        row[field] = value
+    return row
+
+
+def _assignment_filters(
+    team_id: Optional[int],
+    question_group_id: Optional[int],
+    exam_session_id: Optional[int],
+    is_completed: Optional[bool]
+) -> list:
+    conditions = []
+    if team_id:
+        conditions.append(StudentAssignment.team_id == team_id)
+    if question_group_id:
+        conditions.append(StudentAssignment.question_group_id == question_group_id)
+    if exam_session_id:
+        conditions.append(StudentAssignment.exam_session_id == exam_session_id)
+    if is_completed is not None:
+        conditions.append(StudentAssignment.is_completed == is_completed)
+    return conditions
 
-@router.get("/", response_model=List[StudentAssignmentFull])
+
+def _count_assignments(db: Session, conditions: list, *filters) -> int:
+    return cached_count(
+        ("assignments", *filters),
+        (versions.ASSIGNMENTS,),
+        lambda: db.query(func.count(StudentAssignment.id)).filter(*conditions).scalar()
+    )
+
+
+@router.get(
+    "/",
+    response_model=None,
+    responses={200: {"model": List[StudentAssignmentFull]}},
+    dependencies=[Depends(etag(*ASSIGNMENT_VIEW))]
+)
 def get_all_assignments(
+    response: Response,
     team_id: Optional[int] = None,
     question_group_id: Optional[int] = None,
     exam_session_id: Optional[int] = None,
     is_completed: Optional[bool] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get all student assignments with optional filters"""
+    """
+    Get student assignments with optional filters, in id order.
+    Without limit every match is returned. With limit, pass the previous
+    page's X-Next-Cursor header as after_id to get the next page.
+    X-Total-Count holds the number of matches. fields=id,student,q10_mark
+    returns only those fields, and loads only the nested objects asked for.
+    """
+    selected = parse_fields(fields, ASSIGNMENT_FIELDS)
+    conditions = _assignment_filters(team_id, question_group_id, exam_session_id, is_completed)
+    
+    relations = [f for f in (selected or ASSIGNMENT_FIELDS) if f in ASSIGNMENT_RELATIONS]
     query = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.student),
-        joinedload(StudentAssignment.team),
-        joinedload(StudentAssignment.question_group),
-        joinedload(StudentAssignment.exam_session)
-    )
+        *[ASSIGNMENT_RELATIONS[f][0] for f in relations]
+    ).filter(*conditions)
+    if selected is not None:
+        columns = [getattr(StudentAssignment, f) for f in selected if f not in ASSIGNMENT_RELATIONS]
+        query = query.options(load_only(*columns))
     
-    if team_id:
-        query = query.filter(StudentAssignment.team_id == team_id)
-    if question_group_id:
-        query = query.filter(StudentAssignment.question_group_id == question_group_id)
-    if exam_session_id:
-        query = query.filter(StudentAssignment.exam_session_id == exam_session_id)
-    if is_completed is not None:
-        query = query.filter(StudentAssignment.is_completed == is_completed)
+    assignments, next_cursor = keyset_page(query, StudentAssignment.id, after_id, limit)
+    
+    total = _count_assignments(db, conditions, team_id, question_group_id, exam_session_id, is_completed)
+    set_page_headers(response, total, next_cursor)
     
-    return query.all()
+    if selected is None:
+        return [StudentAssignmentFull.model_validate(a) for a in assignments]
+    return [_assignment_fields(a, selected) for a in assignments]
 
 
-@router.post("/backup")
+# Columns of AssignmentListItem, read with one joined select
+COMPACT_COLUMNS = (
+    StudentAssignment.id,
+    StudentAssignment.student_id,
+    Student.name.label("student_name"),
+    Student.birth_year.label("student_birth_year"),
+    StudentAssignment.team_id,
+    Team.name.label("team_name"),
+    StudentAssignment.question_group_id,
+    QuestionGroup.code.label("question_group_code"),
+    StudentAssignment.exam_session_id,
+    StudentAssignment.q10_mark,
+    StudentAssignment.is_graded_teacher1,
+    StudentAssignment.is_graded_teacher2,
+    StudentAssignment.is_completed,
+    StudentAssignment.exam_incomplete,
+    StudentAssignment.created_at,
+)
+
+
+@router.get(
+    "/compact",
+    response_model=List[AssignmentListItem],
+    dependencies=[Depends(etag(versions.ASSIGNMENTS, versions.STUDENTS, versions.TEAMS, versions.QUESTION_GROUPS))]
+)
+async def get_assignments_compact(
+    response: Response,
+    team_id: Optional[int] = None,
+    question_group_id: Optional[int] = None,
+    exam_session_id: Optional[int] = None,
+    is_completed: Optional[bool] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: AnySession = Depends(get_async_db)
+):
+    """
+    Flat version of GET /assignments/ for large lists: one row per
+    assignment with student, team and group names instead of nested
+    objects, read in a single query. Same filters and paging headers.
+    """
+    filters = (team_id, question_group_id, exam_session_id, is_completed)
+    rows, total, next_cursor = await run_db(db, _compact_page, filters, after_id, limit)
+    set_page_headers(response, total, next_cursor)
+    return rows
+
+
+def _compact_page(db: Session, filters: tuple, after_id: Optional[int], limit: Optional[int]):
+    conditions = _assignment_filters(*filters)
+    statement = select(*COMPACT_COLUMNS).join(
+        Student, Student.id == StudentAssignment.student_id
+    ).join(
+        Team, Team.id == StudentAssignment.team_id
+    ).join(
+        QuestionGroup, QuestionGroup.id == StudentAssignment.question_group_id
+    ).where(*conditions)
+    
+    rows, next_cursor = keyset_select(db, statement, StudentAssignment.id, after_id, limit)
+    total = _count_assignments(db, conditions, *filters)
+    return [dict(row._mapping) for row in rows], total, next_cursor
+
+
+@router.post("/backup", dependencies=[Depends(query_budget(BACKUP_QUERY_BUDGET))])
 def manual_backup(db: Session = Depends(get_db)):
     """Manually trigger a backup of all student data"""
     try:
@@ -130,7 +209,7 @@ def list_backups():
     
     backups = []
     for f in os.listdir(BACKUP_DIR):
-        if f.endswith('.json'):
+        if f.endswith('.json') or f.endswith('.json.gz'):
             file_path = os.path.join(BACKUP_DIR, f)
             file_stat = os.stat(file_path)
             backups.append({
@@ -152,13 +231,11 @@ def create_assignment(assignment: StudentAssignmentCreate, db: Session = Depends
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Verify team exists
-    team = db.query(Team).filter(Team.id == assignment.team_id).first()
-    if not team:
+    if not reference_cache.team(db, assignment.team_id):
         raise HTTPException(status_code=404, detail="Team not found")
     
     # Verify question group exists
-    qg = db.query(QuestionGroup).filter(QuestionGroup.id == assignment.question_group_id).first()
-    if not qg:
+    if not reference_cache.question_group(db, assignment.question_group_id):
         raise HTTPException(status_code=404, detail="Question group not found")
     
     # Check for duplicate assignment in same session
@@ -180,7 +257,12 @@ def create_assignment(assignment: StudentAssignmentCreate, db: Session = Depends
         db_assignment.is_completed = True  # Mark as completed if Q10 is set
     
     db.add(db_assignment)
+    db.flush()
+    refresh_assignment_results(db, [db_assignment.id])
     db.commit()
+    versions.bump(versions.ASSIGNMENTS)
+    publish_assignment_changes(db, [db_assignment.id])
+    schedule_backup(db_assignment.id)
     db.refresh(db_assignment)
     
     # Reload with relationships
@@ -192,39 +274,142 @@ def create_assignment(assignment: StudentAssignmentCreate, db: Session = Depends
     ).filter(StudentAssignment.id == db_assignment.id).first()
 
 
-@router.get("/team/{team_id}", response_model=List[StudentAssignmentFull])
-def get_team_assignments(
+AUTO_ASSIGN_CHUNK_SIZE = 1000  # Students looked up / results refreshed per statement
+
+
+def _session_rooms(db: Session, exam_session_id: Optional[int]):
+    """(session id, its team ids) - the first num_rooms teams, as for the active session"""
+    active = reference_cache.active_session(db)
+    if exam_session_id is None or (active and active.id == exam_session_id):
+        if not active:
+            raise HTTPException(status_code=400, detail="No active exam session")
+        return active.id, list(active.team_ids)
+    
+    session = db.query(ExamSession).filter(ExamSession.id == exam_session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Exam session not found")
+    team_ids = [t.id for t in db.query(Team.id).order_by(Team.id).limit(session.num_rooms or 4)]
+    return session.id, team_ids
+
+
+# Statements grow with the number of students: a few per AUTO_ASSIGN_CHUNK_SIZE
+@router.post("/auto", response_model=AutoAssignResult, dependencies=[Depends(query_budget(None))])
+def auto_assign(request: AutoAssignRequest, db: Session = Depends(get_db)):
+    """
+    Assign many students at once, spread evenly over the session's rooms and
+    question groups (see allocation.py). Second-term students never get their
+    previous group. All assignments are written in one bulk insert.
+    """
+    exam_session_id, team_ids = _session_rooms(db, request.exam_session_id)
+    groups = [GroupOption(id=g.id, code=g.code) for g in reference_cache.question_groups(db)]
+    
+    assigned_ids = select(StudentAssignment.student_id).where(
+        StudentAssignment.exam_session_id == exam_session_id
+    )
+    columns = (Student.id, Student.is_second_term, Student.previous_question_group, Student.q10_mark)
+    already_assigned = []
+    not_found = []
+    if request.student_ids is None:
+        rows = db.execute(select(*columns).where(Student.id.not_in(assigned_ids)).order_by(Student.id)).all()
+    else:
+        requested = list(dict.fromkeys(request.student_ids))
+        rows = []
+        for start in range(0, len(requested), AUTO_ASSIGN_CHUNK_SIZE):
+            rows.extend(db.execute(
+                select(*columns).where(Student.id.in_(requested[start:start + AUTO_ASSIGN_CHUNK_SIZE]))
+            ))
+        found = {row.id for row in rows}
+        not_found = [i for i in requested if i not in found]
+        taken = set(db.scalars(assigned_ids))
+        already_assigned = [i for i in requested if i in taken]
+        rows = [row for row in rows if row.id not in taken]
+    
+    existing = db.execute(
+        select(StudentAssignment.team_id, StudentAssignment.question_group_id, func.count()).where(
+            StudentAssignment.exam_session_id == exam_session_id
+        ).group_by(StudentAssignment.team_id, StudentAssignment.question_group_id)
+    ).all()
+    placements, unplaced = allocate(
+        [StudentToPlace(id=r.id, is_second_term=bool(r.is_second_term), previous_question_group=r.previous_question_group)
+         for r in rows],
+        team_ids, groups, existing
+    )
+    
+    q10_marks = {row.id: row.q10_mark for row in rows}
+    values = [
+        {
+            "student_id": p.student_id,
+            "team_id": p.team_id,
+            "question_group_id": p.question_group_id,
+            "exam_session_id": exam_session_id,
+            # Copy the student's Q10 mark, as create_assignment does
+            "q10_mark": q10_marks[p.student_id],
+            "is_completed": q10_marks[p.student_id] is not None
+        }
+        for p in placements
+    ]
+    created_ids = []
+    if values:
+        table = StudentAssignment.__table__
+        created_ids = list(db.scalars(insert(table).returning(table.c.id), values))
+        for start in range(0, len(created_ids), AUTO_ASSIGN_CHUNK_SIZE):
+            refresh_assignment_results(db, created_ids[start:start + AUTO_ASSIGN_CHUNK_SIZE])
+        db.commit()
+        versions.bump(versions.ASSIGNMENTS)
+        publish_resync("auto-assign")
+        schedule_backup(*created_ids)
+    
+    codes = {g.id: g.code for g in groups}
+    team_counts = Counter(dict.fromkeys(team_ids, 0))
+    group_counts = Counter()
+    for team_id, group_id, count in existing:
+        team_counts[team_id] += count
+        group_counts[codes.get(group_id, str(group_id))] += count
+    for p in placements:
+        team_counts[p.team_id] += 1
+        group_counts[codes[p.question_group_id]] += 1
+    
+    return AutoAssignResult(
+        message=f"{len(created_ids)} قوتابی دابەشکرا",
+        exam_session_id=exam_session_id,
+        created=len(created_ids),
+        already_assigned=already_assigned,
+        not_found=not_found,
+        unplaced=unplaced,
+        team_counts=dict(team_counts),
+        group_counts=dict(group_counts)
+    )
+
+
+def _full_assignments(db: Session, *conditions) -> List[StudentAssignmentFull]:
+    """Assignments with every nested object loaded up front, validated inside the session"""
+    query = db.query(StudentAssignment).options(
+        *[loader for loader, _ in ASSIGNMENT_RELATIONS.values()]
+    ).filter(*conditions).order_by(StudentAssignment.id)
+    return [StudentAssignmentFull.model_validate(a) for a in query]
+
+
+@router.get("/team/{team_id}", response_model=List[StudentAssignmentFull], dependencies=[Depends(etag(*ASSIGNMENT_VIEW))])
+async def get_team_assignments(
     team_id: int,
     pending_only: bool = False,
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_async_db)
 ):
     """Get all assignments for a specific team (for teacher view)"""
-    query = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.student),
-        joinedload(StudentAssignment.team),
-        joinedload(StudentAssignment.question_group),
-        joinedload(StudentAssignment.exam_session)
-    ).filter(StudentAssignment.team_id == team_id)
-    
+    conditions = [StudentAssignment.team_id == team_id]
     if pending_only:
-        query = query.filter(StudentAssignment.is_completed == False)
+        conditions.append(StudentAssignment.is_completed == False)
     
-    return query.all()
+    return await run_db(db, _full_assignments, *conditions)
 
 
-@router.get("/{assignment_id}", response_model=StudentAssignmentFull)
-def get_assignment(assignment_id: int, db: Session = Depends(get_db)):
+@router.get("/{assignment_id}", response_model=StudentAssignmentFull, dependencies=[Depends(etag(*ASSIGNMENT_VIEW))])
+async def get_assignment(assignment_id: int, db: AnySession = Depends(get_async_db)):
     """Get a specific assignment"""
-    assignment = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.student),
-        joinedload(StudentAssignment.team),
-        joinedload(StudentAssignment.question_group),
-        joinedload(StudentAssignment.exam_session)
-    ).filter(StudentAssignment.id == assignment_id).first()
-    
-    if not assignment:
+    assignments = await run_db(db, _full_assignments, StudentAssignment.id == assignment_id)
+    if not assignments:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    return assignment
+    return assignments[0]
 
 
 @router.put("/{assignment_id}/q10", response_model=StudentAssignmentFull)
@@ -253,14 +438,14 @@ def update_q10_mark(
         if assignment.is_graded_teacher1 and assignment.is_graded_teacher2:
             assignment.is_completed = True
     
+    refresh_assignment_results(db, [assignment_id])
     db.commit()
+    versions.bump(versions.ASSIGNMENTS)
+    publish_assignment_changes(db, [assignment_id])
     db.refresh(assignment)
     
-    # AUTO BACKUP: Save backup every time Q10 is marked
-    try:
-        create_backup(db, assignment_id)
-    except Exception as e:
-        print(f"Backup error (non-critical): {e}")
+    # AUTO BACKUP: queued for the background worker, which batches bursts of edits
+    schedule_backup(assignment_id)
     
     return db.query(StudentAssignment).options(
         joinedload(StudentAssignment.student),
@@ -285,9 +470,9 @@ def update_assignment(
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
+    previous_team_id = assignment.team_id
     if team_id is not None:
-        team = db.query(Team).filter(Team.id == team_id).first()
-        if not team:
+        if not reference_cache.team(db, team_id):
             raise HTTPException(status_code=404, detail="Team not found")
         assignment.team_id = team_id
         # Reset grading status when team changes
@@ -298,12 +483,16 @@ def update_assignment(
         db.query(Grade).filter(Grade.assignment_id == assignment_id).delete()
     
     if question_group_id is not None:
-        qg = db.query(QuestionGroup).filter(QuestionGroup.id == question_group_id).first()
-        if not qg:
+        if not reference_cache.question_group(db, question_group_id):
             raise HTTPException(status_code=404, detail="Question group not found")
         assignment.question_group_id = question_group_id
     
+    if team_id is not None:
+        refresh_assignment_results(db, [assignment_id])
     db.commit()
+    versions.bump(versions.ASSIGNMENTS, versions.GRADES)
+    publish_assignment_changes(db, [assignment_id], team_ids=[previous_team_id])
+    schedule_backup(assignment_id)
     db.refresh(assignment)
     
     return db.query(StudentAssignment).options(
@@ -324,11 +513,18 @@ def delete_assignment(assignment_id: int, db: Session = Depends(get_db)):
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    # Delete associated grades first
+    team_id = assignment.team_id
+    
+    # Delete associated grades and stored result first
     db.query(Grade).filter(Grade.assignment_id == assignment_id).delete()
+    db.query(AssignmentResult).filter(AssignmentResult.assignment_id == assignment_id).delete()
     
     db.delete(assignment)
     db.commit()
+    versions.bump(versions.ASSIGNMENTS, versions.GRADES)
+    publish_assignment_changes(db, deleted_ids=[assignment_id], team_ids=[team_id])
+    # The next delta lists it under "deleted"
+    schedule_backup(assignment_id)
     return {"message": "Assignment deleted successfully"}
 
 
@@ -346,7 +542,11 @@ def mark_exam_incomplete(
         raise HTTPException(status_code=404, detail="Assignment not found")
     
     assignment.exam_incomplete = True
+    refresh_assignment_results(db, [assignment_id])
     db.commit()
+    versions.bump(versions.ASSIGNMENTS)
+    publish_assignment_changes(db, [assignment_id])
+    schedule_backup(assignment_id)
     db.refresh(assignment)
     
     return db.query(StudentAssignment).options(
@@ -371,7 +571,11 @@ def mark_exam_complete(
         raise HTTPException(status_code=404, detail="Assignment not found")
     
     assignment.exam_incomplete = False
+    refresh_assignment_results(db, [assignment_id])
     db.commit()
+    versions.bump(versions.ASSIGNMENTS)
+    publish_assignment_changes(db, [assignment_id])
+    schedule_backup(assignment_id)
     db.refresh(assignment)
     
     return db.query(StudentAssignment).options(
@@ -382,6 +586,10 @@ def mark_exam_complete(
     ).filter(StudentAssignment.id == assignment_id).first()
 
 
+# Each chunk of synced assignments refreshes its stored results with a delete, a select and an insert
+SYNC_Q10_STATEMENTS_PER_CHUNK = 3
+
+
 @router.post("/sync-q10")
 def sync_q10_from_students(db: Session = Depends(get_db)):
     """
@@ -393,7 +601,7 @@ def sync_q10_from_students(db: Session = Depends(get_db)):
         joinedload(StudentAssignment.student)
     ).filter(StudentAssignment.q10_mark == None).all()
     
-    synced_count = 0
+    synced_ids = []
     for assignment in assignments:
         if assignment.student and assignment.student.q10_mark is not None:
             # Validate Q10 is within range
@@ -402,9 +610,21 @@ def sync_q10_from_students(db: Session = Depends(get_db)):
                 # Mark as completed if both teachers have graded
                 if assignment.is_graded_teacher1 and assignment.is_graded_teacher2:
                     assignment.is_completed = True
-                synced_count += 1
-    
+                # Otherwise the ORM starts a new UPDATE statement whenever is_completed changes or not
+                flag_modified(assignment, "is_completed")
+                synced_ids.append(assignment.id)
+    
+    # Same chunking as /auto; the first chunk fits in the route's default budget
+    chunks = -(-len(synced_ids) // REFRESH_BATCH_SIZE)
+    extend_query_budget(SYNC_Q10_STATEMENTS_PER_CHUNK * max(chunks - 1, 0))
+    for start in range(0, len(synced_ids), REFRESH_BATCH_SIZE):
+        refresh_assignment_results(db, synced_ids[start:start + REFRESH_BATCH_SIZE])
     db.commit()
+    versions.bump(versions.ASSIGNMENTS)
+    synced_count = len(synced_ids)
+    if synced_ids:
+        schedule_backup(*synced_ids)
+        publish_resync("q10-sync")
     
     return {
         "success": True,
@@ -0,0 +1,41 @@
+import asyncio
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from ..events import broker, format_event, HEARTBEAT_SECONDS
+
+router = APIRouter(tags=["Live Events"])
+
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """
+    Live progress feed (Server-Sent Events).
+
+    - `assignments`: changed assignments with their new flags, ids of deleted
+      ones, and the updated counters of the affected teams
+    - `resync`: too much changed at once - reload the page data
+    """
+    subscriber = broker.subscribe()
+
+    async def stream():
+        try:
+            # Reconnect after 5s if the connection drops
+            yield "retry: 5000\n" + format_event("connected", {})
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield message
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
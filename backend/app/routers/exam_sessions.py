@@ -2,13 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..database import get_db
+from .. import versions
+from ..etags import etag
 from ..models import ExamSession
 from ..schemas import ExamSessionCreate, ExamSessionResponse, ExamSessionUpdate
 
 router = APIRouter(prefix="/exam-sessions", tags=["Exam Sessions"])
 
 
-@router.get("/", response_model=List[ExamSessionResponse])
+@router.get("/", response_model=List[ExamSessionResponse], dependencies=[Depends(etag(versions.EXAM_SESSIONS))])
 def get_all_exam_sessions(
     active_only: bool = False,
     db: Session = Depends(get_db)
@@ -26,18 +28,19 @@ def create_exam_session(session: ExamSessionCreate, db: Session = Depends(get_db
     db_session = ExamSession(**session.model_dump())
     db.add(db_session)
     db.commit()
+    versions.bump(versions.EXAM_SESSIONS)
     db.refresh(db_session)
     return db_session
 
 
-@router.get("/active", response_model=Optional[ExamSessionResponse])
+@router.get("/active", response_model=Optional[ExamSessionResponse], dependencies=[Depends(etag(versions.EXAM_SESSIONS))])
 def get_active_session(db: Session = Depends(get_db)):
     """Get the currently active exam session"""
     session = db.query(ExamSession).filter(ExamSession.is_active == True).first()
     return session
 
 
-@router.get("/{session_id}", response_model=ExamSessionResponse)
+@router.get("/{session_id}", response_model=ExamSessionResponse, dependencies=[Depends(etag(versions.EXAM_SESSIONS))])
 def get_exam_session(session_id: int, db: Session = Depends(get_db)):
     """Get a specific exam session"""
     session = db.query(ExamSession).filter(ExamSession.id == session_id).first()
@@ -59,6 +62,7 @@ def update_exam_session(session_id: int, session: ExamSessionUpdate, db: Session
             setattr(db_session, key, value)
     
     db.commit()
+    versions.bump(versions.EXAM_SESSIONS)
     db.refresh(db_session)
     return db_session
 
@@ -76,6 +80,7 @@ def activate_session(session_id: int, db: Session = Depends(get_db)):
     
     session.is_active = True
     db.commit()
+    versions.bump(versions.EXAM_SESSIONS)
     db.refresh(session)
     return session
 
@@ -89,6 +94,7 @@ def deactivate_session(session_id: int, db: Session = Depends(get_db)):
     
     session.is_active = False
     db.commit()
+    versions.bump(versions.EXAM_SESSIONS)
     db.refresh(session)
     return session
 
@@ -101,4 +107,5 @@ def delete_exam_session(session_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Exam session not found")
     db.delete(session)
     db.commit()
+    versions.bump(versions.EXAM_SESSIONS)
     return {"message": "Exam session deleted successfully"}
@@ -1,31 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import flag_modified
 from typing import List, Optional
 from datetime import datetime
-from ..database import get_db
+from ..database import AnySession, get_async_db, run_db
+from .. import versions, reference_cache
+from ..etags import etag
+from ..metrics import query_budget, extend_query_budget
 from ..models import Grade, StudentAssignment, Teacher, QuestionGroup
-from ..schemas import GradeCreate, GradeUpdate, GradeResponse
+from ..schemas import GradeCreate, GradeUpdate, GradeResponse, GradeBatchItemResult
+from ..results import REFRESH_BATCH_SIZE, refresh_assignment_results
+from ..reference_cache import CachedTeacher
+from ..events import publish_assignment_changes
+from ..backups import schedule_backup
 
 router = APIRouter(prefix="/grades", tags=["Grades"])
 
 
-@router.get("/assignment/{assignment_id}", response_model=List[GradeResponse])
-def get_assignment_grades(assignment_id: int, db: Session = Depends(get_db)):
+# Endpoints are async and run their queries through run_db (see database.py),
+# so grading keeps working while exports and backups hold the threadpool.
+
+def _grades_where(db: Session, *conditions) -> List[GradeResponse]:
+    return [GradeResponse.model_validate(g) for g in db.query(Grade).filter(*conditions)]
+
+
+@router.get("/assignment/{assignment_id}", response_model=List[GradeResponse], dependencies=[Depends(etag(versions.GRADES))])
+async def get_assignment_grades(assignment_id: int, db: AnySession = Depends(get_async_db)):
     """Get all grades for a specific assignment"""
-    grades = db.query(Grade).filter(Grade.assignment_id == assignment_id).all()
-    return grades
+    return await run_db(db, _grades_where, Grade.assignment_id == assignment_id)
 
 
-@router.get("/teacher/{teacher_id}", response_model=List[GradeResponse])
-def get_teacher_grades(teacher_id: int, db: Session = Depends(get_db)):
+@router.get("/teacher/{teacher_id}", response_model=List[GradeResponse], dependencies=[Depends(etag(versions.GRADES))])
+async def get_teacher_grades(teacher_id: int, db: AnySession = Depends(get_async_db)):
     """Get all grades given by a specific teacher"""
-    grades = db.query(Grade).filter(Grade.teacher_id == teacher_id).all()
-    return grades
+    return await run_db(db, _grades_where, Grade.teacher_id == teacher_id)
 
 
 @router.post("/start-grading")
-def start_grading(assignment_id: int, teacher_id: int, db: Session = Depends(get_db)):
+async def start_grading(assignment_id: int, teacher_id: int, db: AnySession = Depends(get_async_db)):
     """Mark when a teacher starts grading a student (for time tracking)"""
+    return await run_db(db, _start_grading, assignment_id, teacher_id)
+
+
+def _start_grading(db: Session, assignment_id: int, teacher_id: int) -> dict:
     # Check if grade already exists
     existing_grade = db.query(Grade).filter(
         Grade.assignment_id == assignment_id,
@@ -37,6 +56,7 @@ def start_grading(assignment_id: int, teacher_id: int, db: Session = Depends(get
         if not existing_grade.grading_started_at:
             existing_grade.grading_started_at = datetime.utcnow()
             db.commit()
+            versions.bump(versions.GRADES)
         return {"message": "Grading already started", "started_at": existing_grade.grading_started_at}
     
     # Create a new grade entry with just the start time
@@ -46,25 +66,124 @@ def start_grading(assignment_id: int, teacher_id: int, db: Session = Depends(get
         grading_started_at=datetime.utcnow()
     )
     db.add(new_grade)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request from this teacher created the grade first
+        db.rollback()
+        existing_grade = db.query(Grade).filter(
+            Grade.assignment_id == assignment_id,
+            Grade.teacher_id == teacher_id
+        ).first()
+        if not existing_grade:
+            raise HTTPException(status_code=404, detail="Assignment or teacher not found")
+        return {"message": "Grading already started", "started_at": existing_grade.grading_started_at}
+    versions.bump(versions.GRADES)
     db.refresh(new_grade)
     
     return {"message": "Grading started", "started_at": new_grade.grading_started_at}
 
 
+def _marks_error(grade_dict: dict, marks_structure: dict) -> Optional[str]:
+    """Validate marks against max marks - returns the error for the first invalid mark"""
+    for i in range(1, 10):
+        mark = grade_dict.get(f"q{i}_mark")
+        if mark is not None:
+            if mark < 0:
+                return f"Q{i} mark cannot be negative"
+            if mark > marks_structure.get(f"q{i}", 0):
+                return f"Q{i} mark cannot exceed {marks_structure.get(f'q{i}', 0)}"
+    return None
+
+
+def _upsert_grade(db: Session, grade_dict: dict, existing_grade: Optional[Grade]) -> Grade:
+    """Apply validated marks to the teacher's existing grade, or add a new one"""
+    if existing_grade:
+        # Update existing grade
+        for key, value in grade_dict.items():
+            if key not in ['assignment_id', 'teacher_id'] and value is not None:
+                setattr(existing_grade, key, value)
+        return _finish_grade(existing_grade)
+    
+    db_grade = _new_grade(grade_dict)
+    db.add(db_grade)
+    return db_grade
+
+
+def _new_grade(grade_dict: dict) -> Grade:
+    """A grade not yet added to the session"""
+    db_grade = Grade(**grade_dict)
+    db_grade.grading_started_at = datetime.utcnow()
+    return _finish_grade(db_grade)
+
+
+def _finish_grade(db_grade: Grade) -> Grade:
+    # Calculate total
+    db_grade.total_q1_q9 = sum([
+        getattr(db_grade, f'q{i}_mark') or 0
+        for i in range(1, 10)
+    ])
+    db_grade.grading_finished_at = datetime.utcnow()
+    return db_grade
+
+
+# Columns a new grade is inserted with - ids and created/updated_at come from the table defaults
+NEW_GRADE_COLUMNS = (
+    ["assignment_id", "teacher_id"] + [f"q{i}_mark" for i in range(1, 10)]
+    + ["total_q1_q9", "grading_started_at", "grading_finished_at"]
+)
+
+
+def _insert_new_grades(db: Session, new_grades: List[Grade]) -> dict:
+    """
+    Insert grades in one executemany and return their rows by assignment id.
+    Through the session, SQLite would insert them one at a time to match
+    the generated ids back to the objects.
+    """
+    if not new_grades:
+        return {}
+    table = Grade.__table__
+    rows = db.execute(
+        insert(table).returning(*table.c),
+        [{column: getattr(g, column) for column in NEW_GRADE_COLUMNS} for g in new_grades]
+    ).all()
+    return {row.assignment_id: row for row in rows}
+
+
+def _marks_structure(db: Session, question_group_id: int) -> dict:
+    group = reference_cache.question_group(db, question_group_id)
+    return group.marks_structure if group else {}
+
+
+def _mark_graded(assignment: StudentAssignment, teacher: CachedTeacher) -> None:
+    """Update assignment grading status after a teacher's grade is saved"""
+    if teacher.position == 1:
+        assignment.is_graded_teacher1 = True
+    else:
+        assignment.is_graded_teacher2 = True
+    
+    # Check if both teachers have graded and Q10 is set
+    if assignment.is_graded_teacher1 and assignment.is_graded_teacher2 and assignment.q10_mark is not None:
+        assignment.is_completed = True
+
+
 @router.post("/", response_model=GradeResponse)
-def create_or_update_grade(grade_data: GradeCreate, db: Session = Depends(get_db)):
+async def create_or_update_grade(grade_data: GradeCreate, db: AnySession = Depends(get_async_db)):
     """Create or update a grade for an assignment by a teacher"""
+    return await run_db(db, _create_or_update_grade, grade_data)
+
+
+def _create_or_update_grade(db: Session, grade_data: GradeCreate) -> GradeResponse:
     # Verify assignment exists
-    assignment = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.question_group)
-    ).filter(StudentAssignment.id == grade_data.assignment_id).first()
+    assignment = db.query(StudentAssignment).filter(
+        StudentAssignment.id == grade_data.assignment_id
+    ).first()
     
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
     # Verify teacher exists and is in the correct team
-    teacher = db.query(Teacher).filter(Teacher.id == grade_data.teacher_id).first()
+    teacher = reference_cache.teacher(db, grade_data.teacher_id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     
@@ -74,25 +193,11 @@ def create_or_update_grade(grade_data: GradeCreate, db: Session = Depends(get_db
             detail="Teacher is not in the assigned team for this student"
         )
     
-    # Get question group marks structure for validation
-    marks_structure = assignment.question_group.marks_structure
-    
-    # Validate marks against max marks
+    # Validate marks against the question group's max marks
     grade_dict = grade_data.model_dump()
-    for i in range(1, 10):
-        mark_key = f"q{i}_mark"
-        max_key = f"q{i}"
-        if grade_dict.get(mark_key) is not None:
-            if grade_dict[mark_key] < 0:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Q{i} mark cannot be negative"
-                )
-            if grade_dict[mark_key] > marks_structure.get(max_key, 0):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Q{i} mark cannot exceed {marks_structure.get(max_key, 0)}"
-                )
+    error = _marks_error(grade_dict, _marks_structure(db, assignment.question_group_id))
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
     # Check if grade already exists for this assignment/teacher
     existing_grade = db.query(Grade).filter(
@@ -100,68 +205,136 @@ def create_or_update_grade(grade_data: GradeCreate, db: Session = Depends(get_db
         Grade.teacher_id == grade_data.teacher_id
     ).first()
     
-    if existing_grade:
-        # Update existing grade
-        for key, value in grade_dict.items():
-            if key not in ['assignment_id', 'teacher_id'] and value is not None:
-                setattr(existing_grade, key, value)
-        
-        # Calculate total
-        total = sum([
-            getattr(existing_grade, f'q{i}_mark') or 0
-            for i in range(1, 10)
-        ])
-        existing_grade.total_q1_q9 = total
-        existing_grade.grading_finished_at = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(existing_grade)
-        db_grade = existing_grade
-    else:
-        # Create new grade
-        db_grade = Grade(**grade_dict)
-        
-        # Calculate total
-        total = sum([
-            getattr(db_grade, f'q{i}_mark') or 0
-            for i in range(1, 10)
-        ])
-        db_grade.total_q1_q9 = total
-        db_grade.grading_started_at = datetime.utcnow()
-        db_grade.grading_finished_at = datetime.utcnow()
-        
-        db.add(db_grade)
+    db_grade = _upsert_grade(db, grade_dict, existing_grade)
+    _mark_graded(assignment, teacher)
+    
+    # Grade, flags and stored result are committed together
+    try:
+        refresh_assignment_results(db, [assignment.id])
         db.commit()
-        db.refresh(db_grade)
+    except IntegrityError:
+        # A concurrent submission inserted this teacher's grade first
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Grade was saved by another request, please try again")
+    versions.bump(versions.GRADES, versions.ASSIGNMENTS)
+    publish_assignment_changes(db, [assignment.id])
+    schedule_backup(assignment.id)
+    db.refresh(db_grade)
     
-    # Update assignment grading status
-    if teacher.position == 1:
-        assignment.is_graded_teacher1 = True
-    else:
-        assignment.is_graded_teacher2 = True
+    return GradeResponse.model_validate(db_grade)
+
+
+# A batch runs a fixed number of statements (lookups, one grade insert, one
+# grade update, the assignment flag updates, the results refresh, reference
+# cache reloads), plus one stored-results insert per REFRESH_BATCH_SIZE grades
+GRADE_BATCH_QUERY_BUDGET = 12
+
+# Every updated grade writes all of these, so they share one UPDATE statement
+UPDATED_GRADE_COLUMNS = [f"q{i}_mark" for i in range(1, 10)] + ["total_q1_q9"]
+
+
+@router.post("/batch", response_model=List[GradeBatchItemResult], dependencies=[Depends(query_budget(GRADE_BATCH_QUERY_BUDGET))])
+async def create_or_update_grades_batch(grades: List[GradeCreate], db: AnySession = Depends(get_async_db)):
+    """
+    Create or update many grades from one teacher in a single transaction.
+    Each item is validated on its own; invalid items are reported and skipped.
+    """
+    extend_query_budget(-(-len(grades) // REFRESH_BATCH_SIZE))
+    return await run_db(db, _create_or_update_grades_batch, grades)
+
+
+def _create_or_update_grades_batch(db: Session, grades: List[GradeCreate]) -> List[GradeBatchItemResult]:
+    if not grades:
+        return []
     
-    # Check if both teachers have graded and Q10 is set
-    if assignment.is_graded_teacher1 and assignment.is_graded_teacher2 and assignment.q10_mark is not None:
-        assignment.is_completed = True
+    teacher_ids = {g.teacher_id for g in grades}
+    if len(teacher_ids) > 1:
+        raise HTTPException(status_code=400, detail="All grades in a batch must be from the same teacher")
     
-    db.commit()
+    teacher = reference_cache.teacher(db, grades[0].teacher_id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher not found")
     
-    return db_grade
+    # Load every assignment and this teacher's existing grades up front
+    assignment_ids = {g.assignment_id for g in grades}
+    assignments = {
+        a.id: a for a in db.query(StudentAssignment).filter(StudentAssignment.id.in_(assignment_ids))
+    }
+    existing_grades = {
+        g.assignment_id: g for g in db.query(Grade).filter(
+            Grade.teacher_id == teacher.id,
+            Grade.assignment_id.in_(assignment_ids)
+        )
+    }
+    
+    results = []
+    saved = []
+    new_grades = {}  # Inserted together below
+    for grade_data in grades:
+        assignment = assignments.get(grade_data.assignment_id)
+        if not assignment:
+            error = "Assignment not found"
+        elif teacher.team_id != assignment.team_id:
+            error = "Teacher is not in the assigned team for this student"
+        else:
+            error = _marks_error(grade_data.model_dump(), _marks_structure(db, assignment.question_group_id))
+        
+        if error:
+            results.append(GradeBatchItemResult(assignment_id=grade_data.assignment_id, success=False, error=error))
+            continue
+        
+        grade_dict = grade_data.model_dump()
+        db_grade = existing_grades.get(assignment.id) or new_grades.get(assignment.id)
+        if db_grade is None:
+            db_grade = new_grades[assignment.id] = _new_grade(grade_dict)
+        else:
+            # Stored grade, or an earlier item of this batch for the same student
+            _upsert_grade(db, grade_dict, db_grade)
+            if db_grade.id is not None:
+                # Otherwise the ORM emits one UPDATE per set of changed marks
+                for column in UPDATED_GRADE_COLUMNS:
+                    flag_modified(db_grade, column)
+        _mark_graded(assignment, teacher)
+        results.append(GradeBatchItemResult(assignment_id=assignment.id, success=True))
+        saved.append((results[-1], db_grade))
+    
+    if saved:
+        try:
+            inserted = _insert_new_grades(db, list(new_grades.values()))
+            # Flushes the updated grades, so their timestamps are populated below
+            refresh_assignment_results(db, {grade.assignment_id for _, grade in saved})
+            for result, db_grade in saved:
+                stored = inserted.get(db_grade.assignment_id) if db_grade.id is None else db_grade
+                result.grade = GradeResponse.model_validate(stored)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Grades were saved by another request, please try again")
+        changed_ids = {result.assignment_id for result, _ in saved}
+        versions.bump(versions.GRADES, versions.ASSIGNMENTS)
+        publish_assignment_changes(db, changed_ids)
+        schedule_backup(*changed_ids)
+    
+    return results
 
 
 @router.put("/{grade_id}", response_model=GradeResponse)
-def update_grade(grade_id: int, grade_data: GradeUpdate, db: Session = Depends(get_db)):
+async def update_grade(grade_id: int, grade_data: GradeUpdate, db: AnySession = Depends(get_async_db)):
     """Update an existing grade"""
+    return await run_db(db, _update_grade, grade_id, grade_data)
+
+
+def _update_grade(db: Session, grade_id: int, grade_data: GradeUpdate) -> GradeResponse:
     db_grade = db.query(Grade).filter(Grade.id == grade_id).first()
     if not db_grade:
         raise HTTPException(status_code=404, detail="Grade not found")
     
-    # Get assignment for validation
-    assignment = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.question_group)
-    ).filter(StudentAssignment.id == db_grade.assignment_id).first()
+    # Get the assignment's question group for validation
+    question_group_id = db.query(StudentAssignment.question_group_id).filter(
+        StudentAssignment.id == db_grade.assignment_id
+    ).scalar()
     
-    marks_structure = assignment.question_group.marks_structure
+    marks_structure = _marks_structure(db, question_group_id)
     
     # Update and validate
     for key, value in grade_data.model_dump().items():
@@ -188,26 +361,39 @@ def update_grade(grade_id: int, grade_data: GradeUpdate, db: Session = Depends(g
     ])
     db_grade.total_q1_q9 = total
     
+    refresh_assignment_results(db, [db_grade.assignment_id])
     db.commit()
+    versions.bump(versions.GRADES, versions.ASSIGNMENTS)
+    publish_assignment_changes(db, [db_grade.assignment_id])
+    schedule_backup(db_grade.assignment_id)
     db.refresh(db_grade)
-    return db_grade
+    return GradeResponse.model_validate(db_grade)
 
 
-@router.get("/{grade_id}", response_model=GradeResponse)
-def get_grade(grade_id: int, db: Session = Depends(get_db)):
+@router.get("/{grade_id}", response_model=GradeResponse, dependencies=[Depends(etag(versions.GRADES))])
+async def get_grade(grade_id: int, db: AnySession = Depends(get_async_db)):
     """Get a specific grade"""
-    grade = db.query(Grade).filter(Grade.id == grade_id).first()
-    if not grade:
+    grades = await run_db(db, _grades_where, Grade.id == grade_id)
+    if not grades:
         raise HTTPException(status_code=404, detail="Grade not found")
-    return grade
+    return grades[0]
 
 
 @router.delete("/{grade_id}")
-def delete_grade(grade_id: int, db: Session = Depends(get_db)):
+async def delete_grade(grade_id: int, db: AnySession = Depends(get_async_db)):
     """Delete a grade"""
+    return await run_db(db, _delete_grade, grade_id)
+
+
+def _delete_grade(db: Session, grade_id: int) -> dict:
     grade = db.query(Grade).filter(Grade.id == grade_id).first()
     if not grade:
         raise HTTPException(status_code=404, detail="Grade not found")
+    assignment_id = grade.assignment_id
     db.delete(grade)
+    refresh_assignment_results(db, [assignment_id])
     db.commit()
+    versions.bump(versions.GRADES, versions.ASSIGNMENTS)
+    publish_assignment_changes(db, [assignment_id])
+    schedule_backup(assignment_id)
     return {"message": "Grade deleted successfully"}
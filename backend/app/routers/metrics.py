@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..metrics import registry
+from .. import startup
+
+router = APIRouter(tags=["Metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Per-route latency, SQL statement counts and DB time in the Prometheus text format"""
+    return PlainTextResponse(registry.prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/debug/perf")
+def performance_summary():
+    """
+    Per-route averages (slowest total first) and the latest slow statements.
+    Counters cover the time since `since` - the process start; `startup`
+    holds how long the boot steps took.
+    """
+    return {**registry.summary(), "startup": startup.summary()}
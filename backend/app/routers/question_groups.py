@@ -2,13 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from ..database import get_db
+from .. import versions
+from ..etags import etag, REFERENCE_CACHE
 from ..models import QuestionGroup
 from ..schemas import QuestionGroupCreate, QuestionGroupResponse
 
 router = APIRouter(prefix="/question-groups", tags=["Question Groups"])
 
 
-@router.get("/", response_model=List[QuestionGroupResponse])
+@router.get("/", response_model=List[QuestionGroupResponse], dependencies=[Depends(etag(versions.QUESTION_GROUPS, cache_control=REFERENCE_CACHE))])
 def get_all_question_groups(db: Session = Depends(get_db)):
     """Get all question groups"""
     return db.query(QuestionGroup).order_by(QuestionGroup.code).all()
@@ -37,11 +39,12 @@ def create_question_group(group: QuestionGroupCreate, db: Session = Depends(get_
     )
     db.add(db_group)
     db.commit()
+    versions.bump(versions.QUESTION_GROUPS)
     db.refresh(db_group)
     return db_group
 
 
-@router.get("/{group_id}", response_model=QuestionGroupResponse)
+@router.get("/{group_id}", response_model=QuestionGroupResponse, dependencies=[Depends(etag(versions.QUESTION_GROUPS, cache_control=REFERENCE_CACHE))])
 def get_question_group(group_id: int, db: Session = Depends(get_db)):
     """Get a specific question group"""
     group = db.query(QuestionGroup).filter(QuestionGroup.id == group_id).first()
@@ -66,6 +69,7 @@ def update_question_group(group_id: int, group: QuestionGroupCreate, db: Session
     db_group.total_marks = total
     
     db.commit()
+    versions.bump(versions.QUESTION_GROUPS)
     db.refresh(db_group)
     return db_group
 
@@ -78,4 +82,5 @@ def delete_question_group(group_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Question group not found")
     db.delete(group)
     db.commit()
+    versions.bump(versions.QUESTION_GROUPS)
     return {"message": "Question group deleted successfully"}
@@ -1,416 +1,386 @@
 from fastapi import APIRouter, Depends, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy import func, case, and_, select
+from typing import Iterator, List, Optional
 from io import StringIO
+from datetime import datetime
 import csv
-from ..database import get_db
+from ..database import SessionLocal, AnySession, get_async_db, run_db
+from .. import versions, reference_cache
+from ..etags import etag
+from ..metrics import query_budget
 from ..models import (
     Grade, StudentAssignment, Teacher, Student, 
     Team, QuestionGroup, ExamSession
 )
 from ..schemas import TeacherStats, StudentResult, ExportData
+from ..results import ComputedResult, QUESTION_NUMBERS, PROGRESS_FIELDS, iter_results, team_progress
+from ..spreadsheets import XLSX_MEDIA_TYPE, iter_xlsx
 
 router = APIRouter(prefix="/reports", tags=["Reports & Export"])
 
+RESULT_VERSIONS = (
+    versions.ASSIGNMENTS, versions.GRADES, versions.STUDENTS,
+    versions.TEAMS, versions.TEACHERS, versions.QUESTION_GROUPS
+)
+
+# Reports are a fixed number of aggregate queries, plus reference-cache reloads
+# after a change - never a query per student or teacher
+REPORT_QUERY_BUDGET = 6
+
+
+MAX_GRADING_MINUTES = 120  # Ignore unrealistic times (>2 hours)
+
+
+def _grading_minutes(db: Session):
+    """Minutes between grading start and finish, computed by the database"""
+    if db.get_bind().dialect.name == "sqlite":
+        return (func.julianday(Grade.grading_finished_at) - func.julianday(Grade.grading_started_at)) * 1440
+    return func.extract("epoch", Grade.grading_finished_at - Grade.grading_started_at) / 60
+
+
+def _round_minutes(value):
+    return round(float(value), 1) if value is not None else None
+
 
-@router.get("/teacher-stats", response_model=List[TeacherStats])
-def get_teacher_statistics(
+@router.get("/teacher-stats", response_model=List[TeacherStats], dependencies=[Depends(etag(*RESULT_VERSIONS)), Depends(query_budget(REPORT_QUERY_BUDGET))])
+async def get_teacher_statistics(
     exam_session_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_async_db)
 ):
-    """Get statistics for each teacher - grading count and average time."""
-    teachers = db.query(Teacher).options(joinedload(Teacher.team)).all()
+    """Get statistics for each teacher - grading count and grading time percentiles."""
+    return await run_db(db, _teacher_statistics, exam_session_id)
+
+
+def _teacher_statistics(db: Session, exam_session_id: Optional[int]) -> List[TeacherStats]:
+    minutes = _grading_minutes(db)
+    is_valid = case((and_(minutes > 0, minutes < MAX_GRADING_MINUTES), 1), else_=0)
     
-    stats = []
-    for teacher in teachers:
-        # Get grades for this teacher
-        query = db.query(Grade).filter(Grade.teacher_id == teacher.id)
-        
-        if exam_session_id:
-            query = query.join(StudentAssignment).filter(
-                StudentAssignment.exam_session_id == exam_session_id
-            )
-        
-        grades = query.all()
-        
-        # Calculate average grading time
-        grading_times = []
-        for g in grades:
-            if g.grading_started_at and g.grading_finished_at:
-                duration = (g.grading_finished_at - g.grading_started_at).total_seconds() / 60
-                if duration > 0 and duration < 120:  # Ignore unrealistic times (>2 hours)
-                    grading_times.append(duration)
-        
-        avg_time = round(sum(grading_times) / len(grading_times), 1) if grading_times else None
-        
-        stats.append(TeacherStats(
-            teacher_id=teacher.id,
-            teacher_name=teacher.name,
-            team_name=teacher.team.name,
-            total_students_graded=len([g for g in grades if g.total_q1_q9 is not None]),
-            average_grading_minutes=avg_time
-        ))
+    # One row per grade with its duration and its rank among the teacher's valid durations
+    durations = select(
+        Grade.teacher_id,
+        Grade.total_q1_q9,
+        minutes.label("minutes"),
+        is_valid.label("is_valid"),
+        func.cume_dist().over(
+            partition_by=(Grade.teacher_id, is_valid),
+            order_by=minutes
+        ).label("rank")
+    )
+    if exam_session_id:
+        durations = durations.join(
+            StudentAssignment, StudentAssignment.id == Grade.assignment_id
+        ).where(StudentAssignment.exam_session_id == exam_session_id)
+    durations = durations.subquery()
+    
+    valid = durations.c.is_valid == 1
+    
+    def percentile(fraction):
+        # Nearest-rank percentile: smallest duration with at least `fraction` of durations at or below it
+        return func.min(case((and_(valid, durations.c.rank >= fraction), durations.c.minutes)))
     
-    return stats
+    rows = db.execute(
+        select(
+            Teacher.id,
+            Teacher.name,
+            Team.name.label("team_name"),
+            func.count(durations.c.total_q1_q9).label("graded"),
+            func.avg(case((valid, durations.c.minutes))).label("mean"),
+            percentile(0.5).label("p50"),
+            percentile(0.9).label("p90"),
+            func.max(case((valid, durations.c.minutes))).label("max")
+        ).join(
+            Team, Team.id == Teacher.team_id
+        ).outerjoin(
+            durations, durations.c.teacher_id == Teacher.id
+        ).group_by(
+            Teacher.id, Teacher.name, Team.name
+        ).order_by(Teacher.id)
+    )
+    
+    return [
+        TeacherStats(
+            teacher_id=row.id,
+            teacher_name=row.name,
+            team_name=row.team_name,
+            total_students_graded=row.graded,
+            average_grading_minutes=_round_minutes(row.mean),
+            p50_grading_minutes=_round_minutes(row.p50),
+            p90_grading_minutes=_round_minutes(row.p90),
+            max_grading_minutes=_round_minutes(row.max)
+        )
+        for row in rows
+    ]
+
 
+def _marks_dict(marks):
+    return {f"q{i}": mark for i, mark in zip(QUESTION_NUMBERS, marks)}
 
-@router.get("/student-results", response_model=List[StudentResult])
-def get_student_results(
+
+@router.get("/student-results", response_model=List[StudentResult], dependencies=[Depends(etag(*RESULT_VERSIONS)), Depends(query_budget(REPORT_QUERY_BUDGET))])
+async def get_student_results(
     team_id: Optional[int] = None,
     question_group_id: Optional[int] = None,
     exam_session_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_async_db)
 ):
     """Get all student results with averaged marks"""
-    query = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.student),
-        joinedload(StudentAssignment.team),
-        joinedload(StudentAssignment.question_group),
-        joinedload(StudentAssignment.grades)
-    )
-    
-    if team_id:
-        query = query.filter(StudentAssignment.team_id == team_id)
-    if question_group_id:
-        query = query.filter(StudentAssignment.question_group_id == question_group_id)
-    if exam_session_id:
-        query = query.filter(StudentAssignment.exam_session_id == exam_session_id)
-    
-    assignments = query.all()
-    
+    return await run_db(db, _student_results, team_id, question_group_id, exam_session_id)
+
+
+def _student_results(
+    db: Session,
+    team_id: Optional[int],
+    question_group_id: Optional[int],
+    exam_session_id: Optional[int]
+) -> List[StudentResult]:
     results = []
-    for assignment in assignments:
-        # Skip if student or team or question_group is None (deleted)
-        if not assignment.student or not assignment.team or not assignment.question_group:
-            continue
-            
-        # Get grades from all teachers (up to 3)
-        grades = assignment.grades
-        teacher1_grade = None
-        teacher2_grade = None
-        teacher3_grade = None
-        
-        for grade in grades:
-            teacher = db.query(Teacher).filter(Teacher.id == grade.teacher_id).first()
-            if teacher:
-                if teacher.position == 1:
-                    teacher1_grade = grade
-                elif teacher.position == 2:
-                    teacher2_grade = grade
-                elif teacher.position == 3:
-                    teacher3_grade = grade
-        
-        # Build marks dictionaries
-        teacher1_marks = {}
-        teacher2_marks = {}
-        teacher3_marks = {}
-        average_marks = {}
-        
-        for i in range(1, 10):
-            q_key = f"q{i}"
-            t1_mark = getattr(teacher1_grade, f'q{i}_mark', None) if teacher1_grade else None
-            t2_mark = getattr(teacher2_grade, f'q{i}_mark', None) if teacher2_grade else None
-            t3_mark = getattr(teacher3_grade, f'q{i}_mark', None) if teacher3_grade else None
-            
-            teacher1_marks[q_key] = t1_mark
-            teacher2_marks[q_key] = t2_mark
-            teacher3_marks[q_key] = t3_mark
-            
-            # Calculate average of all available marks
-            available_marks = [m for m in [t1_mark, t2_mark, t3_mark] if m is not None]
-            if available_marks:
-                average_marks[q_key] = sum(available_marks) / len(available_marks)
-            else:
-                average_marks[q_key] = None
-        
-        # Calculate total average for Q1-Q9
-        total_avg = sum([v for v in average_marks.values() if v is not None])
-        
-        # Calculate final total
-        final_total = None
-        if total_avg > 0 and assignment.q10_mark is not None:
-            final_total = total_avg + assignment.q10_mark
-        
+    for result in iter_results(db, team_id, question_group_id, exam_session_id):
+        teacher1_marks, teacher2_marks, teacher3_marks = result.teacher_marks
         results.append(StudentResult(
-            student_id=assignment.student.id,
-            student_name=assignment.student.name,
-            student_birth_year=assignment.student.birth_year,
-            regular_teacher=assignment.student.regular_teacher,
-            team_name=assignment.team.name,
-            question_group=f"گرووپ {assignment.question_group.code}",
-            teacher1_marks=teacher1_marks,
-            teacher2_marks=teacher2_marks,
-            teacher3_marks=teacher3_marks if any(v is not None for v in teacher3_marks.values()) else None,
-            average_marks=average_marks,
-            total_average_q1_q9=round(total_avg, 2) if total_avg > 0 else None,
-            q10_mark=assignment.q10_mark,
-            final_total=round(final_total, 2) if final_total else None,
-            exam_incomplete=assignment.exam_incomplete or False
+            student_id=result.student_id,
+            student_name=result.student_name,
+            student_birth_year=result.student_birth_year,
+            regular_teacher=result.regular_teacher,
+            team_name=result.team_name,
+            question_group=f"گرووپ {result.question_group_code}",
+            teacher1_marks=_marks_dict(teacher1_marks),
+            teacher2_marks=_marks_dict(teacher2_marks),
+            teacher3_marks=_marks_dict(teacher3_marks) if any(m is not None for m in teacher3_marks) else None,
+            average_marks=_marks_dict(result.average_marks),
+            total_average_q1_q9=result.total_average_q1_q9,
+            q10_mark=result.q10_mark,
+            final_total=result.final_total,
+            exam_incomplete=result.exam_incomplete
         ))
     
     return results
 
 
-@router.get("/export/csv")
-def export_to_csv_detailed(
-    exam_session_id: Optional[int] = None,
-    db: Session = Depends(get_db)
-):
-    """Export DETAILED results to CSV - includes all marks from both teachers"""
-    # Get all results
-    query = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.student),
-        joinedload(StudentAssignment.team),
-        joinedload(StudentAssignment.question_group),
-        joinedload(StudentAssignment.grades)
-    )
-    
-    if exam_session_id:
-        query = query.filter(StudentAssignment.exam_session_id == exam_session_id)
-    
-    assignments = query.all()
-    
-    # Create CSV in memory
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Header row (Kurdish headers)
-    header = [
-        'ناوی قوتابی', 'ساڵی لەدایکبوون', 'مامۆستای بابەت', 'تیم', 'گرووپی پرسیار', 'بارودۆخ',
-        'م١ پ١', 'م١ پ٢', 'م١ پ٣', 'م١ پ٤', 'م١ پ٥', 'م١ پ٦', 'م١ پ٧', 'م١ پ٨', 'م١ پ٩',
-        'م٢ پ١', 'م٢ پ٢', 'م٢ پ٣', 'م٢ پ٤', 'م٢ پ٥', 'م٢ پ٦', 'م٢ پ٧', 'م٢ پ٨', 'م٢ پ٩',
-        'ناوەند پ١', 'ناوەند پ٢', 'ناوەند پ٣', 'ناوەند پ٤', 'ناوەند پ٥', 'ناوەند پ٦', 'ناوەند پ٧', 'ناوەند پ٨', 'ناوەند پ٩',
-        'کۆی پ١-پ٩', 'پ١٠', 'کۆی گشتی'
+# Header row (Kurdish headers)
+DETAILED_CSV_HEADER = [
+    'ناوی قوتابی', 'ساڵی لەدایکبوون', 'مامۆستای بابەت', 'تیم', 'گرووپی پرسیار', 'بارودۆخ',
+    'م١ پ١', 'م١ پ٢', 'م١ پ٣', 'م١ پ٤', 'م١ پ٥', 'م١ پ٦', 'م١ پ٧', 'م١ پ٨', 'م١ پ٩',
+    'م٢ پ١', 'م٢ پ٢', 'م٢ پ٣', 'م٢ پ٤', 'م٢ پ٥', 'م٢ پ٦', 'م٢ پ٧', 'م٢ پ٨', 'م٢ پ٩',
+    'ناوەند پ١', 'ناوەند پ٢', 'ناوەند پ٣', 'ناوەند پ٤', 'ناوەند پ٥', 'ناوەند پ٦', 'ناوەند پ٧', 'ناوەند پ٨', 'ناوەند پ٩',
+    'کۆی پ١-پ٩', 'پ١٠', 'کۆی گشتی'
+]
+
+# Simple header (Kurdish)
+SUMMARY_CSV_HEADER = ['ناوی قوتابی', 'ساڵی لەدایکبوون', 'مامۆستای بابەت', 'تیم', 'گرووپ', 'کۆی گشتی', 'بارودۆخ', 'دەرچوو/نەدەرچوو']
+
+
+def _blank(value):
+    return value if value is not None else ''
+
+
+def _detailed_row(result: ComputedResult) -> list:
+    row = [
+        result.student_name,
+        result.student_birth_year or '',
+        result.regular_teacher or '',
+        result.team_name,
+        f"گرووپ {result.question_group_code}",
+        result.status
     ]
-    writer.writerow(header)
-    
-    for assignment in assignments:
-        # Get grades
-        grades = assignment.grades
-        teacher1_grade = None
-        teacher2_grade = None
-        
-        for grade in grades:
-            teacher = db.query(Teacher).filter(Teacher.id == grade.teacher_id).first()
-            if teacher:
-                if teacher.position == 1:
-                    teacher1_grade = grade
-                else:
-                    teacher2_grade = grade
-        
-        # Determine status
-        if assignment.exam_incomplete:
-            status = 'تەواونەکرد'
-        elif assignment.is_completed:
-            status = 'تەواوبوو'
-        else:
-            status = 'چاوەڕوان'
-        
-        # Build row
-        row = [
-            assignment.student.name,
-            assignment.student.birth_year or '',
-            assignment.student.regular_teacher or '',
-            assignment.team.name,
-            f"گرووپ {assignment.question_group.code}",
-            status
-        ]
-        
-        # Teacher 1 marks
-        for i in range(1, 10):
-            mark = getattr(teacher1_grade, f'q{i}_mark', None) if teacher1_grade else None
-            row.append(mark if mark is not None else '')
-        
-        # Teacher 2 marks
-        for i in range(1, 10):
-            mark = getattr(teacher2_grade, f'q{i}_mark', None) if teacher2_grade else None
-            row.append(mark if mark is not None else '')
-        
-        # Average marks
-        avg_marks = []
-        for i in range(1, 10):
-            t1_mark = getattr(teacher1_grade, f'q{i}_mark', None) if teacher1_grade else None
-            t2_mark = getattr(teacher2_grade, f'q{i}_mark', None) if teacher2_grade else None
-            
-            if t1_mark is not None and t2_mark is not None:
-                avg = (t1_mark + t2_mark) / 2
-            elif t1_mark is not None:
-                avg = t1_mark
-            elif t2_mark is not None:
-                avg = t2_mark
-            else:
-                avg = None
-            
-            avg_marks.append(avg)
-            row.append(round(avg, 2) if avg is not None else '')
-        
-        # Total average Q1-Q9
-        total_avg = sum([a for a in avg_marks if a is not None])
-        row.append(round(total_avg, 2) if total_avg > 0 else '')
-        
-        # Q10
-        row.append(assignment.q10_mark if assignment.q10_mark is not None else '')
+    # Teacher 1 and teacher 2 marks
+    row.extend(_blank(mark) for mark in result.teacher_marks[0])
+    row.extend(_blank(mark) for mark in result.teacher_marks[1])
+    # Average marks
+    row.extend(round(avg, 2) if avg is not None else '' for avg in result.average_marks)
+    row.append(_blank(result.total_average_q1_q9))
+    row.append(_blank(result.q10_mark))
+    row.append(_blank(result.final_total))
+    return row
+
+
+def _summary_row(result: ComputedResult) -> list:
+    return [
+        result.student_name,
+        result.student_birth_year or '',
+        result.regular_teacher or '',
+        result.team_name,
+        f"گرووپ {result.question_group_code}",
+        _blank(result.final_total),
+        result.status,
+        result.pass_label
+    ]
+
+
+CSV_CHUNK_ROWS = 500  # Rows fetched and flushed to the client at a time
+
+
+def _iter_csv(
+    header: list,
+    build_row,
+    exam_session_id: Optional[int],
+    include_marks: bool = True
+) -> Iterator[bytes]:
+    """
+    Yield the CSV as encoded chunks while the results are still being read.
+    Uses its own session because the response body outlives the request's dependencies.
+    """
+    db = SessionLocal()
+    try:
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
         
-        # Final total
-        if total_avg > 0 and assignment.q10_mark is not None:
-            final_total = total_avg + assignment.q10_mark
-            row.append(round(final_total, 2))
-        else:
-            row.append('')
+        results = iter_results(
+            db, exam_session_id=exam_session_id,
+            chunk_size=CSV_CHUNK_ROWS, include_marks=include_marks
+        )
+        for count, result in enumerate(results, start=1):
+            writer.writerow(build_row(result))
+            if count % CSV_CHUNK_ROWS == 0:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
         
-        writer.writerow(row)
-    
-    output.seek(0)
-    
-    # Generate filename with date
-    from datetime import datetime
-    date_str = datetime.now().strftime('%Y-%m-%d')
-    filename = f"exam_results_detailed_{date_str}.csv"
-    
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    finally:
+        db.close()
+
+
+def _csv_response(chunks: Iterator[bytes], filename: str) -> StreamingResponse:
     return StreamingResponse(
-        iter([output.getvalue()]),
+        chunks,
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 
-@router.get("/export/csv-summary")
-def export_to_csv_summary(
-    exam_session_id: Optional[int] = None,
-    db: Session = Depends(get_db)
-):
+@router.get("/export/csv", dependencies=[Depends(query_budget(REPORT_QUERY_BUDGET))])
+def export_to_csv_detailed(exam_session_id: Optional[int] = None):
+    """Export DETAILED results to CSV - includes all marks from both teachers"""
+    # Generate filename with date
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    return _csv_response(
+        _iter_csv(DETAILED_CSV_HEADER, _detailed_row, exam_session_id),
+        f"exam_results_detailed_{date_str}.csv"
+    )
+
+
+@router.get("/export/csv-summary", dependencies=[Depends(query_budget(REPORT_QUERY_BUDGET))])
+def export_to_csv_summary(exam_session_id: Optional[int] = None):
     """Export SUMMARY results to CSV - student info and total mark only"""
-    from datetime import datetime as dt
-    
-    query = db.query(StudentAssignment).options(
-        joinedload(StudentAssignment.student),
-        joinedload(StudentAssignment.team),
-        joinedload(StudentAssignment.question_group),
-        joinedload(StudentAssignment.grades)
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    return _csv_response(
+        _iter_csv(SUMMARY_CSV_HEADER, _summary_row, exam_session_id, include_marks=False),
+        f"exam_results_summary_{date_str}.csv"
     )
-    
-    if exam_session_id:
-        query = query.filter(StudentAssignment.exam_session_id == exam_session_id)
-    
-    assignments = query.all()
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Simple header (Kurdish)
-    header = ['ناوی قوتابی', 'ساڵی لەدایکبوون', 'مامۆستای بابەت', 'تیم', 'گرووپ', 'کۆی گشتی', 'بارودۆخ', 'دەرچوو/نەدەرچوو']
-    writer.writerow(header)
-    
-    for assignment in assignments:
-        if not assignment.student:
-            continue
-            
-        # Calculate final total
-        grades = assignment.grades
-        teacher1_grade = None
-        teacher2_grade = None
-        
-        for grade in grades:
-            teacher = db.query(Teacher).filter(Teacher.id == grade.teacher_id).first()
-            if teacher:
-                if teacher.position == 1:
-                    teacher1_grade = grade
-                else:
-                    teacher2_grade = grade
-        
-        # Calculate average Q1-Q9
-        avg_marks = []
-        for i in range(1, 10):
-            t1_mark = getattr(teacher1_grade, f'q{i}_mark', None) if teacher1_grade else None
-            t2_mark = getattr(teacher2_grade, f'q{i}_mark', None) if teacher2_grade else None
-            
-            if t1_mark is not None and t2_mark is not None:
-                avg_marks.append((t1_mark + t2_mark) / 2)
-            elif t1_mark is not None:
-                avg_marks.append(t1_mark)
-            elif t2_mark is not None:
-                avg_marks.append(t2_mark)
-        
-        total_avg = sum(avg_marks) if avg_marks else 0
-        
-        # Final total
-        final_total = None
-        if total_avg > 0 and assignment.q10_mark is not None:
-            final_total = total_avg + assignment.q10_mark
-        
-        # Status and pass/fail
-        if assignment.exam_incomplete:
-            status = 'تەواونەکرد'
-            pass_fail = 'نەدەرچوو'
-        elif final_total is not None:
-            status = 'تەواوبوو'
-            pass_fail = 'دەرچوو' if final_total >= 80 else 'نەدەرچوو'
-        else:
-            status = 'چاوەڕوان'
-            pass_fail = '-'
-        
-        row = [
-            assignment.student.name,
-            assignment.student.birth_year or '',
-            assignment.student.regular_teacher or '',
-            assignment.team.name,
-            f"گرووپ {assignment.question_group.code}",
-            round(final_total, 2) if final_total else '',
-            status,
-            pass_fail
-        ]
-        writer.writerow(row)
-    
-    output.seek(0)
-    
-    date_str = dt.now().strftime('%Y-%m-%d')
-    filename = f"exam_results_summary_{date_str}.csv"
-    
+
+
+def _xlsx_response(chunks: Iterator[bytes], filename: str) -> StreamingResponse:
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
+        chunks,
+        media_type=XLSX_MEDIA_TYPE,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 
-@router.get("/summary")
-def get_summary(
+@router.get("/export/xlsx", dependencies=[Depends(query_budget(REPORT_QUERY_BUDGET))])
+def export_to_xlsx_detailed(exam_session_id: Optional[int] = None):
+    """Export DETAILED results to Excel - same columns as the detailed CSV, with numeric cells and RTL sheet"""
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    return _xlsx_response(
+        iter_xlsx("ئەنجامی ورد", DETAILED_CSV_HEADER, _detailed_row, exam_session_id),
+        f"exam_results_detailed_{date_str}.xlsx"
+    )
+
+
+@router.get("/export/xlsx-summary", dependencies=[Depends(query_budget(REPORT_QUERY_BUDGET))])
+def export_to_xlsx_summary(exam_session_id: Optional[int] = None):
+    """Export SUMMARY results to Excel - student info and total mark only"""
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    return _xlsx_response(
+        iter_xlsx("کورتە", SUMMARY_CSV_HEADER, _summary_row, exam_session_id, include_marks=False),
+        f"exam_results_summary_{date_str}.xlsx"
+    )
+
+
+COLUMNAR_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+def _columnar_response(file_format: str, exam_session_id: Optional[int]) -> StreamingResponse:
+    # pyarrow is slow to import, so it stays off the startup path
+    from ..columnar import iter_export
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    return StreamingResponse(
+        iter_export(file_format, exam_session_id),
+        media_type=COLUMNAR_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f"attachment; filename=exam_results_{date_str}.{file_format}"}
+    )
+
+
+@router.get("/export/parquet", dependencies=[Depends(query_budget(REPORT_QUERY_BUDGET))])
+def export_to_parquet(exam_session_id: Optional[int] = None):
+    """Export DETAILED results as a typed Parquet file (pandas.read_parquet), Kurdish headers in the column metadata"""
+    return _columnar_response("parquet", exam_session_id)
+
+
+@router.get("/export/arrow", dependencies=[Depends(query_budget(REPORT_QUERY_BUDGET))])
+def export_to_arrow(exam_session_id: Optional[int] = None):
+    """Same as /export/parquet in the Arrow IPC file format (pandas.read_feather, pyarrow.ipc.open_file)"""
+    return _columnar_response("arrow", exam_session_id)
+
+
+# exam_session_id -> (data versions, response); any id can be requested, so it is capped
+_summary_cache = {}
+MAX_CACHED_SUMMARIES = 16
+SUMMARY_VERSIONS = (versions.ASSIGNMENTS, versions.STUDENTS, versions.TEAMS)
+
+
+@router.get("/summary", dependencies=[Depends(etag(*SUMMARY_VERSIONS)), Depends(query_budget(REPORT_QUERY_BUDGET))])
+async def get_summary(
     exam_session_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_async_db)
 ):
-    """Get overall summary statistics"""
-    query = db.query(StudentAssignment)
-    
-    if exam_session_id:
-        query = query.filter(StudentAssignment.exam_session_id == exam_session_id)
+    """Get overall summary statistics (cached until assignments, students or teams change)"""
+    data_version = versions.get(*SUMMARY_VERSIONS)
+    cached = _summary_cache.get(exam_session_id)
+    if cached and cached[0] == data_version:
+        return cached[1]
     
-    assignments = query.all()
+    summary = await run_db(db, _summary, exam_session_id)
+    if len(_summary_cache) >= MAX_CACHED_SUMMARIES:
+        _summary_cache.clear()
+    _summary_cache[exam_session_id] = (data_version, summary)
+    return summary
+
+
+def _summary(db: Session, exam_session_id: Optional[int]) -> dict:
+    # Per-team counts in one pass over the session's assignments
+    counts = team_progress(db, exam_session_id)
     
     # Get total registered students (all students in the database)
-    total_registered_students = db.query(Student).count()
+    total_registered_students = db.query(func.count(Student.id)).scalar()
     
     # Students who took the test (have assignments)
-    total_students = len(assignments)
-    completed = len([a for a in assignments if a.is_completed])
-    pending_teacher1 = len([a for a in assignments if not a.is_graded_teacher1])
-    pending_teacher2 = len([a for a in assignments if not a.is_graded_teacher2])
-    pending_q10 = len([a for a in assignments if a.q10_mark is None])
+    totals = {field: sum(c[field] for c in counts.values()) for field in PROGRESS_FIELDS}
+    total_students, completed, pending_teacher1, pending_teacher2, pending_q10 = (
+        totals[field] for field in PROGRESS_FIELDS
+    )
     
-    # Team breakdown
-    teams = db.query(Team).all()
+    # Team breakdown - carries every counter so live events can update it in place
     team_stats = []
-    for team in teams:
-        team_assignments = [a for a in assignments if a.team_id == team.id]
+    empty = dict.fromkeys(PROGRESS_FIELDS, 0)
+    for team in reference_cache.teams(db):
         team_stats.append({
             "team_id": team.id,
             "team_name": team.name,
-            "total": len(team_assignments),
-            "completed": len([a for a in team_assignments if a.is_completed])
+            **counts.get(team.id, empty)
         })
     
-    return {
+    summary = {
         "total_registered_students": total_registered_students,  # گشت قوتابییان - all registered
         "total_students": total_students,  # کۆی قوتابییان - students who took the test
         "completed": completed,
@@ -420,3 +390,4 @@ def get_summary(
         "pending_q10": pending_q10,
         "team_breakdown": team_stats
     }
+    return summary
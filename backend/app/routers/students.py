@@ -1,29 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
 from sqlalchemy.orm import Session
+from sqlalchemy import insert, func
+from sqlalchemy.orm import load_only
 from typing import List, Optional
+import codecs
 import csv
-import io
 from ..database import get_db
+from .. import versions
+from ..etags import etag
+from ..metrics import query_budget
 from ..models import Student
 from ..schemas import StudentCreate, StudentResponse, StudentUpdate
+from ..pagination import MAX_PAGE_SIZE, parse_fields, cached_count, keyset_page, set_page_headers
+from ..search import normalize_search_text, name_matches, ranked_order
 
 router = APIRouter(prefix="/students", tags=["Students"])
 
 
-@router.get("/", response_model=List[StudentResponse])
+STUDENT_FIELDS = list(StudentResponse.model_fields)
+MAX_SEARCH_RESULTS = 100
+
+
+def _name_condition(db: Session, term: str):
+    return name_matches(Student.search_key, Student.id, term, db.get_bind().dialect.name)
+
+
+@router.get(
+    "/",
+    response_model=None,
+    responses={200: {"model": List[StudentResponse]}},
+    dependencies=[Depends(etag(versions.STUDENTS))]
+)
 def get_all_students(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
     search: Optional[str] = None,
+    fields: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True, description="Use after_id (X-Next-Cursor) instead"),
     db: Session = Depends(get_db)
 ):
-    """Get all students with optional search and pagination"""
-    query = db.query(Student)
+    """
+    Get students whose name contains `search`, in id order, a page at a time.
+    Pass the previous page's X-Next-Cursor header as after_id to get the
+    next page. X-Total-Count holds the number of matching students.
+    fields=id,name returns only those fields.
+    """
+    selected = parse_fields(fields, STUDENT_FIELDS)
+    
+    term = normalize_search_text(search)
+    conditions = [_name_condition(db, term)] if term else []
     
-    if search:
-        query = query.filter(Student.name.ilike(f"%{search}%"))
+    query = db.query(Student).filter(*conditions)
+    if selected is not None:
+        query = query.options(load_only(*[getattr(Student, f) for f in selected]))
+    students, next_cursor = keyset_page(query, Student.id, after_id, limit, offset=skip)
     
-    return query.offset(skip).limit(limit).all()
+    total = cached_count(
+        ("students", term),
+        (versions.STUDENTS,),
+        lambda: db.query(func.count(Student.id)).filter(*conditions).scalar()
+    )
+    set_page_headers(response, total, next_cursor)
+    
+    if selected is None:
+        return [StudentResponse.model_validate(s) for s in students]
+    return [{f: getattr(s, f) for f in selected} for s in students]
+
+
+@router.get("/search", response_model=List[StudentResponse], dependencies=[Depends(etag(versions.STUDENTS))])
+def search_students(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    db: Session = Depends(get_db)
+):
+    """
+    Best matches for a name, ignoring Arabic/Kurdish spelling variants:
+    exact name first, then names starting with it, then a later word
+    starting with it, then anywhere in the name.
+    """
+    term = normalize_search_text(q)
+    if not term:
+        return []
+    return db.query(Student).filter(
+        _name_condition(db, term)
+    ).order_by(
+        *ranked_order(Student.search_key, Student.name, Student.id, term)
+    ).limit(limit).all()
 
 
 @router.post("/", response_model=StudentResponse)
@@ -32,6 +95,7 @@ def create_student(student: StudentCreate, db: Session = Depends(get_db)):
     db_student = Student(**student.model_dump())
     db.add(db_student)
     db.commit()
+    versions.bump(versions.STUDENTS)
     db.refresh(db_student)
     return db_student
 
@@ -39,15 +103,18 @@ def create_student(student: StudentCreate, db: Session = Depends(get_db)):
 @router.post("/bulk", response_model=List[StudentResponse])
 def create_students_bulk(students: List[StudentCreate], db: Session = Depends(get_db)):
     """Create multiple students at once"""
-    db_students = [Student(**s.model_dump()) for s in students]
-    db.add_all(db_students)
+    if not students:
+        return []
+    # One executemany that returns the new rows, instead of a refresh per student.
+    # Ids follow the input order; sort_by_parameter_order would make SQLite insert row by row.
+    table = Student.__table__
+    rows = db.execute(insert(table).returning(*table.c), [s.model_dump() for s in students]).all()
     db.commit()
-    for s in db_students:
-        db.refresh(s)
-    return db_students
+    versions.bump(versions.STUDENTS)
+    return sorted(rows, key=lambda r: r.id)
 
 
-@router.get("/{student_id}", response_model=StudentResponse)
+@router.get("/{student_id}", response_model=StudentResponse, dependencies=[Depends(etag(versions.STUDENTS))])
 def get_student(student_id: int, db: Session = Depends(get_db)):
     """Get a specific student"""
     student = db.query(Student).filter(Student.id == student_id).first()
@@ -67,6 +134,7 @@ def update_student(student_id: int, student: StudentCreate, db: Session = Depend
         setattr(db_student, key, value)
     
     db.commit()
+    versions.bump(versions.STUDENTS)
     db.refresh(db_student)
     return db_student
 
@@ -79,11 +147,130 @@ def delete_student(student_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Student not found")
     db.delete(student)
     db.commit()
+    versions.bump(versions.STUDENTS)
     return {"message": "Student deleted successfully"}
 
 
-@router.post("/import-csv")
-async def import_students_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+# Column mapping (Kurdish to English)
+CSV_COLUMN_MAP = {
+    'ناوی سییانی': 'name',
+    'ژمارەی تەلەفۆن': 'phone',
+    'ساڵی لەدایکبوون': 'birth_year',
+    'تەمەن': 'birth_year',  # Also accept old column name
+    'مامۆستای بابەت': 'regular_teacher',
+    'نمرەی پرسیاری ١٠': 'q10_mark',
+    'وەرزی دووەم': 'is_second_term',  # Second term flag
+    'گرووپی پێشوو': 'previous_question_group',  # Previous question group
+    # Also allow English column names
+    'name': 'name',
+    'phone': 'phone',
+    'birth_year': 'birth_year',
+    'age': 'birth_year',
+    'regular_teacher': 'regular_teacher',
+    'q10_mark': 'q10_mark',
+    'q10': 'q10_mark',
+    'is_second_term': 'is_second_term',
+    'second_term': 'is_second_term',
+    'previous_question_group': 'previous_question_group',
+    'previous_group': 'previous_question_group'
+}
+
+# utf-8-sig also reads plain UTF-8, and drops the BOM Excel adds
+CSV_ENCODINGS = ['utf-8-sig', 'cp1256', 'iso-8859-1']
+IMPORT_CHUNK_SIZE = 1000  # Students inserted per transaction
+DECODE_BLOCK_SIZE = 1024 * 1024
+
+
+def _detect_encoding(f) -> Optional[str]:
+    """First encoding that decodes the whole file, checked block by block"""
+    for encoding in CSV_ENCODINGS:
+        f.seek(0)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            while True:
+                block = f.read(DECODE_BLOCK_SIZE)
+                decoder.decode(block, final=not block)
+                if not block:
+                    break
+        except UnicodeDecodeError:
+            continue
+        f.seek(0)
+        return encoding
+    return None
+
+
+def _map_row(row: list, fields: list) -> dict:
+    """Map one CSV row to Student columns, dropping invalid optional values"""
+    student_data = {
+        'name': None,
+        'phone': None,
+        'birth_year': None,
+        'regular_teacher': None,
+        'q10_mark': None,
+        'is_second_term': False,
+        'previous_question_group': None
+    }
+    for db_field, value in zip(fields, row):
+        if not db_field or not value or not value.strip():
+            continue
+        value = value.strip()
+        if db_field == 'birth_year':
+            try:
+                student_data[db_field] = int(value)
+            except ValueError:
+                pass  # Invalid birth year, skip
+        elif db_field == 'q10_mark':
+            try:
+                q10_val = float(value)
+                # Validate Q10 must be between 0 and 10
+                if 0 <= q10_val <= 10:
+                    student_data[db_field] = q10_val
+            except ValueError:
+                pass  # Invalid Q10, skip
+        elif db_field == 'is_second_term':
+            # Parse boolean: accept 'بەڵێ', 'yes', 'true', '1' as True
+            student_data[db_field] = value.lower() in ['بەڵێ', 'yes', 'true', '1', 'ئارە']
+        elif db_field == 'previous_question_group':
+            # Accept A-G as valid groups
+            group_val = value.upper()
+            if group_val in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
+                student_data[db_field] = group_val
+        else:
+            student_data[db_field] = value
+    return student_data
+
+
+def _insert_chunk(db: Session, chunk: list, students_created: list, errors: list) -> None:
+    """Insert a chunk of (row_num, student_data) in one transaction"""
+    # Table-level insert: one executemany per chunk (the ORM form splits rows by which values are NULL)
+    students = Student.__table__
+    insert_student = insert(students).returning(students.c.id, students.c.name)
+    try:
+        rows = db.execute(insert_student, [data for _, data in chunk]).all()
+        db.commit()
+        students_created.extend({"id": r.id, "name": r.name} for r in rows)
+        return
+    except Exception:
+        db.rollback()
+    
+    # Something in the chunk was rejected - insert row by row to report which
+    for row_num, data in chunk:
+        try:
+            row = db.execute(insert_student, data).one()
+            db.commit()
+            students_created.append({"id": row.id, "name": row.name})
+        except Exception as e:
+            db.rollback()  # Rollback only this row
+            errors.append(f"ڕیزی {row_num}: {str(e)}")
+
+
+# One insert per IMPORT_CHUNK_SIZE rows, and one per row of a rejected chunk
+@router.post("/import-csv", dependencies=[Depends(query_budget(None))])
+def import_students_csv(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    db: Session = Depends(get_db)
+):
     """
     Import students from CSV file
     Expected columns (Kurdish):
@@ -92,110 +279,59 @@ async def import_students_csv(file: UploadFile = File(...), db: Session = Depend
     - ساڵی لەدایکبوون (birth_year) - optional
     - مامۆستای بابەت (regular_teacher) - optional
     - نمرەی پرسیاری ١٠ (q10_mark) - optional
+    
+    The upload is read straight from its spooled file and inserted in chunks of
+    IMPORT_CHUNK_SIZE rows. With dry_run=true nothing is written - only the
+    validation report is returned.
     """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="فایلەکە دەبێت CSV بێت")
     
-    content = await file.read()
-    
-    # Try different encodings
-    for encoding in ['utf-8', 'utf-8-sig', 'cp1256', 'iso-8859-1']:
-        try:
-            decoded = content.decode(encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-    else:
+    encoding = _detect_encoding(file.file)
+    if encoding is None:
         raise HTTPException(status_code=400, detail="ناتوانرێت فایلەکە بخوێنرێتەوە")
     
-    csv_reader = csv.DictReader(io.StringIO(decoded))
-    
-    # Column mapping (Kurdish to English)
-    column_map = {
-        'ناوی سییانی': 'name',
-        'ژمارەی تەلەفۆن': 'phone',
-        'ساڵی لەدایکبوون': 'birth_year',
-        'تەمەن': 'birth_year',  # Also accept old column name
-        'مامۆستای بابەت': 'regular_teacher',
-        'نمرەی پرسیاری ١٠': 'q10_mark',
-        'وەرزی دووەم': 'is_second_term',  # Second term flag
-        'گرووپی پێشوو': 'previous_question_group',  # Previous question group
-        # Also allow English column names
-        'name': 'name',
-        'phone': 'phone',
-        'birth_year': 'birth_year',
-        'age': 'birth_year',
-        'regular_teacher': 'regular_teacher',
-        'q10_mark': 'q10_mark',
-        'q10': 'q10_mark',
-        'is_second_term': 'is_second_term',
-        'second_term': 'is_second_term',
-        'previous_question_group': 'previous_question_group',
-        'previous_group': 'previous_question_group'
-    }
+    csv_reader = csv.reader(codecs.getreader(encoding)(file.file))
+    header = next(csv_reader, [])
+    fields = [CSV_COLUMN_MAP.get(col.strip()) if col else None for col in header]
     
     students_created = []
     errors = []
+    valid_rows = 0
+    chunk = []
     
     for row_num, row in enumerate(csv_reader, start=2):
-        try:
-            student_data = {}
-            for csv_col, value in row.items():
-                if csv_col and csv_col.strip() in column_map:
-                    db_field = column_map[csv_col.strip()]
-                    if db_field == 'birth_year' and value and value.strip():
-                        try:
-                            student_data[db_field] = int(value.strip())
-                        except ValueError:
-                            pass  # Invalid birth year, skip
-                    elif db_field == 'q10_mark' and value and value.strip():
-                        try:
-                            q10_val = float(value.strip())
-                            # Validate Q10 must be between 0 and 10
-                            if 0 <= q10_val <= 10:
-                                student_data[db_field] = q10_val
-                        except ValueError:
-                            pass  # Invalid Q10, skip
-                    elif db_field == 'is_second_term' and value and value.strip():
-                        # Parse boolean: accept 'بەڵێ', 'yes', 'true', '1' as True
-                        val_lower = value.strip().lower()
-                        student_data[db_field] = val_lower in ['بەڵێ', 'yes', 'true', '1', 'ئارە']
-                    elif db_field == 'previous_question_group' and value and value.strip():
-                        # Accept A-G as valid groups
-                        group_val = value.strip().upper()
-                        if group_val in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-                            student_data[db_field] = group_val
-                    else:
-                        clean_value = value.strip() if value else None
-                        if clean_value:  # Only set if not empty
-                            student_data[db_field] = clean_value
-            
-            # Only name is required
-            if not student_data.get('name'):
-                errors.append(f"ڕیزی {row_num}: ناو بەتاڵە")
-                continue  # Skip this row but continue with others
-            
-            db_student = Student(**student_data)
-            db.add(db_student)
-            db.commit()
-            db.refresh(db_student)
-            students_created.append({
-                "id": db_student.id,
-                "name": db_student.name
-            })
-        except Exception as e:
-            db.rollback()  # Rollback only this row
-            errors.append(f"ڕیزی {row_num}: {str(e)}")
-            continue  # Continue with next rows
+        student_data = _map_row(row, fields)
+        
+        # Only name is required
+        if not student_data['name']:
+            errors.append(f"ڕیزی {row_num}: ناو بەتاڵە")
+            continue  # Skip this row but continue with others
+        
+        valid_rows += 1
+        if dry_run:
+            continue
+        
+        chunk.append((row_num, student_data))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _insert_chunk(db, chunk, students_created, errors)
+            chunk = []
     
-    return {
-        "message": f"{len(students_created)} قوتابی زیادکرا",
-        "students_created": students_created,
-        "errors": errors
-    }
+    if chunk:
+        _insert_chunk(db, chunk, students_created, errors)
+    
+    if students_created:
+        versions.bump(versions.STUDENTS)
+    
+    if dry_run:
+        message = f"{valid_rows} قوتابی دروستە (تاقیکردنەوە، هیچ شتێک زیاد نەکرا)"
+    else:
+        message = f"{len(students_created)} قوتابی زیادکرا"
     
     return {
-        "message": f"{len(students_created)} قوتابی زیادکرا",
+        "message": message,
+        "dry_run": dry_run,
+        "valid_rows": valid_rows,
         "students_created": students_created,
         "errors": errors
     }
@@ -206,4 +342,5 @@ def delete_all_students(db: Session = Depends(get_db)):
     """Delete all students"""
     db.query(Student).delete()
     db.commit()
+    versions.bump(versions.STUDENTS)
     return {"message": "هەموو قوتابییەکان سڕانەوە"}
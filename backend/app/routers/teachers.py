@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, and_
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..database import AnySession, get_async_db, run_db
+from .. import versions, reference_cache
+from ..etags import etag
+from ..models import StudentAssignment, Student, Grade
+from ..schemas import (
+    TeacherWorkload, WorkloadTeacher, WorkloadQuestionGroup,
+    WorkloadAssignment, WorkloadGrade
+)
+
+router = APIRouter(prefix="/teachers", tags=["Teachers"])
+
+WORKLOAD_VERSIONS = (
+    versions.ASSIGNMENTS, versions.GRADES, versions.STUDENTS,
+    versions.TEAMS, versions.TEACHERS, versions.QUESTION_GROUPS
+)
+
+GRADE_FIELDS = [f"q{i}_mark" for i in range(1, 10)] + ["total_q1_q9", "grading_finished_at"]
+
+
+@router.get("/{teacher_id}/workload", response_model=TeacherWorkload, dependencies=[Depends(etag(*WORKLOAD_VERSIONS))])
+async def get_teacher_workload(
+    teacher_id: int,
+    exam_session_id: Optional[int] = None,
+    db: AnySession = Depends(get_async_db)
+):
+    """
+    Everything the teacher page needs in one request: the teacher, their
+    team's assignments split into pending and done, their own grade for
+    each, and the max marks of each question group once.
+    """
+    return await run_db(db, _teacher_workload, teacher_id, exam_session_id)
+
+
+def _teacher_workload(db: Session, teacher_id: int, exam_session_id: Optional[int]) -> TeacherWorkload:
+    teacher = reference_cache.teacher(db, teacher_id)
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher not found")
+
+    # One query - this teacher's grade is outer-joined, so each assignment is one row
+    query = select(
+        StudentAssignment.id,
+        StudentAssignment.question_group_id,
+        StudentAssignment.exam_incomplete,
+        Student.name.label("student_name"),
+        Student.birth_year.label("student_birth_year"),
+        Student.regular_teacher,
+        Grade.id.label("grade_id"),
+        *[getattr(Grade, field) for field in GRADE_FIELDS]
+    ).join(
+        Student, Student.id == StudentAssignment.student_id
+    ).outerjoin(
+        Grade, and_(Grade.assignment_id == StudentAssignment.id, Grade.teacher_id == teacher.id)
+    ).where(
+        StudentAssignment.team_id == teacher.team_id
+    ).order_by(StudentAssignment.id)
+    if exam_session_id:
+        query = query.where(StudentAssignment.exam_session_id == exam_session_id)
+
+    pending = []
+    done = []
+    group_ids = set()
+    for row in db.execute(query):
+        grade = None
+        if row.grade_id is not None:
+            grade = WorkloadGrade(id=row.grade_id, **{field: getattr(row, field) for field in GRADE_FIELDS})
+        assignment = WorkloadAssignment(
+            id=row.id,
+            student_name=row.student_name,
+            student_birth_year=row.student_birth_year,
+            regular_teacher=row.regular_teacher,
+            question_group_id=row.question_group_id,
+            exam_incomplete=bool(row.exam_incomplete),
+            grade=grade
+        )
+        group_ids.add(row.question_group_id)
+
+        # A grade row created by start-grading has no marks until it is submitted
+        if assignment.exam_incomplete or (grade and grade.grading_finished_at):
+            done.append(assignment)
+        else:
+            pending.append(assignment)
+
+    question_groups = [
+        WorkloadQuestionGroup(
+            id=group.id,
+            code=group.code,
+            marks_structure=group.marks_structure,
+            total_marks=group.total_marks
+        )
+        for group in reference_cache.question_groups(db)
+        if group.id in group_ids
+    ]
+
+    return TeacherWorkload(
+        teacher=WorkloadTeacher(
+            id=teacher.id,
+            name=teacher.name,
+            position=teacher.position,
+            team_id=teacher.team_id,
+            team_name=teacher.team_name
+        ),
+        question_groups=question_groups,
+        pending=pending,
+        done=done
+    )
@@ -1,37 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List
 from ..database import get_db
+from .. import versions, reference_cache
+from ..etags import etag, REFERENCE_CACHE
 from ..models import Team, Teacher, ExamSession
 from ..schemas import (
     TeamCreate, TeamResponse,
     TeacherCreate, TeacherResponse, TeacherWithTeam
 )
+from ..results import refresh_assignment_results
+from ..events import publish_resync
 
 router = APIRouter(prefix="/teams", tags=["Teams & Teachers"])
 
+TEAM_VIEW = (versions.TEAMS, versions.TEACHERS)  # Teams embed their teachers and vice versa
+SESSION_TEAM_VIEW = TEAM_VIEW + (versions.EXAM_SESSIONS,)
+
+# Responses embed the teachers of each team - load them in one query, not one per team
+WITH_TEACHERS = selectinload(Team.teachers)
+WITH_TEAM = joinedload(Teacher.team).selectinload(Team.teachers)
+
 
 # ========== Team Endpoints ==========
-@router.get("/", response_model=List[TeamResponse])
+@router.get("/", response_model=List[TeamResponse], dependencies=[Depends(etag(*TEAM_VIEW, cache_control=REFERENCE_CACHE))])
 def get_all_teams(db: Session = Depends(get_db)):
     """Get all teams"""
-    return db.query(Team).all()
+    return db.query(Team).options(WITH_TEACHERS).all()
 
 
-@router.get("/for-active-session", response_model=List[TeamResponse])
+@router.get("/for-active-session", response_model=List[TeamResponse], dependencies=[Depends(etag(*SESSION_TEAM_VIEW, cache_control=REFERENCE_CACHE))])
 def get_teams_for_active_session(db: Session = Depends(get_db)):
     """Get teams based on the active session's num_rooms setting"""
     # Get active session
-    active_session = db.query(ExamSession).filter(ExamSession.is_active == True).first()
+    active_session = reference_cache.active_session(db)
     
     if active_session:
-        num_rooms = active_session.num_rooms or 4
         # Get only the first N teams based on num_rooms
-        teams = db.query(Team).order_by(Team.id).limit(num_rooms).all()
-        return teams
+        return db.query(Team).options(WITH_TEACHERS).filter(Team.id.in_(active_session.team_ids)).order_by(Team.id).all()
     else:
         # No active session, return all teams
-        return db.query(Team).all()
+        return db.query(Team).options(WITH_TEACHERS).all()
 
 
 @router.post("/", response_model=TeamResponse)
@@ -40,14 +49,15 @@ def create_team(team: TeamCreate, db: Session = Depends(get_db)):
     db_team = Team(**team.model_dump())
     db.add(db_team)
     db.commit()
+    versions.bump(versions.TEAMS)
     db.refresh(db_team)
     return db_team
 
 
-@router.get("/{team_id}", response_model=TeamResponse)
+@router.get("/{team_id}", response_model=TeamResponse, dependencies=[Depends(etag(*TEAM_VIEW, cache_control=REFERENCE_CACHE))])
 def get_team(team_id: int, db: Session = Depends(get_db)):
     """Get a specific team"""
-    team = db.query(Team).filter(Team.id == team_id).first()
+    team = db.query(Team).options(WITH_TEACHERS).filter(Team.id == team_id).first()
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
     return team
@@ -64,6 +74,7 @@ def update_team(team_id: int, team: TeamCreate, db: Session = Depends(get_db)):
         setattr(db_team, key, value)
     
     db.commit()
+    versions.bump(versions.TEAMS)
     db.refresh(db_team)
     return db_team
 
@@ -76,41 +87,36 @@ def delete_team(team_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Team not found")
     db.delete(team)
     db.commit()
+    versions.bump(versions.TEAMS)
     return {"message": "Team deleted successfully"}
 
 
 # ========== Teacher Endpoints ==========
-@router.get("/teachers/all", response_model=List[TeacherWithTeam])
+@router.get("/teachers/all", response_model=List[TeacherWithTeam], dependencies=[Depends(etag(*TEAM_VIEW, cache_control=REFERENCE_CACHE))])
 def get_all_teachers(db: Session = Depends(get_db)):
     """Get all teachers with their team info"""
-    teachers = db.query(Teacher).all()
+    teachers = db.query(Teacher).options(WITH_TEAM).all()
     return teachers
 
 
-@router.get("/teachers/for-active-session", response_model=List[TeacherWithTeam])
+@router.get("/teachers/for-active-session", response_model=List[TeacherWithTeam], dependencies=[Depends(etag(*SESSION_TEAM_VIEW, cache_control=REFERENCE_CACHE))])
 def get_teachers_for_active_session(db: Session = Depends(get_db)):
     """Get teachers filtered by active session's num_rooms and teachers_per_room"""
-    active_session = db.query(ExamSession).filter(ExamSession.is_active == True).first()
+    active_session = reference_cache.active_session(db)
     
     if active_session:
-        num_rooms = active_session.num_rooms or 4
-        teachers_per_room = active_session.teachers_per_room or 2
-        
-        # Get team IDs for the active session (first N teams)
-        team_ids = [t.id for t in db.query(Team).order_by(Team.id).limit(num_rooms).all()]
-        
-        # Get teachers for those teams, filtered by position
-        teachers = db.query(Teacher).filter(
-            Teacher.team_id.in_(team_ids),
-            Teacher.position <= teachers_per_room
+        # Get teachers for the active session's teams (first N teams), filtered by position
+        teachers = db.query(Teacher).options(WITH_TEAM).filter(
+            Teacher.team_id.in_(active_session.team_ids),
+            Teacher.position <= active_session.teachers_per_room
         ).all()
         return teachers
     else:
         # No active session, return all teachers
-        return db.query(Teacher).all()
+        return db.query(Teacher).options(WITH_TEAM).all()
 
 
-@router.get("/{team_id}/teachers", response_model=List[TeacherResponse])
+@router.get("/{team_id}/teachers", response_model=List[TeacherResponse], dependencies=[Depends(etag(*TEAM_VIEW, cache_control=REFERENCE_CACHE))])
 def get_team_teachers(team_id: int, db: Session = Depends(get_db)):
     """Get all teachers in a specific team"""
     teachers = db.query(Teacher).filter(Teacher.team_id == team_id).all()
@@ -143,14 +149,15 @@ def create_teacher(teacher: TeacherCreate, db: Session = Depends(get_db)):
     db_teacher = Teacher(**teacher.model_dump())
     db.add(db_teacher)
     db.commit()
+    versions.bump(versions.TEACHERS)
     db.refresh(db_teacher)
     return db_teacher
 
 
-@router.get("/teachers/{teacher_id}", response_model=TeacherWithTeam)
+@router.get("/teachers/{teacher_id}", response_model=TeacherWithTeam, dependencies=[Depends(etag(*TEAM_VIEW, cache_control=REFERENCE_CACHE))])
 def get_teacher(teacher_id: int, db: Session = Depends(get_db)):
     """Get a specific teacher"""
-    teacher = db.query(Teacher).filter(Teacher.id == teacher_id).first()
+    teacher = db.query(Teacher).options(WITH_TEAM).filter(Teacher.id == teacher_id).first()
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     return teacher
@@ -163,10 +170,17 @@ def update_teacher(teacher_id: int, teacher: TeacherCreate, db: Session = Depend
     if not db_teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     
+    old_team_id = db_teacher.team_id
     for key, value in teacher.model_dump().items():
         setattr(db_teacher, key, value)
     
+    # Teacher positions decide whose marks are averaged
+    refresh_assignment_results(db, team_id=old_team_id)
+    if db_teacher.team_id != old_team_id:
+        refresh_assignment_results(db, team_id=db_teacher.team_id)
     db.commit()
+    versions.bump(versions.TEACHERS, versions.ASSIGNMENTS)
+    publish_resync("teachers")
     db.refresh(db_teacher)
     return db_teacher
 
@@ -178,5 +192,8 @@ def delete_teacher(teacher_id: int, db: Session = Depends(get_db)):
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     db.delete(teacher)
+    refresh_assignment_results(db, team_id=teacher.team_id)
     db.commit()
+    versions.bump(versions.TEACHERS, versions.ASSIGNMENTS)
+    publish_resync("teachers")
     return {"message": "Teacher deleted successfully"}
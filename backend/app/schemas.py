@@ -173,6 +173,38 @@ class StudentAssignmentFull(StudentAssignmentResponse):
     question_group: QuestionGroupResponse
     exam_session: Optional[ExamSessionResponse]
 
+class AssignmentListItem(BaseModel):
+    """Flat assignment row: ids plus the names the admin lists show, no nested objects"""
+    id: int
+    student_id: int
+    student_name: str
+    student_birth_year: Optional[int] = None
+    team_id: int
+    team_name: str
+    question_group_id: int
+    question_group_code: str
+    exam_session_id: Optional[int] = None
+    q10_mark: Optional[float] = None
+    is_graded_teacher1: bool
+    is_graded_teacher2: bool
+    is_completed: bool
+    exam_incomplete: bool = False
+    created_at: datetime
+
+class AutoAssignRequest(BaseModel):
+    exam_session_id: Optional[int] = None  # Default: the active session
+    student_ids: Optional[List[int]] = None  # Default: every student not yet assigned in the session
+
+class AutoAssignResult(BaseModel):
+    message: str
+    exam_session_id: int
+    created: int
+    already_assigned: List[int] = []  # Requested students that already have an assignment
+    not_found: List[int] = []
+    unplaced: List[int] = []  # Second-term students with no other question group open
+    team_counts: Dict[int, int]  # team_id -> assignments in the session, after this run
+    group_counts: Dict[str, int]  # group code -> assignments in the session, after this run
+
 
 # ========== Grade Schemas ==========
 class GradeBase(BaseModel):
@@ -222,6 +254,58 @@ class GradeResponse(GradeBase):
         from_attributes = True
 
 
+class GradeBatchItemResult(BaseModel):
+    assignment_id: int
+    success: bool
+    grade: Optional[GradeResponse] = None
+    error: Optional[str] = None
+
+
+# ========== Teacher Workload Schemas ==========
+class WorkloadTeacher(BaseModel):
+    id: int
+    name: str
+    position: int
+    team_id: int
+    team_name: Optional[str]
+
+class WorkloadQuestionGroup(BaseModel):
+    id: int
+    code: str
+    marks_structure: Dict[str, int]
+    total_marks: int
+
+class WorkloadGrade(BaseModel):
+    """This teacher's own grade - None marks until submitted"""
+    id: int
+    q1_mark: Optional[float]
+    q2_mark: Optional[float]
+    q3_mark: Optional[float]
+    q4_mark: Optional[float]
+    q5_mark: Optional[float]
+    q6_mark: Optional[float]
+    q7_mark: Optional[float]
+    q8_mark: Optional[float]
+    q9_mark: Optional[float]
+    total_q1_q9: Optional[float]
+    grading_finished_at: Optional[datetime] = None
+
+class WorkloadAssignment(BaseModel):
+    id: int
+    student_name: str
+    student_birth_year: Optional[int]
+    regular_teacher: Optional[str]
+    question_group_id: int  # See TeacherWorkload.question_groups
+    exam_incomplete: bool
+    grade: Optional[WorkloadGrade] = None
+
+class TeacherWorkload(BaseModel):
+    teacher: WorkloadTeacher
+    question_groups: List[WorkloadQuestionGroup]  # Only the groups used below
+    pending: List[WorkloadAssignment]  # Still to be graded by this teacher
+    done: List[WorkloadAssignment]  # Graded by this teacher, or marked incomplete
+
+
 # ========== Dashboard/Report Schemas ==========
 class TeacherStats(BaseModel):
     teacher_id: int
@@ -229,6 +313,9 @@ class TeacherStats(BaseModel):
     team_name: str
     total_students_graded: int
     average_grading_minutes: Optional[float] = None  # Average time to grade each student
+    p50_grading_minutes: Optional[float] = None  # Median grading time
+    p90_grading_minutes: Optional[float] = None  # 90% of students graded within this time
+    max_grading_minutes: Optional[float] = None
 
 class StudentResult(BaseModel):
     student_id: int
@@ -0,0 +1,116 @@
+"""
+Student name search.
+
+Names are typed with whatever keyboard the person had: Arabic ي/ك or Kurdish
+ی/ک, ە or ه, ر for ڕ, tatweel, harakat, Arabic-Indic or Persian digits. Each student
+stores `search_key`, the name folded to one spelling, and searches compare
+the folded term against it.
+
+The key is indexed for substring search: an FTS5 trigram table kept in sync
+by triggers on SQLite, a pg_trgm GIN index on Postgres. Both need at least
+three characters; shorter terms fall back to a LIKE over the key.
+"""
+import re
+from sqlalchemy import DDL, case, event, func, literal_column, select, table
+from sqlalchemy.sql.elements import ColumnElement
+
+# Spelling variants -> the form stored in search_key
+CHARACTER_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی",  # Arabic yeh and alef maksura
+    "ك": "ک",
+    "ە": "ه", "ة": "ه", "ۀ": "ه", "ھ": "ه",
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و",
+    # Kurdish letters an Arabic keyboard can't type
+    "ڕ": "ر", "ڵ": "ل", "ێ": "ی", "ۆ": "و",
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+})
+# Tatweel, harakat, superscript alef and invisible joiners
+REMOVED_CHARACTERS = re.compile("[\u0640\u064B-\u065F\u0670\u06D6-\u06ED\u200B-\u200F]")
+WHITESPACE = re.compile(r"\s+")
+
+TRIGRAM_LENGTH = 3
+SQLITE_SEARCH_TABLE = "student_search"
+
+
+def normalize_search_text(text) -> str:
+    """Fold a name or search term to the spelling stored in search_key"""
+    if not text:
+        return ""
+    text = REMOVED_CHARACTERS.sub("", str(text).translate(CHARACTER_MAP))
+    return WHITESPACE.sub(" ", text).strip().lower()
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def name_matches(search_key_column, id_column, term: str, dialect_name: str) -> ColumnElement:
+    """Condition for students whose search_key contains the (already normalized) term"""
+    if dialect_name == "sqlite" and len(term) >= TRIGRAM_LENGTH:
+        search_table = table(SQLITE_SEARCH_TABLE)
+        matching_ids = select(literal_column("rowid")).select_from(search_table).where(
+            literal_column(SQLITE_SEARCH_TABLE).op("MATCH")(_fts_phrase(term))
+        )
+        return id_column.in_(matching_ids)
+    # Postgres answers this from the pg_trgm index
+    return search_key_column.like(f"%{_escape_like(term)}%", escape="\\")
+
+
+def match_rank(search_key_column, term: str) -> ColumnElement:
+    """0 = whole name, 1 = name starts with it, 2 = a later word does, 3 = anywhere else"""
+    escaped = _escape_like(term)
+    return case(
+        (search_key_column == term, 0),
+        (search_key_column.like(f"{escaped}%", escape="\\"), 1),
+        (search_key_column.like(f"% {escaped}%", escape="\\"), 2),
+        else_=3
+    )
+
+
+def ranked_order(search_key_column, name_column, id_column, term: str) -> tuple:
+    return match_rank(search_key_column, term), func.length(name_column), id_column
+
+
+# ========== Index DDL ==========
+# Used by create_all() (see install_search_index) and by migration 0003
+SQLITE_SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} USING fts5("
+    "search_key, content='students', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS students_search_insert AFTER INSERT ON students BEGIN
+        INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, search_key) VALUES (new.id, new.search_key);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS students_search_delete AFTER DELETE ON students BEGIN
+        INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, search_key)
+        VALUES ('delete', old.id, old.search_key);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS students_search_update AFTER UPDATE OF search_key ON students BEGIN
+        INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, search_key)
+        VALUES ('delete', old.id, old.search_key);
+        INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, search_key) VALUES (new.id, new.search_key);
+    END""",
+]
+SQLITE_SEARCH_REBUILD = f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}) VALUES ('rebuild')"
+SQLITE_SEARCH_DROP = [
+    "DROP TRIGGER IF EXISTS students_search_insert",
+    "DROP TRIGGER IF EXISTS students_search_delete",
+    "DROP TRIGGER IF EXISTS students_search_update",
+    f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}",
+]
+POSTGRES_TRGM_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+
+def install_search_index(students_table) -> None:
+    """Create the dialect's search index objects together with the students table"""
+    # The trigram GIN index on search_key needs the extension first
+    event.listen(
+        students_table, "before_create",
+        DDL(POSTGRES_TRGM_EXTENSION).execute_if(dialect="postgresql")
+    )
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(students_table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,195 @@
+"""
+Everything the API does before serving its first request, run from the
+lifespan in main.py instead of at import time: schema setup, seeding the
+default data and warming the reference cache. Each step is timed and the
+totals are printed at boot and shown in /debug/perf.
+
+The schema belongs to the migrations: startup only compares the database's
+alembic revision with the newest migration and refuses to start if they
+differ, since create_all() can't add columns, indexes or triggers to tables
+that already exist. Migration 0005 computes the stored results existing
+databases were missing; startup checks that none are still missing (one
+anti-join) and computes them if they are, so reports never show completed
+students as pending.
+
+SCHEMA_MODE:
+    migrations  - the database must already be at head (`alembic upgrade head`,
+                  which the deploy runs before starting the server); the default
+    create      - an empty database is created from the models and stamped
+                  at head, for a throwaway local SQLite file
+"""
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from . import STARTED, reference_cache
+from .database import engine, Base, SessionLocal
+from .models import ExamSession, Team, Teacher, QuestionGroup, SeedMarker
+from .results import refresh_missing_results
+
+SCHEMA_MODE = os.getenv("SCHEMA_MODE", "migrations").lower()
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+# Seconds per startup step, filled in by run()
+timings: Dict[str, float] = {}
+
+
+def head_revision() -> str:
+    return ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+
+
+def create_schema(bind: Engine) -> None:
+    """Create every table on an empty database and record it as migrated to head"""
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as connection:
+        MigrationContext.configure(connection).stamp(ScriptDirectory(MIGRATIONS_DIR), "head")
+
+
+def check_schema(bind: Engine, mode: str = SCHEMA_MODE) -> None:
+    """Make sure the database is at the newest migration (create it first in create mode)"""
+    head = head_revision()
+    with bind.connect() as connection:
+        current: Optional[str] = MigrationContext.configure(connection).get_current_revision()
+        is_empty = not inspect(connection).has_table("students")
+    if current == head:
+        return
+    if mode == "create" and current is None and is_empty:
+        create_schema(bind)
+        return
+    raise SchemaOutOfDate(
+        f"Database schema is at {current or 'no recorded migration'}, the code needs {head}. "
+        "Run `alembic upgrade head` (from the backend folder) before starting the server."
+    )
+
+
+def seed_database(db: Session) -> None:
+    """Seed database with initial data if it was never seeded"""
+    # One primary-key lookup instead of counting teams on every boot
+    if db.get(SeedMarker, 1) is not None:
+        print("📦 Database already has data, skipping seed")
+        return
+
+    if db.query(Team.id).first() is not None:
+        # Seeded before the marker existed
+        db.add(SeedMarker(id=1))
+        db.commit()
+        print("📦 Database already has data, skipping seed")
+        return
+
+    print("🌱 Seeding database...")
+
+    # Create Teams
+    teams_data = [
+        Team(name="لیژنەی یەکەم"),
+        Team(name="لیژنەی دووەم"),
+        Team(name="لیژنەی سێیەم"),
+        Team(name="لیژنەی چوارەم"),
+    ]
+    db.add_all(teams_data)
+    db.commit()
+
+    # Create Teachers (2 per team)
+    teachers = [
+        Teacher(name="م. ام ارشد", team_id=1, position=1),
+        Teacher(name="م.تافان", team_id=1, position=2),
+        Teacher(name="م.باسیمە", team_id=2, position=1),
+        Teacher(name="م.نەرمین", team_id=2, position=2),
+        Teacher(name="د.شیلان", team_id=3, position=1),
+        Teacher(name="م.صبيحه", team_id=3, position=2),
+        Teacher(name="م.عظيمة", team_id=4, position=1),
+        Teacher(name="پەیام", team_id=4, position=2),
+    ]
+    db.add_all(teachers)
+    db.commit()
+
+    # Create Question Groups (A-G)
+    groups = [
+        QuestionGroup(name="گروپی A", code="A", marks_structure={"q1": 4, "q2": 10, "q3": 8, "q4": 12, "q5": 16, "q6": 10, "q7": 8, "q8": 9, "q9": 13}, total_marks=90),
+        QuestionGroup(name="گروپی B", code="B", marks_structure={"q1": 10, "q2": 8, "q3": 10, "q4": 14, "q5": 9, "q6": 12, "q7": 7, "q8": 10, "q9": 10}, total_marks=90),
+        QuestionGroup(name="گروپی C", code="C", marks_structure={"q1": 10, "q2": 10, "q3": 9, "q4": 11, "q5": 10, "q6": 17, "q7": 6, "q8": 8, "q9": 9}, total_marks=90),
+        QuestionGroup(name="گروپی D", code="D", marks_structure={"q1": 8, "q2": 8, "q3": 10, "q4": 24, "q5": 4, "q6": 8, "q7": 8, "q8": 7, "q9": 13}, total_marks=90),
+        QuestionGroup(name="گروپی E", code="E", marks_structure={"q1": 8, "q2": 10, "q3": 10, "q4": 8, "q5": 12, "q6": 5, "q7": 7, "q8": 19, "q9": 11}, total_marks=90),
+        QuestionGroup(name="گروپی F", code="F", marks_structure={"q1": 8, "q2": 7, "q3": 10, "q4": 23, "q5": 8, "q6": 7, "q7": 13, "q8": 7, "q9": 7}, total_marks=90),
+        QuestionGroup(name="گروپی G", code="G", marks_structure={"q1": 8, "q2": 7, "q3": 10, "q4": 10, "q5": 7, "q6": 9, "q7": 13, "q8": 5, "q9": 21}, total_marks=90),
+    ]
+    db.add_all(groups)
+    db.commit()
+
+    # Create active exam session
+    session = ExamSession(name="دانیشتنی تاقیکردنەوە", date=datetime.now(), is_active=True, num_rooms=4, teachers_per_room=2)
+    db.add(session)
+    db.add(SeedMarker(id=1))
+    db.commit()
+
+    print("✅ Database seeded with 4 teams, 8 teachers, 7 question groups!")
+
+
+def fill_missing_results(db: Session) -> None:
+    """Compute the stored results of assignments that have none"""
+    count = refresh_missing_results(db)
+    if count:
+        db.commit()
+        print(f"⚠️ {count} assignments had no stored results - computed them now")
+
+
+def _warm_cache(db: Session) -> None:
+    """Load the reference data now so the first grade write doesn't pay for it"""
+    reference_cache.question_groups(db)
+    reference_cache.teams(db)
+    reference_cache.teachers(db)
+    reference_cache.active_session(db)
+
+
+def run() -> None:
+    """Prepare the database and print how long startup took"""
+    timings.clear()
+    timings["imports"] = time.perf_counter() - STARTED
+
+    step = time.perf_counter()
+    try:
+        check_schema(engine)
+    except SchemaOutOfDate as e:
+        print(f"❌ {e}")
+        raise
+    timings["schema"] = time.perf_counter() - step
+
+    db = SessionLocal()
+    try:
+        step = time.perf_counter()
+        try:
+            seed_database(db)
+        except Exception as e:
+            print(f"❌ Error seeding database: {e}")
+            db.rollback()
+        timings["seed"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        fill_missing_results(db)
+        timings["results"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        _warm_cache(db)
+        timings["cache"] = time.perf_counter() - step
+    finally:
+        db.close()
+
+    timings["total"] = time.perf_counter() - STARTED
+    steps = ", ".join(f"{name} {timings[name]:.2f}s" for name in ("imports", "schema", "seed", "results", "cache"))
+    print(f"🚀 Ready in {timings['total']:.2f}s ({steps}; schema mode: {SCHEMA_MODE})")
+
+
+def summary() -> dict:
+    """Startup timings in milliseconds for /debug/perf"""
+    return {
+        "schema_mode": SCHEMA_MODE,
+        **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in timings.items()},
+    }
@@ -0,0 +1,35 @@
+"""
+In-process data version counters.
+
+Write endpoints bump the counter of every resource they change after
+committing; read paths use the counters as cache keys. Read the version
+*before* querying, so a write that lands mid-read invalidates what was read.
+
+Counters live in this process only - the API runs as a single uvicorn worker.
+"""
+import threading
+from typing import Dict, Tuple
+
+# Resource names
+ASSIGNMENTS = "assignments"
+GRADES = "grades"
+STUDENTS = "students"
+TEAMS = "teams"
+TEACHERS = "teachers"
+QUESTION_GROUPS = "question_groups"
+EXAM_SESSIONS = "exam_sessions"
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+
+
+def bump(*resources: str) -> None:
+    """Mark resources as changed"""
+    with _lock:
+        for resource in resources:
+            _versions[resource] = _versions.get(resource, 0) + 1
+
+
+def get(*resources: str) -> Tuple[int, ...]:
+    """Current versions of the given resources, usable as a cache key"""
+    return tuple(_versions.get(resource, 0) for resource in resources)
@@ -0,0 +1,186 @@
+"""
+Deterministic synthetic exam data for the benchmarks.
+
+The same --students and --seed always give the same database: one active
+session, a room (team) of three teachers per ROOM_SIZE students, the seven
+question groups, and one assignment per student. Most assignments are
+graded by two or three teachers, with grading times spread over the exam
+day, and most graded ones have their Q10 mark. The stored results are
+built at the end, like after `alembic upgrade head` on a live database.
+
+    python -m benchmarks.dataset --students 10000 --out /tmp/bench_10k.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+from app.database import create_db_engine
+from app.models import Team, Teacher, QuestionGroup, ExamSession, Student, StudentAssignment, Grade
+from app.results import refresh_assignment_results
+from app.startup import create_schema
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+ROOM_SIZE = 500
+TEACHERS_PER_ROOM = 3
+INSERT_CHUNK_SIZE = 5_000
+EXAM_START = datetime(2026, 1, 15, 8, 30)
+
+# Same marks as the groups seeded by main.py
+MARKS_STRUCTURES = {
+    "A": {"q1": 4, "q2": 10, "q3": 8, "q4": 12, "q5": 16, "q6": 10, "q7": 8, "q8": 9, "q9": 13},
+    "B": {"q1": 10, "q2": 8, "q3": 10, "q4": 14, "q5": 9, "q6": 12, "q7": 7, "q8": 10, "q9": 10},
+    "C": {"q1": 10, "q2": 10, "q3": 9, "q4": 11, "q5": 10, "q6": 17, "q7": 6, "q8": 8, "q9": 9},
+    "D": {"q1": 8, "q2": 8, "q3": 10, "q4": 24, "q5": 4, "q6": 8, "q7": 8, "q8": 7, "q9": 13},
+    "E": {"q1": 8, "q2": 10, "q3": 10, "q4": 8, "q5": 12, "q6": 5, "q7": 7, "q8": 19, "q9": 11},
+    "F": {"q1": 8, "q2": 7, "q3": 10, "q4": 23, "q5": 8, "q6": 7, "q7": 13, "q8": 7, "q9": 7},
+    "G": {"q1": 8, "q2": 7, "q3": 10, "q4": 10, "q5": 7, "q6": 9, "q7": 13, "q8": 5, "q9": 21},
+}
+
+FIRST_NAMES = ["ئاری", "هێمن", "شیلان", "ڕێبین", "نەرمین", "کاروان", "ژیان", "دلێر", "هاوژین", "سۆز",
+               "بەختیار", "ئاواز", "پەیام", "سەروەر", "لاوین", "ڕوناک", "هەڤاڵ", "گۆران", "بێریڤان", "زانا"]
+FAMILY_NAMES = ["محمد", "احمد", "عەلی", "حسێن", "کەریم", "عومەر", "قادر", "ڕەشید", "سەعید", "فەتاح",
+                "ئیبراهیم", "مەحمود", "حەسەن", "عەبدوڵا", "یوسف", "ئەمین", "جەلال", "نوری", "خالید", "ساڵح"]
+
+PROGRESS = {
+    "graded": 0.85,        # share of assignments with teacher grades
+    "third_teacher": 0.3,  # share of graded ones the third teacher also marked
+    "q10": 0.8,            # share of graded ones with Q10
+    "incomplete": 0.02,
+    "second_term": 0.08,
+}
+
+
+def student_name(rng: random.Random) -> str:
+    return " ".join([rng.choice(FIRST_NAMES), rng.choice(FAMILY_NAMES), rng.choice(FAMILY_NAMES)])
+
+
+def _insert(db, table, rows) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        db.execute(insert(table), rows[start:start + INSERT_CHUNK_SIZE])
+
+
+def _grade_row(rng, assignment_id, teacher_id, marks_structure, finished_at) -> dict:
+    row = {"assignment_id": assignment_id, "teacher_id": teacher_id}
+    total = 0.0
+    for question, max_mark in marks_structure.items():
+        # Mostly good answers, in half-mark steps
+        mark = round(min(max_mark, max(0.0, rng.gauss(max_mark * 0.7, max_mark * 0.25))) * 2) / 2
+        row[f"{question}_mark"] = mark
+        total += mark
+    started_at = finished_at - timedelta(minutes=rng.uniform(3, 15))
+    row.update(
+        total_q1_q9=total,
+        grading_started_at=started_at,
+        grading_finished_at=finished_at,
+        created_at=started_at,
+        updated_at=finished_at,
+    )
+    return row
+
+
+def build_database(url: str, num_students: int, seed: int = 1) -> dict:
+    """Create the schema at `url` and fill it. Returns the row counts."""
+    rng = random.Random(seed)
+    engine = create_db_engine(url)
+    create_schema(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        num_rooms = max(4, -(-num_students // ROOM_SIZE))
+        _insert(db, Team.__table__, [{"name": f"لیژنەی {i + 1}"} for i in range(num_rooms)])
+        team_ids = db.scalars(select(Team.id).order_by(Team.id)).all()
+        _insert(db, Teacher.__table__, [
+            {"name": f"م. {rng.choice(FIRST_NAMES)} {team_id}-{position}", "team_id": team_id, "position": position}
+            for team_id in team_ids for position in range(1, TEACHERS_PER_ROOM + 1)
+        ])
+        teachers = {}
+        for teacher_id, team_id in db.execute(select(Teacher.id, Teacher.team_id).order_by(Teacher.position)):
+            teachers.setdefault(team_id, []).append(teacher_id)
+
+        _insert(db, QuestionGroup.__table__, [
+            {"name": f"گروپی {code}", "code": code, "marks_structure": marks, "total_marks": sum(marks.values())}
+            for code, marks in MARKS_STRUCTURES.items()
+        ])
+        groups = db.execute(select(QuestionGroup.id, QuestionGroup.code).order_by(QuestionGroup.id)).all()
+        session_id = db.execute(insert(ExamSession.__table__).returning(ExamSession.id), {
+            "name": "دانیشتنی بەنچمارک", "date": EXAM_START, "is_active": True,
+            "num_rooms": num_rooms, "teachers_per_room": TEACHERS_PER_ROOM
+        }).scalar_one()
+
+        students = []
+        for _ in range(num_students):
+            second_term = rng.random() < PROGRESS["second_term"]
+            students.append({
+                "name": student_name(rng),
+                "phone": f"0750{rng.randint(0, 9_999_999):07d}",
+                "birth_year": rng.randint(1950, 2008),
+                "regular_teacher": f"م. {rng.choice(FIRST_NAMES)}",
+                "is_second_term": second_term,
+                "previous_question_group": rng.choice(groups).code if second_term else None,
+                "created_at": EXAM_START - timedelta(days=rng.randint(1, 30)),
+            })
+        _insert(db, Student.__table__, students)
+        student_ids = db.scalars(select(Student.id).order_by(Student.id)).all()
+
+        assignments, planned_grades = [], []
+        exam_minutes = 6 * 60
+        for index, student_id in enumerate(student_ids):
+            team_id = team_ids[index % num_rooms]
+            group = groups[(index // num_rooms) % len(groups)]
+            graded = rng.random() < PROGRESS["graded"]
+            graders = teachers[team_id][:3 if rng.random() < PROGRESS["third_teacher"] else 2] if graded else []
+            q10_mark = float(rng.randint(4, 10)) if graded and rng.random() < PROGRESS["q10"] else None
+            created_at = EXAM_START + timedelta(minutes=rng.uniform(0, exam_minutes))
+            assignments.append({
+                "student_id": student_id,
+                "team_id": team_id,
+                "question_group_id": group.id,
+                "exam_session_id": session_id,
+                "q10_mark": q10_mark,
+                "is_graded_teacher1": bool(graders),
+                "is_graded_teacher2": bool(graders),
+                "is_completed": bool(graders) and q10_mark is not None,
+                "exam_incomplete": rng.random() < PROGRESS["incomplete"],
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+            planned_grades.append((graders, group.code, created_at))
+        _insert(db, StudentAssignment.__table__, assignments)
+        assignment_ids = db.scalars(select(StudentAssignment.id).order_by(StudentAssignment.id)).all()
+
+        grades = []
+        for assignment_id, (graders, code, created_at) in zip(assignment_ids, planned_grades):
+            finished_at = created_at
+            for teacher_id in graders:
+                # Each teacher marks the paper after the previous one
+                finished_at += timedelta(minutes=rng.uniform(5, 40))
+                grades.append(_grade_row(rng, assignment_id, teacher_id, MARKS_STRUCTURES[code], finished_at))
+        _insert(db, Grade.__table__, grades)
+
+        refresh_assignment_results(db)
+        db.commit()
+        return {"teams": num_rooms, "students": num_students, "assignments": len(assignment_ids), "grades": len(grades)}
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=SCALES["1k"])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", required=True, help="SQLite file to create (must not exist)")
+    args = parser.parse_args()
+    if os.path.exists(args.out):
+        parser.error(f"{args.out} already exists")
+
+    started = time.perf_counter()
+    counts = build_database(f"sqlite:///{args.out}", args.students, args.seed)
+    print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Latency, query count and peak memory of the hot endpoints, against a baseline.
+
+Builds a synthetic database (see dataset.py) at the chosen scale, imports the
+app in-process on it and drives it with the test client:
+
+    results report      GET  /reports/student-results
+    CSV exports         GET  /reports/export/csv, /reports/export/csv-summary
+    Parquet export      GET  /reports/export/parquet
+    Excel export        GET  /reports/export/xlsx
+    dashboard           GET  /reports/summary, /reports/teacher-stats
+    grading             POST /grades/
+    Q10 edit            PUT  /assignments/{id}/q10, plus the backup it triggers
+    full backup         POST /assignments/backup
+    CSV import          POST /students/import-csv
+
+Reads bump the data versions first, so they measure the uncached path (during
+an exam every grade invalidates the caches anyway). Latency is the median of
+--repeat runs; query counts and peak Python memory (tracemalloc, including
+the test client's copy of the body) come from one extra run.
+
+    python -m benchmarks.endpoints                      # 1k students
+    python -m benchmarks.endpoints --scale 100k --repeat 3
+    python -m benchmarks.endpoints --scale 10k --save-baseline
+
+Results are compared with benchmarks/baseline.json (per scale): a latency or
+memory change above --tolerance, or any extra query, is reported as a
+regression and the exit status is 1. Baseline latencies are from the machine
+that saved them - re-save on your own machine before comparing timings.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Smaller changes are noise, whatever the percentage
+MIN_CHANGE = {"p50_ms": 10, "peak_kb": 512}
+
+
+class Operation:
+    def __init__(self, name, request, setup=None, after=None):
+        self.name = name
+        self.request = request  # (client, iteration) -> response
+        self.setup = setup      # untimed, before each run
+        self.after = after      # timed with the request (e.g. the backup a Q10 edit schedules)
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: "
+                           f"{response.status_code} {response.text[:200]}")
+    return response
+
+
+def _import_csv(rows: int, iteration: int) -> bytes:
+    from benchmarks.dataset import student_name
+    import random
+    rng = random.Random(1000 + iteration)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["ناوی سییانی", "ژمارەی تەلەفۆن", "ساڵی لەدایکبوون", "مامۆستای بابەت", "نمرەی پرسیاری ١٠"])
+    for _ in range(rows):
+        writer.writerow([student_name(rng), f"0770{rng.randint(0, 9_999_999):07d}",
+                         rng.randint(1950, 2008), "م. ئاری", rng.randint(0, 10)])
+    return out.getvalue().encode("utf-8-sig")
+
+
+def build_operations(import_rows: int):
+    # Imported here: app.database reads DATABASE_URL on import
+    from sqlalchemy import select
+    from app import versions, backups
+    from app.database import SessionLocal
+    from app.models import Grade, StudentAssignment, Teacher, QuestionGroup
+
+    db = SessionLocal()
+    try:
+        # Second-position teachers who haven't graded yet, with their assignments
+        graded = select(Grade.assignment_id).where(Grade.teacher_id == Teacher.id)
+        ungraded = db.execute(
+            select(StudentAssignment.id, Teacher.id, QuestionGroup.marks_structure)
+            .join(Teacher, (Teacher.team_id == StudentAssignment.team_id) & (Teacher.position == 2))
+            .join(QuestionGroup, QuestionGroup.id == StudentAssignment.question_group_id)
+            .where(StudentAssignment.id.not_in(graded))
+            .order_by(StudentAssignment.id)
+            .limit(1000)
+        ).all()
+        assignment_ids = db.scalars(select(StudentAssignment.id).order_by(StudentAssignment.id).limit(1000)).all()
+    finally:
+        db.close()
+    if not ungraded:
+        raise RuntimeError("The dataset has no ungraded assignment to submit a grade for")
+
+    def bump_data():
+        versions.bump(versions.GRADES, versions.ASSIGNMENTS, versions.STUDENTS)
+
+    def get(path):
+        return lambda client, i: _check(client.get(path))
+
+    def submit_grade(client, i):
+        assignment_id, teacher_id, marks = ungraded[i % len(ungraded)]
+        body = {"assignment_id": assignment_id, "teacher_id": teacher_id}
+        body.update({f"{q}_mark": max_mark * 0.5 for q, max_mark in marks.items()})
+        return _check(client.post("/grades/", json=body))
+
+    def update_q10(client, i):
+        assignment_id = assignment_ids[i % len(assignment_ids)]
+        return _check(client.put(f"/assignments/{assignment_id}/q10", json={"q10_mark": float(i % 11)}))
+
+    def import_students(client, i):
+        files = {"file": ("students.csv", _import_csv(import_rows, i), "text/csv")}
+        return _check(client.post("/students/import-csv", files=files))
+
+    return [
+        Operation("student-results", get("/reports/student-results"), setup=bump_data),
+        Operation("export-csv", get("/reports/export/csv"), setup=bump_data),
+        Operation("export-csv-summary", get("/reports/export/csv-summary"), setup=bump_data),
+        Operation("export-parquet", get("/reports/export/parquet"), setup=bump_data),
+        Operation("export-xlsx", get("/reports/export/xlsx"), setup=bump_data),
+        Operation("summary", get("/reports/summary"), setup=bump_data),
+        Operation("teacher-stats", get("/reports/teacher-stats"), setup=bump_data),
+        Operation("grade-submit", submit_grade),
+        Operation("q10-update", update_q10, after=backups.backup_worker.flush),
+        Operation("full-backup", lambda client, i: _check(client.post("/assignments/backup"))),
+        Operation(f"import-csv-{import_rows}", import_students),
+    ]
+
+
+def measure(client, operation: Operation, repeat: int, counter: dict) -> dict:
+    def run(i):
+        if operation.setup:
+            operation.setup()
+        started = time.perf_counter()
+        response = operation.request(client, i)
+        _ = response.content  # Read streamed bodies to the end
+        if operation.after:
+            operation.after()
+        return time.perf_counter() - started
+
+    latencies = [run(i) for i in range(repeat)]
+
+    # One more run for the query count and memory (tracemalloc slows it down)
+    counter["queries"] = 0
+    tracemalloc.start()
+    try:
+        run(repeat)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "queries": counter["queries"],
+        "peak_kb": round(peak / 1024),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return the regressions as printable strings"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+        for key, unit in (("p50_ms", "ms"), ("peak_kb", "KB")):
+            grew = result[key] - before[key]
+            if grew > MIN_CHANGE[key] and result[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {before[key]:g} -> {result[key]:g} {unit}")
+    return regressions
+
+
+def _change(value, before) -> str:
+    if not before:
+        return ""
+    return f"{(value - before) / before * 100:+.0f}%"
+
+
+def print_results(results: dict, baseline: dict) -> None:
+    print(f"{'operation':<22} {'p50 ms':>9} {'max ms':>9} {'queries':>8} {'peak KB':>9}   vs baseline (p50 / queries / memory)")
+    for name, r in results.items():
+        before = baseline.get(name)
+        versus = ""
+        if before:
+            versus = (f"{_change(r['p50_ms'], before['p50_ms']):>6} / "
+                      f"{r['queries'] - before['queries']:+d} / {_change(r['peak_kb'], before['peak_kb']):>6}")
+        print(f"{name:<22} {r['p50_ms']:>9.1f} {r['max_ms']:>9.1f} {r['queries']:>8} {r['peak_kb']:>9}   {versus}")
+
+
+def main():
+    # The app reads these on import, so they are set before anything from it
+    # is imported. The backup worker must not write on its own - the Q10
+    # operation flushes it. A route over its query budget fails the run.
+    workdir = tempfile.mkdtemp(prefix="bench_endpoints_")
+    url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["BACKUP_COALESCE_SECONDS"] = "3600"
+    os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+    from benchmarks.dataset import SCALES, build_database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--import-rows", type=int, default=1000, help="students per CSV import")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed latency/memory growth (0.3 = 30%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+
+    try:
+        args = parser.parse_args()
+        started = time.perf_counter()
+        counts = build_database(url, SCALES[args.scale], args.seed)
+        print(f"Dataset {args.scale}: " + ", ".join(f"{count} {name}" for name, count in counts.items())
+              + f" ({time.perf_counter() - started:.1f}s)")
+
+        from sqlalchemy import event
+        from fastapi.testclient import TestClient
+        from app import backups, database
+        from app.main import app
+        backups.BACKUP_DIR = os.path.join(workdir, "backups")
+
+        counter = {"queries": 0}
+
+        def count_query(*_):
+            counter["queries"] += 1
+
+        engines = [database.engine]
+        if database.async_engine is not None:
+            engines.append(database.async_engine.sync_engine)
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", count_query)
+
+        results = {}
+        with TestClient(app) as client:
+            for operation in build_operations(args.import_rows):
+                results[operation.name] = measure(client, operation, args.repeat, counter)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stored = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            stored = json.load(f)
+    baseline = stored.get(args.scale, {})
+
+    print_results(results, baseline)
+    if args.save_baseline:
+        stored[args.scale] = results
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved as the {args.scale} baseline")
+        return
+
+    if not baseline:
+        print(f"No {args.scale} baseline yet - run with --save-baseline")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
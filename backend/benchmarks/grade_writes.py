@@ -0,0 +1,180 @@
+"""
+Concurrent grade-write throughput on SQLite, with the bare engine the app used
+to create ("before") and with create_db_engine() ("after": WAL,
+synchronous=NORMAL, busy timeout, larger page cache).
+
+Each run builds a fresh database file, then for --seconds keeps --writers
+threads submitting grades through the real grade endpoint function (one per
+teacher, like an exam day) while --readers threads load the results report,
+like the admin dashboard polling.
+
+    python -m benchmarks.grade_writes
+    python -m benchmarks.grade_writes --writers 12 --readers 2 --seconds 20
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import reference_cache
+from app.database import Base, create_db_engine
+from app.models import Team, Teacher, QuestionGroup, ExamSession, Student, StudentAssignment
+from app.results import compute_results
+from app.routers.grades import create_or_update_grade
+from app.schemas import GradeCreate
+
+MARKS_STRUCTURE = {f"q{i}": 10 for i in range(1, 10)}
+
+
+def build_database(url: str, num_teams: int, teachers_per_team: int, num_students: int) -> None:
+    """Create the schema and a session with one assignment per student"""
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        teams = [Team(name=f"Team {i + 1}") for i in range(num_teams)]
+        db.add_all(teams)
+        db.add(QuestionGroup(name="Group A", code="A", marks_structure=MARKS_STRUCTURE, total_marks=90))
+        session = ExamSession(name="Benchmark", date=datetime.utcnow(), is_active=True,
+                              num_rooms=num_teams, teachers_per_room=teachers_per_team)
+        db.add(session)
+        db.flush()
+        for team in teams:
+            for position in range(1, teachers_per_team + 1):
+                db.add(Teacher(name=f"{team.name} T{position}", team_id=team.id, position=position))
+        group_id = db.query(QuestionGroup.id).scalar()
+        for i in range(num_students):
+            student = Student(name=f"Student {i + 1}")
+            db.add(student)
+            db.flush()
+            db.add(StudentAssignment(student_id=student.id, team_id=teams[i % num_teams].id,
+                                     question_group_id=group_id, exam_session_id=session.id))
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def run(engine, seconds: float, num_writers: int, num_readers: int) -> dict:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    reference_cache.clear()
+
+    db = SessionLocal()
+    teachers = db.query(Teacher).order_by(Teacher.id).all()
+    assignments_by_team = {}
+    for assignment_id, team_id in db.query(StudentAssignment.id, StudentAssignment.team_id):
+        assignments_by_team.setdefault(team_id, []).append(assignment_id)
+    db.close()
+
+    deadline = time.monotonic() + seconds
+    lock = threading.Lock()
+    write_latencies, read_latencies, errors = [], [], []
+
+    def writer(teacher):
+        rng = random.Random(teacher.id)
+        assignment_ids = assignments_by_team[teacher.team_id]
+        while time.monotonic() < deadline:
+            marks = {f"q{i}_mark": float(rng.randint(0, 10)) for i in range(1, 10)}
+            grade = GradeCreate(assignment_id=rng.choice(assignment_ids), teacher_id=teacher.id, **marks)
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                create_or_update_grade(grade, db)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    write_latencies.append(elapsed)
+            except Exception as e:
+                db.rollback()
+                with lock:
+                    errors.append(str(e).splitlines()[0])
+            finally:
+                db.close()
+
+    def reader():
+        while time.monotonic() < deadline:
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                compute_results(db)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    read_latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e).splitlines()[0])
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(teachers[i % len(teachers)],)) for i in range(num_writers)]
+    threads += [threading.Thread(target=reader) for _ in range(num_readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return {
+        "writes": len(write_latencies),
+        "writes_per_second": len(write_latencies) / seconds,
+        "write_p50_ms": _percentile_ms(write_latencies, 50),
+        "write_p95_ms": _percentile_ms(write_latencies, 95),
+        "reads": len(read_latencies),
+        "read_p50_ms": _percentile_ms(read_latencies, 50),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def _percentile_ms(values, percentile: int) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0] * 1000
+    return statistics.quantiles(values, n=100)[percentile - 1] * 1000
+
+
+def print_result(label: str, result: dict) -> None:
+    print(f"{label:<8} {result['writes_per_second']:>9.1f} writes/s   "
+          f"p50 {result['write_p50_ms']:>7.1f} ms   p95 {result['write_p95_ms']:>7.1f} ms   "
+          f"reads {result['reads']:>5} (p50 {result['read_p50_ms']:.1f} ms)   errors {result['errors']}")
+    if result["first_error"]:
+        print(f"         first error: {result['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=10, help="concurrent grading teachers")
+    parser.add_argument("--readers", type=int, default=2, help="concurrent report readers")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--students", type=int, default=400)
+    args = parser.parse_args()
+
+    teams = 4
+    teachers_per_team = max(2, min(3, -(-args.writers // teams)))
+    workdir = tempfile.mkdtemp(prefix="grade_writes_")
+    try:
+        engines = {
+            # What database.py used to build
+            "before": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+            "after": create_db_engine,
+        }
+        print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s, {args.students} students")
+        for label, make_engine in engines.items():
+            url = f"sqlite:///{os.path.join(workdir, label + '.db')}"
+            build_database(url, teams, teachers_per_team, args.students)
+            engine = make_engine(url)
+            try:
+                print_result(label, run(engine, args.seconds, args.writers, args.readers))
+            finally:
+                engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Check that the database planner uses the grading indexes for the hot queries.
+
+Runs EXPLAIN on each query against DATABASE_URL and exits non-zero when an
+expected index is missing from the plan - run it after `alembic upgrade head`:
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --verbose   # print every plan
+
+On Postgres sequential scans are disabled for the check, because on small
+tables a seq scan is cheaper and the planner would rightly pick it; what
+matters here is that the index exists and can serve the query.
+"""
+import argparse
+import sys
+from sqlalchemy import select, text
+from app.database import engine
+from app.models import Grade, StudentAssignment
+from app.results import _results_query
+
+CHECKS = [
+    (
+        "grade lookup (start_grading, create_or_update_grade)",
+        select(Grade).where(Grade.assignment_id == 1, Grade.teacher_id == 1),
+        "uq_grades_assignment_teacher",
+    ),
+    (
+        "grades by teacher",
+        select(Grade).where(Grade.teacher_id == 1),
+        "ix_grades_teacher_id",
+    ),
+    (
+        "duplicate check (create_assignment)",
+        select(StudentAssignment).where(
+            StudentAssignment.student_id == 1, StudentAssignment.exam_session_id == 1
+        ),
+        "ix_student_assignments_student_session",
+    ),
+    (
+        "team pending list (get_team_assignments)",
+        select(StudentAssignment).where(
+            StudentAssignment.team_id == 1, StudentAssignment.is_completed == False
+        ),
+        "ix_student_assignments_team_completed",
+    ),
+    (
+        "session dashboard (list_assignments)",
+        select(StudentAssignment).where(
+            StudentAssignment.exam_session_id == 1,
+            StudentAssignment.team_id == 1,
+            StudentAssignment.is_completed == True
+        ),
+        "ix_student_assignments_session_team_completed",
+    ),
+    (
+        "session results (reports)",
+        _results_query(exam_session_id=1),
+        "ix_student_assignments_session_team_completed",
+    ),
+]
+
+
+def explain(connection, query) -> str:
+    sql = str(query.compile(connection, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return "\n".join(row[-1] for row in rows)
+    rows = connection.execute(text(f"EXPLAIN {sql}"))
+    return "\n".join(row[0] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    failures = 0
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SET enable_seqscan = off"))
+        for label, query, index_name in CHECKS:
+            plan = explain(connection, query)
+            used = index_name in plan
+            failures += not used
+            print(f"{'✓' if used else '✗'} {label}: {index_name}{'' if used else ' NOT USED'}")
+            if args.verbose or not used:
+                print("    " + plan.replace("\n", "\n    "))
+
+    if failures:
+        print(f"{failures} queries don't use their index - run `alembic upgrade head`")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
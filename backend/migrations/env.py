@@ -0,0 +1,57 @@
+from logging.config import fileConfig
+from alembic import context
+from app.database import engine, Base
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+from app.search import SQLITE_SEARCH_TABLE
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    """Skip the FTS5 search table and its shadow tables - they are created by raw DDL"""
+    return not (type_ == "table" and name.startswith(SQLITE_SEARCH_TABLE))
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Skip indexes that only exist on another database (Index.ddl_if)"""
+    if type_ == "index" and obj._ddl_if is not None and obj._ddl_if.dialect:
+        return engine.dialect.name == obj._ddl_if.dialect
+    return True
+
+
+def run_migrations_offline():
+    """Emit the SQL instead of running it (alembic upgrade head --sql)"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        include_object=include_object,
+        literal_binds=True,
+        render_as_batch=engine.dialect.name == "sqlite"
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            include_object=include_object,
+            # SQLite can't ALTER most things in place - batch mode rebuilds the table
+            render_as_batch=connection.dialect.name == "sqlite"
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,113 @@
+"""Baseline schema
+
+The tables as the app created them with Base.metadata.create_all() before
+migrations existed. Tables that already exist are left alone, so existing
+databases can simply run `alembic upgrade head`.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+MARK_COLUMNS = [f"q{i}_mark" for i in range(1, 10)]
+AVERAGE_COLUMNS = [f"avg_q{i}" for i in range(1, 10)]
+
+
+def _tables():
+    return [
+        ("teams", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(50), nullable=False, unique=True),
+            sa.Column("created_at", sa.DateTime()),
+        ]),
+        ("teachers", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id"), nullable=False),
+            sa.Column("position", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        ]),
+        ("question_groups", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(50), nullable=False),
+            sa.Column("code", sa.String(1), nullable=False, unique=True),
+            sa.Column("marks_structure", sa.JSON(), nullable=False),
+            sa.Column("total_marks", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        ]),
+        ("exam_sessions", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("date", sa.DateTime(), nullable=False),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("num_rooms", sa.Integer()),
+            sa.Column("teachers_per_room", sa.Integer()),
+            sa.Column("created_at", sa.DateTime()),
+        ]),
+        ("students", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("phone", sa.String(20)),
+            sa.Column("birth_year", sa.Integer()),
+            sa.Column("regular_teacher", sa.String(100)),
+            sa.Column("q10_mark", sa.Float()),
+            sa.Column("is_second_term", sa.Boolean()),
+            sa.Column("previous_question_group", sa.String(10)),
+            sa.Column("created_at", sa.DateTime()),
+        ]),
+        ("student_assignments", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.id"), nullable=False),
+            sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id"), nullable=False),
+            sa.Column("question_group_id", sa.Integer(), sa.ForeignKey("question_groups.id"), nullable=False),
+            sa.Column("exam_session_id", sa.Integer(), sa.ForeignKey("exam_sessions.id")),
+            sa.Column("q10_mark", sa.Float()),
+            sa.Column("is_graded_teacher1", sa.Boolean()),
+            sa.Column("is_graded_teacher2", sa.Boolean()),
+            sa.Column("is_completed", sa.Boolean()),
+            sa.Column("exam_incomplete", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        ]),
+        ("grades", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("assignment_id", sa.Integer(), sa.ForeignKey("student_assignments.id"), nullable=False),
+            sa.Column("teacher_id", sa.Integer(), sa.ForeignKey("teachers.id"), nullable=False),
+            *[sa.Column(name, sa.Float()) for name in MARK_COLUMNS],
+            sa.Column("total_q1_q9", sa.Float()),
+            sa.Column("grading_started_at", sa.DateTime()),
+            sa.Column("grading_finished_at", sa.DateTime()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        ]),
+        ("assignment_results", [
+            sa.Column("assignment_id", sa.Integer(), sa.ForeignKey("student_assignments.id"), primary_key=True),
+            *[sa.Column(name, sa.Float()) for name in AVERAGE_COLUMNS],
+            sa.Column("total_average_q1_q9", sa.Float()),
+            sa.Column("final_total", sa.Float()),
+            sa.Column("passed", sa.Boolean()),
+            sa.Column("updated_at", sa.DateTime()),
+        ]),
+    ]
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, columns in _tables():
+        if name in existing:
+            continue
+        op.create_table(name, *columns)
+        if name != "assignment_results":
+            op.create_index(f"ix_{name}_id", name, ["id"])
+
+
+def downgrade():
+    for name, _ in reversed(_tables()):
+        op.drop_table(name)
@@ -0,0 +1,97 @@
+"""Indexes for the grading hot paths, one grade per teacher per assignment
+
+Duplicate (assignment_id, teacher_id) grades - left behind by double
+submissions before this constraint existed - are removed first, keeping the
+most recently updated one. The stored results of those assignments are
+dropped with them; 0005_backfill_results recomputes them from the remaining
+grades later in the same upgrade.
+
+Revision ID: 0002_grading_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_grading_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("uq_grades_assignment_teacher", "grades", ["assignment_id", "teacher_id"], True),
+    ("ix_grades_teacher_id", "grades", ["teacher_id"], False),
+    ("ix_student_assignments_student_session", "student_assignments", ["student_id", "exam_session_id"], False),
+    ("ix_student_assignments_session_team_completed", "student_assignments",
+     ["exam_session_id", "team_id", "is_completed"], False),
+    ("ix_student_assignments_team_completed", "student_assignments", ["team_id", "is_completed"], False),
+]
+
+
+def _remove_duplicate_grades(bind) -> set:
+    """Delete the older grade of each duplicate pair; returns the affected assignment ids"""
+    grades = sa.table(
+        "grades",
+        sa.column("id"), sa.column("assignment_id"), sa.column("teacher_id"),
+        sa.column("created_at"), sa.column("updated_at")
+    )
+    duplicated = sa.select(grades.c.assignment_id, grades.c.teacher_id).group_by(
+        grades.c.assignment_id, grades.c.teacher_id
+    ).having(sa.func.count() > 1).subquery()
+
+    rows = bind.execute(
+        sa.select(grades.c.id, grades.c.assignment_id, grades.c.teacher_id).join(
+            duplicated,
+            sa.and_(
+                duplicated.c.assignment_id == grades.c.assignment_id,
+                duplicated.c.teacher_id == grades.c.teacher_id
+            )
+        ).order_by(
+            grades.c.assignment_id, grades.c.teacher_id,
+            sa.func.coalesce(grades.c.updated_at, grades.c.created_at).desc(),
+            grades.c.id.desc()
+        )
+    )
+
+    # The first row of each pair is the most recent one - delete the rest
+    to_delete = []
+    affected = set()
+    seen = set()
+    for grade_id, assignment_id, teacher_id in rows:
+        if (assignment_id, teacher_id) in seen:
+            to_delete.append(grade_id)
+            affected.add(assignment_id)
+        seen.add((assignment_id, teacher_id))
+
+    for start in range(0, len(to_delete), 500):
+        bind.execute(grades.delete().where(grades.c.id.in_(to_delete[start:start + 500])))
+    if to_delete:
+        print(f"Removed {len(to_delete)} duplicate grades from {len(affected)} assignments")
+    return affected
+
+
+def _drop_stale_results(bind, assignment_ids: set) -> None:
+    results = sa.table("assignment_results", sa.column("assignment_id"))
+    ids = sorted(assignment_ids)
+    for start in range(0, len(ids), 500):
+        bind.execute(results.delete().where(results.c.assignment_id.in_(ids[start:start + 500])))
+
+
+def upgrade():
+    bind = op.get_bind()
+    _drop_stale_results(bind, _remove_duplicate_grades(bind))
+
+    inspector = sa.inspect(bind)
+    existing = {
+        table: {index["name"] for index in inspector.get_indexes(table)}
+        for table in {table for _, table, _, _ in INDEXES}
+    }
+    for name, table, columns, unique in INDEXES:
+        # Databases created by create_all() after this change already have them
+        if name not in existing[table]:
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
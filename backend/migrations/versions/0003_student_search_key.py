@@ -0,0 +1,68 @@
+"""Normalized student search key with a trigram index
+
+Adds students.search_key, fills it for existing students, and indexes it:
+an FTS5 trigram table kept in sync by triggers on SQLite, a pg_trgm GIN
+index on Postgres.
+
+Revision ID: 0003_student_search_key
+Revises: 0002_grading_indexes
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.search import (
+    normalize_search_text, SQLITE_SEARCH_DDL, SQLITE_SEARCH_REBUILD, SQLITE_SEARCH_DROP,
+    POSTGRES_TRGM_EXTENSION
+)
+
+revision = '0003_student_search_key'
+down_revision = '0002_grading_indexes'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _backfill(bind) -> None:
+    students = sa.table("students", sa.column("id"), sa.column("name"), sa.column("search_key"))
+    update = students.update().where(students.c.id == sa.bindparam("student_id")).values(
+        search_key=sa.bindparam("key")
+    )
+    rows = bind.execute(sa.select(students.c.id, students.c.name).order_by(students.c.id)).all()
+    for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+        bind.execute(update, [
+            {"student_id": student_id, "key": normalize_search_text(name)}
+            for student_id, name in rows[start:start + BACKFILL_BATCH_SIZE]
+        ])
+    print(f"Filled the search key for {len(rows)} students")
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("students")}
+    # Databases created by create_all() after this change already have it
+    if "search_key" not in columns:
+        op.add_column("students", sa.Column("search_key", sa.String(100), nullable=True))
+    _backfill(bind)
+
+    if bind.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        op.execute(SQLITE_SEARCH_REBUILD)
+    elif bind.dialect.name == "postgresql":
+        op.execute(POSTGRES_TRGM_EXTENSION)
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_students_search_key "
+            "ON students USING gin (search_key gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DROP:
+            op.execute(statement)
+    elif bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_students_search_key")
+    with op.batch_alter_table("students") as batch_op:
+        batch_op.drop_column("search_key")
@@ -0,0 +1,36 @@
+"""One-row marker telling startup the default data is in place
+
+Databases that already have teams were seeded before the marker existed, so
+they get it here and startup never seeds them again.
+
+Revision ID: 0004_seed_marker
+Revises: 0003_student_search_key
+Create Date: 2026-10-17
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004_seed_marker'
+down_revision = '0003_student_search_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("seed_marker"):
+        op.create_table(
+            "seed_marker",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("seeded_at", sa.DateTime(), nullable=True),
+        )
+    seeded = bind.execute(sa.text("SELECT 1 FROM teams LIMIT 1")).first() is not None
+    has_marker = bind.execute(sa.text("SELECT 1 FROM seed_marker WHERE id = 1")).first() is not None
+    if seeded and not has_marker:
+        marker = sa.table("seed_marker", sa.column("id"), sa.column("seeded_at"))
+        op.bulk_insert(marker, [{"id": 1, "seeded_at": datetime.utcnow()}])
+
+
+def downgrade():
+    op.drop_table("seed_marker")
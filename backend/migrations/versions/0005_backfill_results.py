@@ -0,0 +1,36 @@
+"""Compute the stored results that existing databases are missing
+
+assignment_results was added empty to databases that predate it, and 0002
+drops the rows of assignments whose duplicate grades it removed. Every
+assignment without a stored result gets one here, from its current grades
+and Q10, so reports are right as soon as the upgrade finishes.
+
+Revision ID: 0005_backfill_results
+Revises: 0004_seed_marker
+Create Date: 2026-10-17
+"""
+from alembic import op
+from sqlalchemy.orm import Session
+from app.results import refresh_missing_results
+
+revision = '0005_backfill_results'
+down_revision = '0004_seed_marker'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Runs inside the migration's transaction; alembic commits it
+    db = Session(bind=op.get_bind())
+    try:
+        count = refresh_missing_results(db)
+        db.flush()
+    finally:
+        db.close()
+    if count:
+        print(f"Computed stored results for {count} assignments")
+
+
+def downgrade():
+    # Data only - the rows stay valid under 0004
+    pass
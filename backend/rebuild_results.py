@@ -0,0 +1,33 @@
+"""
+Rebuild the assignment_results table from the raw grades.
+Run this any time the stored results are suspected to be out of sync
+(upgrades fill in missing results on their own, in migration 0005):
+
+    python rebuild_results.py
+
+The database must already be at the newest migration (`alembic upgrade head`).
+"""
+import sys
+
+from app.database import SessionLocal, engine
+from app.results import refresh_assignment_results
+from app.startup import SchemaOutOfDate, check_schema
+
+try:
+    check_schema(engine, mode="migrations")
+except SchemaOutOfDate as e:
+    print(f"❌ {e}")
+    sys.exit(1)
+
+db = SessionLocal()
+
+try:
+    count = refresh_assignment_results(db)
+    db.commit()
+    print(f"✅ Rebuilt results for {count} assignments")
+except Exception as e:
+    print(f"Error rebuilding results: {e}")
+    db.rollback()
+    sys.exit(1)
+finally:
+    db.close()
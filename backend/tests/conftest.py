@@ -0,0 +1,34 @@
+"""
+The app reads its settings at import, so they are set here first: a fresh
+SQLite file per test run, created from the models and seeded at startup,
+and QUERY_BUDGET_MODE=raise so any route over its statement budget fails.
+"""
+import os
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix="iqraa-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_data_dir, 'test.db')}"
+os.environ["SCHEMA_MODE"] = "create"
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+os.environ["BACKUP_DIR"] = os.path.join(_data_dir, "backups")
+os.environ["BACKUP_COALESCE_SECONDS"] = "3600"  # Tests flush backups themselves, if at all
+
+import pytest
+from fastapi.testclient import TestClient
+from app.database import SessionLocal
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
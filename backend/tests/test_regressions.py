@@ -0,0 +1,197 @@
+"""
+Checks for behaviour that is easy to break without noticing: the query
+budget guard, stored results staying in step with grades, Q10 (also the
+bulk sync) and team changes, the reference and summary caches,
+spelling-insensitive student search and balanced allocation.
+"""
+import pytest
+from fastapi import Depends
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.allocation import GroupOption, StudentToPlace, allocate
+from app.database import get_db
+from app import reference_cache
+from app.main import app
+from app.metrics import QueryBudgetExceeded, query_budget
+from app.models import AssignmentResult, Student, StudentAssignment, Team, Teacher
+from app.routers.reports import MAX_CACHED_SUMMARIES, _summary_cache
+from app.search import normalize_search_text
+
+N_PLUS_ONE_BUDGET = 3
+
+
+@app.get("/_tests/n-plus-one", dependencies=[Depends(query_budget(N_PLUS_ONE_BUDGET))])
+def _teacher_team_names(db: Session = Depends(get_db)):
+    # Lazy-loads each teacher's team: one SELECT per team
+    return [teacher.team.name for teacher in db.query(Teacher).order_by(Teacher.id)]
+
+
+# ========== Query budget ==========
+
+def test_n_plus_one_raises_naming_the_repeated_statement(client):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        client.get("/_tests/n-plus-one")
+    message = str(error.value)
+    assert f"GET /_tests/n-plus-one ran {N_PLUS_ONE_BUDGET + 1} SQL statements (budget {N_PLUS_ONE_BUDGET})" in message
+    assert "FROM teams" in message
+
+
+def test_grade_batch_stays_within_budget(client):
+    team_id, teachers, group = _team(client)
+    assignment_ids = [_assign(client, f"قوتابی بەش {i}", team_id, group["id"]) for i in range(25)]
+    body = [
+        {"assignment_id": assignment_id, "teacher_id": teachers[1], "q1_mark": i % 3}
+        for i, assignment_id in enumerate(assignment_ids)
+    ]
+    # Once inserting, once updating existing grades
+    for _ in range(2):
+        response = client.post("/grades/batch", json=body)
+        assert response.status_code == 200
+        assert all(item["success"] for item in response.json())
+
+
+# ========== Stored results ==========
+
+def _team(client):
+    """Team 1, its teachers by position and question group A"""
+    teachers = [t for t in client.get("/teams/teachers/all").json() if t["team_id"] == 1]
+    group = next(g for g in client.get("/question-groups/").json() if g["code"] == "A")
+    return 1, {t["position"]: t["id"] for t in teachers}, group
+
+
+def _assign(client, name, team_id, question_group_id):
+    student = client.post("/students/", json={"name": name})
+    assert student.status_code == 200
+    assignment = client.post("/assignments/", json={
+        "student_id": student.json()["id"], "team_id": team_id, "question_group_id": question_group_id
+    })
+    assert assignment.status_code == 200
+    return assignment.json()["id"]
+
+
+def _stored(db, assignment_id):
+    db.expire_all()
+    return db.get(AssignmentResult, assignment_id)
+
+
+def test_stored_results_follow_grades_q10_and_team_changes(client, db):
+    team_id, teachers, group = _team(client)
+    assignment_id = _assign(client, "ئاراس ستوون", team_id, group["id"])
+
+    first = client.post("/grades/", json={"assignment_id": assignment_id, "teacher_id": teachers[1], "q1_mark": 2, "q2_mark": 6})
+    assert first.status_code == 200
+    client.post("/grades/", json={"assignment_id": assignment_id, "teacher_id": teachers[2], "q1_mark": 4, "q2_mark": 8})
+    result = _stored(db, assignment_id)
+    assert (result.avg_q1, result.avg_q2, result.total_average_q1_q9) == (3, 7, 10)
+    assert result.final_total is None
+
+    assert client.put(f"/assignments/{assignment_id}/q10", json={"q10_mark": 8}).status_code == 200
+    result = _stored(db, assignment_id)
+    assert result.final_total == 18
+    assert result.passed is False
+
+    assert client.put(f"/grades/{first.json()['id']}", json={"q1_mark": 4}).status_code == 200
+    result = _stored(db, assignment_id)
+    assert (result.avg_q1, result.total_average_q1_q9, result.final_total) == (4, 11, 19)
+
+    # A new team means new teachers: the grades are dropped and so is the result
+    assert client.put(f"/assignments/{assignment_id}", params={"team_id": 2}).status_code == 200
+    result = _stored(db, assignment_id)
+    assert result.avg_q1 is None
+    assert result.total_average_q1_q9 is None
+    assert result.final_total is None
+
+
+def test_q10_sync_refreshes_results_in_chunks(client, db, monkeypatch):
+    team_id, teachers, group = _team(client)
+    assignment_ids = [_assign(client, f"قوتابی Q10 {i}", team_id, group["id"]) for i in range(12)]
+    for position in (1, 2):
+        client.post("/grades/", json={"assignment_id": assignment_ids[0], "teacher_id": teachers[position], "q1_mark": 4})
+    # Q10 arrives on the students after they were assigned, as from an Excel import
+    assigned_students = select(StudentAssignment.student_id).where(StudentAssignment.id.in_(assignment_ids))
+    db.execute(update(Student).where(Student.id.in_(assigned_students)).values(q10_mark=7))
+    db.commit()
+
+    # One assignment per chunk: over the default budget unless the route extends it
+    monkeypatch.setattr("app.routers.assignments.REFRESH_BATCH_SIZE", 1)
+    response = client.post("/assignments/sync-q10")
+    assert response.status_code == 200
+    assert response.json()["synced_count"] == 12
+
+    result = _stored(db, assignment_ids[0])
+    assert (result.total_average_q1_q9, result.final_total) == (4, 11)
+    assert all(_stored(db, assignment_id) is not None for assignment_id in assignment_ids)
+
+
+# ========== Reference cache ==========
+
+def test_reference_cache_skips_a_snapshot_older_than_the_version(client, db):
+    # A request that has already written reads from the snapshot its transaction started with
+    db.connection().exec_driver_sql("BEGIN")
+    original = db.execute(select(Team.name).where(Team.id == 2)).scalar_one()
+
+    assert client.put("/teams/2", json={"name": "لیژنەی نوێ"}).status_code == 200
+    try:
+        assert db.execute(select(Team.name).where(Team.id == 2)).scalar_one() == original
+        assert reference_cache.team(db, 2).name == "لیژنەی نوێ"
+    finally:
+        db.rollback()
+        client.put("/teams/2", json={"name": original})
+
+
+def test_summary_cache_stays_bounded(client):
+    for exam_session_id in range(1000, 1000 + 2 * MAX_CACHED_SUMMARIES):
+        assert client.get("/reports/summary", params={"exam_session_id": exam_session_id}).status_code == 200
+    assert len(_summary_cache) <= MAX_CACHED_SUMMARIES
+
+
+# ========== Search ==========
+
+def test_search_key_folds_arabic_letters():
+    assert normalize_search_text("علي كريم") == normalize_search_text("علی کریم")
+
+
+@pytest.mark.parametrize("stored, typed", [
+    ("علي كمال", "علی کمال"),  # Stored with Arabic ي/ك, typed with Kurdish ی/ک
+    ("هیوا کەریم", "هيوا كەريم"),  # And the other way round
+])
+def test_search_ignores_yeh_and_kaf_spelling(client, stored, typed):
+    created = client.post("/students/", json={"name": stored}).json()
+    found = client.get("/students/search", params={"q": typed}).json()
+    assert created["id"] in [student["id"] for student in found]
+
+
+# ========== Allocation ==========
+
+GROUPS = [GroupOption(id=i, code=code) for i, code in enumerate("ABC", start=1)]
+
+
+def test_allocation_keeps_rooms_and_groups_even():
+    students = [StudentToPlace(id=i, is_second_term=False, previous_question_group=None) for i in range(1, 31)]
+    placements, unplaced = allocate(students, team_ids=[1, 2, 3], groups=GROUPS)
+    assert unplaced == []
+    for key in ("team_id", "question_group_id"):
+        counts = {}
+        for placement in placements:
+            counts[getattr(placement, key)] = counts.get(getattr(placement, key), 0) + 1
+        assert sorted(counts.values()) == [10, 10, 10]
+
+
+def test_allocation_starts_from_existing_assignments():
+    students = [StudentToPlace(id=i, is_second_term=False, previous_question_group=None) for i in range(1, 5)]
+    # Room 1 already holds 4 students
+    placements, _ = allocate(students, team_ids=[1, 2], groups=GROUPS, existing=[(1, 1, 4)])
+    assert [p.team_id for p in placements] == [2, 2, 2, 2]
+
+
+def test_second_term_students_never_get_their_previous_group():
+    students = [
+        StudentToPlace(id=i, is_second_term=True, previous_question_group="a") for i in range(1, 7)
+    ] + [StudentToPlace(id=7, is_second_term=True, previous_question_group=None)]
+    placements, unplaced = allocate(students, team_ids=[1, 2], groups=GROUPS)
+    assert unplaced == []
+    assert all(p.question_group_id != 1 for p in placements if p.student_id != 7)
+
+    # No group left to give them
+    placements, unplaced = allocate(students[:1], team_ids=[1], groups=GROUPS[:1])
+    assert (placements, unplaced) == ([], [1])
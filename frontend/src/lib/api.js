@@ -28,29 +28,75 @@ async function fetchAPI(endpoint, options = {}) {
     return text ? JSON.parse(text) : null;
 }
 
+const PAGE_SIZE = 1000;  // Largest page the list endpoints allow
+
+/**
+ * Fetch every page of a keyset-paginated list (/students/, /assignments/),
+ * following the X-Next-Cursor header until the last page.
+ */
+async function fetchAllPages(endpoint, params = {}) {
+    const rows = [];
+    let cursor = null;
+    do {
+        const query = new URLSearchParams({ ...params, limit: PAGE_SIZE });
+        if (cursor) query.set('after_id', cursor);
+        const response = await fetch(`${API_BASE_URL}${endpoint}?${query.toString()}`);
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({ detail: 'An error occurred' }));
+            throw new Error(error.detail || 'Request failed');
+        }
+        rows.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return rows;
+}
+
+/**
+ * Number of rows a list endpoint would return, from its X-Total-Count header
+ */
+async function fetchTotalCount(endpoint, params = {}) {
+    const query = new URLSearchParams({ ...params, limit: 1, fields: 'id' });
+    const response = await fetch(`${API_BASE_URL}${endpoint}?${query.toString()}`);
+    if (!response.ok) {
+        throw new Error('Request failed');
+    }
+    return Number(response.headers.get('X-Total-Count') || 0);
+}
+
+// Teams, teachers and question groups are sent with a short max-age so teacher
+// devices can reuse them; admin screens edit them, so they always revalidate
+// (a cheap 304 when nothing changed).
+const REVALIDATE = { cache: 'no-cache' };
+
 // ========== Teams API ==========
 export const teamsAPI = {
-    getAll: () => fetchAPI('/teams/'),
-    getForActiveSession: () => fetchAPI('/teams/for-active-session'),
-    get: (id) => fetchAPI(`/teams/${id}`),
+    getAll: () => fetchAPI('/teams/', REVALIDATE),
+    getForActiveSession: () => fetchAPI('/teams/for-active-session', REVALIDATE),
+    get: (id) => fetchAPI(`/teams/${id}`, REVALIDATE),
     create: (data) => fetchAPI('/teams/', { method: 'POST', body: JSON.stringify(data) }),
     update: (id, data) => fetchAPI(`/teams/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
     delete: (id) => fetchAPI(`/teams/${id}`, { method: 'DELETE' }),
     
     // Teachers
-    getAllTeachers: () => fetchAPI('/teams/teachers/all'),
+    getAllTeachers: () => fetchAPI('/teams/teachers/all', REVALIDATE),
     getTeachersForActiveSession: () => fetchAPI('/teams/teachers/for-active-session'),
-    getTeamTeachers: (teamId) => fetchAPI(`/teams/${teamId}/teachers`),
+    getTeamTeachers: (teamId) => fetchAPI(`/teams/${teamId}/teachers`, REVALIDATE),
     createTeacher: (data) => fetchAPI('/teams/teachers', { method: 'POST', body: JSON.stringify(data) }),
-    getTeacher: (id) => fetchAPI(`/teams/teachers/${id}`),
+    getTeacher: (id) => fetchAPI(`/teams/teachers/${id}`, REVALIDATE),
     updateTeacher: (id, data) => fetchAPI(`/teams/teachers/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
     deleteTeacher: (id) => fetchAPI(`/teams/teachers/${id}`, { method: 'DELETE' }),
 };
 
+// ========== Teachers API ==========
+export const teachersAPI = {
+    // Teacher page bundle: pending/done assignments, own grades and max marks
+    getWorkload: (id) => fetchAPI(`/teachers/${id}/workload`),
+};
+
 // ========== Question Groups API ==========
 export const questionGroupsAPI = {
-    getAll: () => fetchAPI('/question-groups/'),
-    get: (id) => fetchAPI(`/question-groups/${id}`),
+    getAll: () => fetchAPI('/question-groups/', REVALIDATE),
+    get: (id) => fetchAPI(`/question-groups/${id}`, REVALIDATE),
     create: (data) => fetchAPI('/question-groups/', { method: 'POST', body: JSON.stringify(data) }),
     update: (id, data) => fetchAPI(`/question-groups/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
     delete: (id) => fetchAPI(`/question-groups/${id}`, { method: 'DELETE' }),
@@ -58,20 +104,18 @@ export const questionGroupsAPI = {
 
 // ========== Students API ==========
 export const studentsAPI = {
-    getAll: (params = {}) => {
-        const queryString = new URLSearchParams(params).toString();
-        return fetchAPI(`/students/${queryString ? '?' + queryString : ''}`);
-    },
+    getAll: (params = {}) => fetchAllPages('/students/', params),
+    count: (params = {}) => fetchTotalCount('/students/', params),
     get: (id) => fetchAPI(`/students/${id}`),
     create: (data) => fetchAPI('/students/', { method: 'POST', body: JSON.stringify(data) }),
     createBulk: (data) => fetchAPI('/students/bulk', { method: 'POST', body: JSON.stringify(data) }),
     update: (id, data) => fetchAPI(`/students/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
     delete: (id) => fetchAPI(`/students/${id}`, { method: 'DELETE' }),
     deleteAll: () => fetchAPI('/students/', { method: 'DELETE' }),
-    importCSV: async (file) => {
+    importCSV: async (file, dryRun = false) => {
         const formData = new FormData();
         formData.append('file', file);
-        const response = await fetch(`${API_BASE_URL}/students/import-csv`, {
+        const response = await fetch(`${API_BASE_URL}/students/import-csv${dryRun ? '?dry_run=true' : ''}`, {
             method: 'POST',
             body: formData
         });
@@ -97,14 +141,15 @@ export const examSessionsAPI = {
 
 // ========== Assignments API ==========
 export const assignmentsAPI = {
-    getAll: (params = {}) => {
-        const queryString = new URLSearchParams(params).toString();
-        return fetchAPI(`/assignments/${queryString ? '?' + queryString : ''}`);
-    },
+    getAll: (params = {}) => fetchAllPages('/assignments/', params),
+    // Flat rows (student_name, team_name, question_group_code) for big lists
+    getCompact: (params = {}) => fetchAllPages('/assignments/compact', params),
     getByTeam: (teamId, pendingOnly = false) => 
         fetchAPI(`/assignments/team/${teamId}?pending_only=${pendingOnly}`),
     get: (id) => fetchAPI(`/assignments/${id}`),
     create: (data) => fetchAPI('/assignments/', { method: 'POST', body: JSON.stringify(data) }),
+    // Spread students over the session's rooms and question groups in one request
+    autoAssign: (data = {}) => fetchAPI('/assignments/auto', { method: 'POST', body: JSON.stringify(data) }),
     update: (id, teamId = null, questionGroupId = null) => {
         const params = new URLSearchParams();
         if (teamId) params.append('team_id', teamId);
@@ -155,3 +200,26 @@ export const reportsAPI = {
         return `${API_BASE_URL}/reports/export/csv-summary${param}`;
     },
 };
+
+// ========== Live Events (Server-Sent Events) ==========
+/**
+ * Subscribe to the live progress feed. `handlers` maps event types to callbacks:
+ * - assignments: { assignments: [...changed flags], deleted: [ids], teams: [...counters] }
+ * - resync: too much changed (or the connection dropped) - reload the data
+ * Returns a function that closes the connection.
+ */
+export function subscribeEvents(handlers) {
+    if (typeof EventSource === 'undefined') return () => {};
+
+    const source = new EventSource(`${API_BASE_URL}/events`);
+    let connectedBefore = false;
+    source.addEventListener('connected', () => {
+        // EventSource reconnects on its own; events sent meanwhile were missed
+        if (connectedBefore) handlers.resync?.({ reason: 'reconnect' });
+        connectedBefore = true;
+    });
+    for (const [type, handler] of Object.entries(handlers)) {
+        source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+    }
+    return () => source.close();
+}